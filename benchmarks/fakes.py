@@ -0,0 +1,73 @@
+"""
+A recording stand-in for Slack, so the jobs can be timed and run end to end without sending anything.
+
+Classes:
+    RecordingSlackClient:
+        Async Slack client whose every call succeeds and is recorded.
+
+Functions:
+    fake_slack(rate_limited: bool) -> Iterator[list[dict]]:
+        Route every `SlackDispatcher` through recording clients for the duration of a `with` block.
+"""
+
+import itertools
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from unittest.mock import patch
+
+from weaselbot import slack_dispatch
+
+
+class RecordingSlackClient:
+    """
+    The subset of `AsyncWebClient` that `SlackDispatcher` calls. Every call is appended to `calls` with its
+    method, token, arguments and a monotonic timestamp, and answered like a successful Slack response.
+
+    :param token: the workspace token the client was built for
+    :type token: str
+    :param calls: where calls are recorded, shared by every client of a `fake_slack` block
+    :type calls: list[dict]
+    """
+
+    _ts = itertools.count(1)
+
+    def __init__(self, token: str, calls: list[dict]):
+        self.token = token
+        self.calls = calls
+
+    def _record(self, method: str, **kwargs) -> dict:
+        self.calls.append({"method": method, "token": self.token, "at": time.monotonic(), **kwargs})
+        return {"ok": True, "ts": f"{next(self._ts)}.000100", "channel": kwargs.get("channel")}
+
+    async def chat_postMessage(self, **kwargs) -> dict:
+        return self._record("chat.postMessage", **kwargs)
+
+    async def reactions_add(self, **kwargs) -> dict:
+        return self._record("reactions.add", **kwargs)
+
+    async def conversations_join(self, **kwargs) -> dict:
+        return self._record("conversations.join", **kwargs)
+
+
+@contextmanager
+def fake_slack(rate_limited: bool = False) -> Iterator[list[dict]]:
+    """
+    Make every `SlackDispatcher` built inside the block use `RecordingSlackClient`.
+
+    :param rate_limited: keep Slack's rate limits. Off by default, so timings measure the code rather than the
+        waits Slack would impose.
+    :type rate_limited: bool
+    :return: the recorded calls, in the order they were made
+    :rtype: Iterator[list[dict]]
+    """
+
+    calls = []
+    unlimited = (1e9, 10**9)
+    limits = slack_dispatch.TIER_LIMITS if rate_limited else dict.fromkeys(slack_dispatch.TIER_LIMITS, unlimited)
+    with (
+        patch.object(slack_dispatch, "async_slack_client", lambda token: RecordingSlackClient(token, calls)),
+        patch.dict(slack_dispatch.TIER_LIMITS, limits),
+        patch.object(slack_dispatch, "CHANNEL_LIMIT", slack_dispatch.CHANNEL_LIMIT if rate_limited else unlimited),
+    ):
+        yield calls
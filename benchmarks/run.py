@@ -0,0 +1,357 @@
+"""
+Benchmark the jobs' transforms against seeded synthetic data, and catch regressions against a saved baseline.
+
+Every stage is timed (best of `--repeat` runs) and its peak resident memory sampled while it runs. Results are
+compared with the baseline saved for the same scale in `benchmarks/baseline.json`: a stage that got slower or
+hungrier than the tolerance allows is reported and the run exits with status 1. Baselines are machine specific, so
+save one (`--save`) on the machine you compare on before changing code.
+
+    python -m benchmarks.run                      # the "regional" scale against its baseline
+    python -m benchmarks.run --scale national     # hundreds of regions, millions of posts
+    python -m benchmarks.run --stages kotter awards --repeat 5
+    python -m benchmarks.run --save               # record a new baseline
+
+Stages:
+    achievements.*: each hand-coded achievement function, and `build_achievements` fused and not.
+    rules.*: the national rule aggregation the achievements job runs once, and every region's rule evaluation.
+    home_regions.*: picking home regions from the windowed counts, per email and per user.
+    kotter.frames: every region's Kotter report frames, classified in one pass over the national data.
+    awards.find_new: finding and numbering every region's new awards against what's already awarded.
+    slack.send_to_slack: every region's `send_to_slack`, with Slack replaced by `fakes.RecordingSlackClient`.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable
+
+import polars as pl
+import psutil
+
+from weaselbot import pax_achievements
+from weaselbot.achievement_rules import (
+    DEFAULT_RULES,
+    aggregate_rules,
+    evaluate_rules,
+    load_rules,
+    partition_aggregates,
+    region_rules,
+)
+from weaselbot.activity import BEATDOWN, QSOURCE, activity_expr
+from weaselbot.home_regions import resolve_home_regions
+from weaselbot.kotter_report import KOTTER_THRESHOLDS, classify_kotter, kotter_cutoffs, lifetime_summary, lookback_start
+from weaselbot.utils import _find_new_awards, _number_awards, send_to_slack
+
+from .fakes import fake_slack
+from .synthetic import SCALES, attendance_frame, generate, home_region_counts
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TOLERANCE = 0.25  # allowed relative slowdown or memory growth before a stage counts as regressed
+SECONDS_SLACK = 0.05  # and absolute, so stages of a few milliseconds don't flap
+RSS_SLACK_MB = 32
+_AWARDED = {"id": pl.Int64, "achievement_id": pl.String, "pax_id": pl.String, "date_awarded": pl.Date}
+KOTTER_DEFAULTS = (2, 4, 4, 4, 8)  # NO_POST_THRESHOLD, NO_Q_THRESHOLD_WEEKS, REMINDER_WEEKS, ..._POSTS, HOME_AO_CAPTURE
+
+
+class _PeakRSS:
+    """Samples the process's resident memory on a thread while a stage runs, keeping the highest."""
+
+    def __init__(self, interval: float = 0.002):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = self.process.memory_info().rss
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self) -> "_PeakRSS":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def measure(stage: Callable[[], int], repeat: int) -> dict:
+    """Run a stage `repeat` times, keeping the best time and the highest memory."""
+
+    best, peak, delta, rows = float("inf"), 0, 0, 0
+    for _ in range(repeat):
+        gc.collect()
+        start = psutil.Process().memory_info().rss
+        with _PeakRSS() as rss:
+            t = time.perf_counter()
+            rows = stage()
+            best = min(best, time.perf_counter() - t)
+        peak, delta = max(peak, rss.peak), max(delta, rss.peak - start)
+    return {
+        "seconds": round(best, 4),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "rss_delta_mb": round(delta / 2**20, 1),
+        "rows": rows,
+    }
+
+
+def awards_list() -> pl.DataFrame:
+    """The default achievements_list, ids in `DEFAULT_RULES` order."""
+    return pl.DataFrame(
+        {
+            "id": range(1, len(DEFAULT_RULES) + 1),
+            "name": [rule.code.replace("_", " ").title() for rule in DEFAULT_RULES],
+            "verb": [f"posting {rule.threshold} times in a {rule.period}" for rule in DEFAULT_RULES],
+            "code": [rule.code for rule in DEFAULT_RULES],
+        }
+    )
+
+
+def prepare(scale: str, seed: int, end: date) -> dict:
+    """Generate the data and build every stage's inputs the way the jobs do."""
+
+    data = generate(**SCALES[scale], seed=seed, end=end)
+    posts = attendance_frame(data)
+    counts, counts_by_user = home_region_counts(data, end), home_region_counts(data, end, by_user=True)
+    schemas = list(data)
+
+    # the achievements job's national frame: a year of posts with their activity, joined to home regions
+    nation_df = (
+        posts.filter(pl.col("date") > end - timedelta(days=365))
+        .select("email", "user_name", "ao_id", "ao", "date", "q_flag", activity_expr().alias("activity"))
+        .join(resolve_home_regions(counts).drop("attendance"), on="email")
+    )
+    users = posts.select(pl.col("schema").alias("region"), "email", pl.col("user_id").alias("slack_user_id")).unique()
+    # the Kotter job's: its lookback window of posts joined to home regions, and every man's lifetime summary
+    kotter_settings = dict.fromkeys(schemas, dict(zip(KOTTER_THRESHOLDS, KOTTER_DEFAULTS, strict=True)))
+    kotter_df = (
+        posts.filter(pl.col("date") >= lookback_start(kotter_settings.values()))
+        .select("email", "ao_id", "ao", "date", "q_flag")
+        .join(resolve_home_regions(counts_by_user, by_user=True).drop("attendance"), on="email")
+    )
+
+    awards, rules = awards_list(), load_rules()
+    matched = region_rules(awards, rules)
+    regional = partition_aggregates(aggregate_rules(nation_df, rules.values(), users=users), schemas)
+    region_users = users.partition_by("region", as_dict=True)
+    results, awarded = {}, {}
+    for schema in schemas:
+        frames = evaluate_rules(nation_df.clear(), matched, cache=regional[schema], users=region_users[(schema,)])
+        results[schema] = {idx: df.drop("email") for idx, df in frames.items()}
+        # yesterday's run already awarded everything before today
+        found = _find_new_awards(schema, end.year, results[schema], pl.DataFrame(schema=_AWARDED))
+        awarded[schema] = (
+            found.filter(pl.col("date_awarded") < end)
+            .with_row_index("id", offset=1)
+            .select("id", pl.col("achievement_id").cast(pl.String), "pax_id", "date_awarded")
+        )
+
+    return {
+        "schemas": schemas,
+        "year": end.year,
+        "nation_df": nation_df,
+        "users": users,
+        "counts": counts,
+        "counts_by_user": counts_by_user,
+        "kotter_df": kotter_df,
+        "lifetime": lifetime_summary(posts),
+        "cutoffs": kotter_cutoffs(kotter_settings),
+        "siteqs": pl.concat(
+            tables["aos"]
+            .filter(pl.col("site_q_user_id").is_not_null())
+            .select(pl.lit(schema).alias("region"), pl.col("channel_id").alias("home_ao"), "ao", "site_q_user_id")
+            for schema, tables in data.items()
+        ),
+        "awards": awards,
+        "matched": matched,
+        "rules": rules,
+        "results": results,
+        "awarded": awarded,
+        "posts": posts.height,
+    }
+
+
+def stages(ctx: dict) -> dict[str, Callable[[], int]]:
+    """Every stage, as a function returning the rows it produced."""
+
+    nation_df = ctx["nation_df"]
+    qsource = (pl.col("activity") == QSOURCE, pl.lit(False))
+    beatdown = (pl.col("activity") == BEATDOWN, pl.lit(True))
+    functions = {
+        "the_priest": qsource,
+        "the_monk": qsource,
+        "leader_of_men": beatdown,
+        "the_boss": beatdown,
+        "hammer_not_nail": beatdown,
+        "cadre": beatdown,
+        "el_presidente": beatdown,
+        "posts": beatdown,
+        "six_pack": beatdown,
+        "hdtf": beatdown,
+    }
+
+    def achievement(name: str, filters: tuple) -> Callable[[], int]:
+        return lambda: getattr(pax_achievements, name)(nation_df, *filters).height
+
+    def aggregate() -> int:
+        cache = aggregate_rules(nation_df, ctx["rules"].values(), users=ctx["users"])
+        return sum(df.height for df in partition_aggregates(cache, ctx["schemas"])[ctx["schemas"][0]].values())
+
+    regional = partition_aggregates(
+        aggregate_rules(nation_df, ctx["rules"].values(), users=ctx["users"]), ctx["schemas"]
+    )
+    region_users = ctx["users"].partition_by("region", as_dict=True)
+
+    def evaluate() -> int:
+        return sum(
+            df.height
+            for schema in ctx["schemas"]
+            for df in evaluate_rules(
+                nation_df.clear(), ctx["matched"], cache=regional[schema], users=region_users[(schema,)]
+            ).values()
+        )
+
+    def kotter() -> int:
+        frames = classify_kotter(ctx["kotter_df"], ctx["siteqs"], ctx["cutoffs"], ctx["lifetime"])
+        return sum(df.height for df in frames)
+
+    def find_new() -> int:
+        return sum(
+            _number_awards(
+                _find_new_awards(schema, ctx["year"], ctx["results"][schema], ctx["awarded"][schema]),
+                ctx["awarded"][schema],
+                ctx["year"],
+            ).height
+            for schema in ctx["schemas"]
+        )
+
+    def slack() -> int:
+        with fake_slack() as calls:
+            for schema in ctx["schemas"]:
+                send_to_slack(
+                    schema,
+                    f"xoxb-{schema}",
+                    "CACHIEVEMENTS",
+                    ctx["year"],
+                    ctx["awarded"][schema],
+                    ctx["awards"],
+                    ctx["results"][schema],
+                    "CPAXMINERLOGS",
+                )
+        return len(calls)
+
+    return {
+        **{f"achievements.{name}": achievement(name, filters) for name, filters in functions.items()},
+        "achievements.build_fused": lambda: len(pax_achievements.build_achievements(nation_df)),
+        "achievements.build_unfused": lambda: len(pax_achievements.build_achievements(nation_df, fused=False)),
+        "rules.aggregate_national": aggregate,
+        "rules.evaluate_regions": evaluate,
+        "home_regions.resolve": lambda: resolve_home_regions(ctx["counts"]).height,
+        "home_regions.resolve_by_user": lambda: resolve_home_regions(ctx["counts_by_user"], by_user=True).height,
+        "kotter.frames": kotter,
+        "awards.find_new": find_new,
+        "slack.send_to_slack": slack,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """The stages that regressed against the baseline, described."""
+
+    regressions = []
+    for stage, result in results["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            continue
+        if result["seconds"] > base["seconds"] * (1 + tolerance) + SECONDS_SLACK:
+            regressions.append(f"{stage}: {base['seconds']:.3f}s -> {result['seconds']:.3f}s")
+        if result["rss_delta_mb"] > base["rss_delta_mb"] * (1 + tolerance) + RSS_SLACK_MB:
+            regressions.append(f"{stage}: +{base['rss_delta_mb']:.0f}MB -> +{result['rss_delta_mb']:.0f}MB peak memory")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=SCALES, default="regional")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="*", default=[], help="only run stages whose names contain one of these")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="save the results as the scale's baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--verbose", action="store_true", help="show the jobs' own logging")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        format="%(asctime)s [%(levelname)s]:%(message)s", level=logging.INFO if args.verbose else logging.WARNING
+    )
+
+    start = time.perf_counter()
+    ctx = prepare(args.scale, args.seed, date.today())
+    print(
+        f"Generated {len(ctx['schemas'])} regions, {ctx['posts']} posts ({ctx['nation_df'].height} in the last year) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+    results = {
+        "scale": args.scale,
+        "seed": args.seed,
+        "machine": {
+            "python": platform.python_version(),
+            "polars": pl.__version__,
+            "cpus": os.cpu_count(),
+            "platform": platform.platform(),
+        },
+        "stages": {},
+    }
+    for name, stage in stages(ctx).items():
+        if args.stages and not any(s in name for s in args.stages):
+            continue
+        result = measure(stage, args.repeat)
+        results["stages"][name] = result
+        print(
+            f"{name:<34}{result['seconds']:>9.3f}s{result['peak_rss_mb']:>9.0f}MB{result['rss_delta_mb']:>+8.0f}MB{result['rows']:>10}"
+        )
+
+    saved = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            saved = json.load(f)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save:
+        # keep stages that weren't run this time
+        previous = saved.get(args.scale, {}).get("stages", {})
+        saved[args.scale] = {**results, "stages": {**previous, **results["stages"]}}
+        with open(args.baseline, "w") as f:
+            json.dump(saved, f, indent=2)
+            f.write("\n")
+        print(f"Saved the {args.scale} baseline to {args.baseline}")
+        return 0
+
+    baseline = saved.get(args.scale)
+    if baseline is None:
+        print(f"No {args.scale} baseline in {args.baseline}; run with --save to record one.")
+        return 0
+    if baseline["seed"] != args.seed:
+        print(f"The {args.scale} baseline was recorded with seed {baseline['seed']}; not comparing.")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regressions against the {args.scale} baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
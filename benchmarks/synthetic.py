@@ -0,0 +1,279 @@
+"""
+Seeded synthetic PAXminer data, for timing the jobs at national scale without production access.
+
+Every region gets the four PAXminer tables the jobs read (users, aos, beatdowns and bd_attendance) with realistic
+shapes: each man has a home AO he posts at on most of its days, a second AO he visits now and then, and perhaps
+QSource and rucks; some stop posting part way through; a few men from the neighbouring region travel in under their
+own user id and the same email; every beatdown's Q and occasional co-Q are among its PAX; and backblasts are long,
+with QSource lessons numbered the way `activity` recognises. Each region is seeded from `(seed, region number)`, so
+a region's data doesn't change with the number of regions generated.
+
+Functions:
+    generate(regions: int, pax: int, aos: int, days: int, ...) -> dict[str, dict[str, pl.DataFrame]]:
+        Generate every region's tables.
+
+    attendance_frame(data: dict[str, dict[str, pl.DataFrame]]) -> pl.DataFrame:
+        Every post with its beatdown and AO, as the jobs' national extracts join them, tagged with the region.
+
+    home_region_counts(data: dict[str, dict[str, pl.DataFrame]], end: date | None, by_user: bool) -> pl.DataFrame:
+        The windowed attendance counts `home_regions.home_region_queries` returns, for `resolve_home_regions`.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import polars as pl
+
+# presets for `generate`; "national" is roughly the size of the PAXminer database
+SCALES = {
+    "small": {"regions": 8, "pax": 60},
+    "regional": {"regions": 40, "pax": 150},
+    "national": {"regions": 300, "pax": 250},
+}
+WINDOWS = (30, 60, 90, 120)  # as home_regions.WINDOWS
+
+_FILLER = (
+    "Warmup: SSH x20, imperial walkers x15, merkins x10. The Thang: Dora 1-2-3 with 100 merkins, 200 LBCs and "
+    "300 squats while partner runs to the flag and back. Mary: flutter kicks, box cutters, American hammers. "
+    "COT: prayers for the injured and those travelling. Naked-man moleskin: great work in the gloom today. "
+)
+
+
+def _text(rng: np.random.Generator, heads: list[str], chars: int) -> list[str]:
+    """A backblast per head, padded with filler to around `chars` characters."""
+    filler = _FILLER * (2 * chars // len(_FILLER) + 2)
+    lengths = np.clip(rng.normal(chars, chars / 4, len(heads)), 40, 2 * chars).astype(int)
+    starts = rng.integers(0, len(_FILLER), len(heads))
+    return [f"{head}\n{filler[s : s + n]}" for head, s, n in zip(heads, starts, lengths, strict=True)]
+
+
+def _region(
+    r: int,
+    regions: int,
+    pax: int,
+    aos: int,
+    days: int,
+    travel: float,
+    backblast_chars: int,
+    seed: int,
+    end: date,
+) -> dict[str, pl.DataFrame]:
+    rng = np.random.default_rng([seed, r])
+
+    # the region's own men, then visitors from the previous region under their own email
+    visitors = round(travel * pax) if regions > 1 else 0
+    home = (r - 1) % regions
+    user_ids = [f"U{r:03d}{i:05d}" for i in range(pax)] + [f"U{r:03d}V{i:04d}" for i in range(visitors)]
+    emails = [f"pax{i}.{r:03d}@example.com" for i in range(pax)] + [
+        f"pax{i}.{home:03d}@example.com" for i in range(visitors)
+    ]
+    users = pl.DataFrame(
+        {
+            "user_id": [*user_ids, f"U{r:03d}BOT"],
+            "user_name": [f"Pax {r}-{i}" for i in range(len(user_ids))] + ["PAXminer"],
+            "email": [*emails, "none"],
+        }
+    )
+
+    # workout AOs, then QSource, a ruck and the log channel, which never has beatdowns
+    names = [f"ao_{j}" for j in range(aos)] + ["qsource", "ruck", "paxminer_logs"]
+    channels = [f"C{r:03d}{j:04d}" for j in range(len(names))]
+    n = len(user_ids)
+    rate = rng.beta(2, 2, n) * 0.9
+    rate[pax:] *= 0.15
+    home_ao = rng.integers(0, aos, n)
+    second_ao = rng.integers(0, aos, n)
+    qsource = np.where(rng.random(n) < 0.4, rate * 0.8, 0)
+    ruck = np.where(rng.random(n) < 0.2, 0.3, 0)
+    # the day each man stops posting; most never do
+    first = end - timedelta(days=days - 1)
+    last_day = np.where(rng.random(n) < 0.15, rng.integers(0, days, n), days - 1)
+
+    site_qs = []
+    for j in range(len(names)):
+        candidates = np.flatnonzero(home_ao[:pax] == j)
+        has_site_q = j < aos and candidates.size and rng.random() < 0.8
+        site_qs.append(user_ids[rng.choice(candidates)] if has_site_q else None)
+    ao_table = pl.DataFrame(
+        {
+            "channel_id": channels,
+            "ao": names,
+            "backblast": [1] * (aos + 2) + [0],
+            "site_q_user_id": site_qs,
+        },
+        schema_overrides={"site_q_user_id": pl.String},
+    )
+
+    all_days = np.arange(days)
+    weekdays = np.array([(first + timedelta(days=int(d))).weekday() for d in range(7)])
+    beatdowns, attendance = [], []
+    for j in range(aos + 2):
+        if j < aos:
+            rates = np.where(home_ao == j, rate, 0) + np.where(second_ao == j, rate * 0.25, 0)
+            meets = rng.choice(7, 3, replace=False)
+        else:
+            rates = qsource if names[j] == "qsource" else ruck
+            meets = rng.choice(7, 1)
+        day = all_days[np.isin(weekdays[all_days % 7], meets)]
+        posted = (rng.random((day.size, n)) < rates) & (day[:, None] <= last_day)
+        held = posted.any(axis=1)
+        day, posted = day[held], posted[held]
+        if not day.size:
+            continue
+
+        # the Q and any co-Q are random PAX of the beatdown
+        draw = rng.random(posted.shape) * posted
+        q = draw.argmax(axis=1)
+        draw[np.arange(day.size), q] = 0
+        coq = np.where((posted.sum(axis=1) > 1) & (rng.random(day.size) < 0.05), draw.argmax(axis=1), -1)
+
+        bd_dates = [first + timedelta(days=int(d)) for d in day]
+        q_ids = [user_ids[i] for i in q]
+        if names[j] == "qsource":
+            heads = [f"Q{rng.integers(1, 5)}.{rng.integers(1, 10)} {names[j]} lesson" for _ in day]
+        else:
+            heads = [f"Backblast! {names[j]}" for _ in day]
+        beatdowns.append(
+            pl.DataFrame(
+                {
+                    "ao_id": channels[j],
+                    "bd_date": bd_dates,
+                    "q_user_id": q_ids,
+                    "coq_user_id": [user_ids[i] if i >= 0 else None for i in coq],
+                    "pax_count": posted.sum(axis=1),
+                    "backblast": _text(rng, heads, backblast_chars),
+                },
+                schema_overrides={"coq_user_id": pl.String},
+            )
+        )
+        rows, cols = np.nonzero(posted)
+        attendance.append(
+            pl.DataFrame(
+                {
+                    "user_id": [user_ids[i] for i in cols],
+                    "ao_id": channels[j],
+                    "date": [bd_dates[i] for i in rows],
+                    "q_user_id": [q_ids[i] for i in rows],
+                }
+            )
+        )
+
+    return {
+        "users": users,
+        "aos": ao_table,
+        "beatdowns": pl.concat(beatdowns),
+        "bd_attendance": pl.concat(attendance),
+    }
+
+
+def generate(
+    regions: int = 8,
+    pax: int = 60,
+    aos: int = 8,
+    days: int = 400,
+    travel: float = 0.05,
+    backblast_chars: int = 600,
+    seed: int = 0,
+    end: date | None = None,
+) -> dict[str, dict[str, pl.DataFrame]]:
+    """
+    Generate PAXminer tables for `regions` regions named f3synth000, f3synth001, ...
+
+    :param regions: number of regions
+    :type regions: int
+    :param pax: men whose home is each region, not counting visitors
+    :type pax: int
+    :param aos: workout AOs per region, besides its QSource and ruck AOs
+    :type aos: int
+    :param days: days of beatdowns, ending on `end`. The default reaches into last year, as the Kotter report does.
+    :type days: int
+    :param travel: share of each region's men who also post in the next region
+    :type travel: float
+    :param backblast_chars: average backblast length
+    :type backblast_chars: int
+    :param seed: the random seed
+    :type seed: int
+    :param end: the last day of beatdowns. Defaults to today.
+    :type end: date | None
+    :return: per schema, its users, aos, beatdowns and bd_attendance tables
+    :rtype: dict[str, dict[str, pl.DataFrame]]
+    """
+
+    end = end or date.today()
+    return {
+        f"f3synth{r:03d}": _region(r, regions, pax, aos, days, travel, backblast_chars, seed, end)
+        for r in range(regions)
+    }
+
+
+def attendance_frame(data: dict[str, dict[str, pl.DataFrame]]) -> pl.DataFrame:
+    """
+    Join each region's tables the way the jobs' national extracts do, dropping the PAXminer bot.
+
+    :param data: the tables from `generate`
+    :type data: dict[str, dict[str, pl.DataFrame]]
+    :return: schema, email, user_id, user_name, ao_id, ao, date, q_flag and backblast of every post
+    :rtype: pl.DataFrame
+    """
+
+    frames = []
+    for schema, tables in data.items():
+        frames.append(
+            tables["bd_attendance"]
+            .join(tables["users"], on="user_id")
+            .join(
+                tables["beatdowns"],
+                left_on=["q_user_id", "ao_id", "date"],
+                right_on=["q_user_id", "ao_id", "bd_date"],
+            )
+            .join(tables["aos"].select("channel_id", "ao"), left_on="ao_id", right_on="channel_id")
+            .filter(pl.col("email") != "none", pl.col("user_name") != "PAXminer")
+            .select(
+                pl.lit(schema).alias("schema"),
+                "email",
+                "user_id",
+                "user_name",
+                "ao_id",
+                "ao",
+                "date",
+                ((pl.col("user_id") == pl.col("q_user_id")) | (pl.col("user_id") == pl.col("coq_user_id")))
+                .cast(pl.Int64)
+                .fill_null(0)
+                .alias("q_flag"),
+                "backblast",
+            )
+        )
+    return pl.concat(frames)
+
+
+def home_region_counts(
+    data: dict[str, dict[str, pl.DataFrame]], end: date | None = None, by_user: bool = False
+) -> pl.DataFrame:
+    """
+    Count every man's attendance per region over the home region windows, as `home_regions.home_region_counts_sql`.
+
+    :param data: the tables from `generate`
+    :type data: dict[str, dict[str, pl.DataFrame]]
+    :param end: the day the counts are taken. Defaults to today.
+    :type end: date | None
+    :param by_user: group by user_id as well as email
+    :type by_user: bool
+    :return: region, email, (user_id,) d30, d60, d90, d120 and year
+    :rtype: pl.DataFrame
+    """
+
+    end = end or date.today()
+    days_ago = (pl.lit(end) - pl.col("date")).dt.total_days()
+    this_year = pl.col("date").dt.year() == end.year
+    keys = ["region", "email", "user_id"] if by_user else ["region", "email"]
+    counts = (
+        attendance_frame(data)
+        .rename({"schema": "region"})
+        .filter(this_year | (days_ago < max(WINDOWS)))
+        .group_by(keys)
+        .agg(
+            *((days_ago < days).sum().cast(pl.Int64).alias(f"d{days}") for days in WINDOWS),
+            this_year.sum().cast(pl.Int64).alias("year"),
+        )
+    )
+    return counts if by_user else counts.filter(pl.col("year") > 0)
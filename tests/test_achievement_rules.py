@@ -0,0 +1,115 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+from ..weaselbot.achievement_rules import (
+    DEFAULT_RULES,
+    AchievementRule,
+    aggregate_rules,
+    evaluate_rules,
+    load_rules,
+    partition_aggregates,
+    region_rules,
+)
+
+
+@pytest.fixture
+def nation_data():
+    """Two men in one region; user1 Qs three beatdowns at three AOs and posts at a QSource in January"""
+    return pl.DataFrame(
+        {
+            "email": ["user1@f3.com"] * 4 + ["user2@f3.com"] * 2,
+            "ao_id": ["AO1", "AO2", "AO3", "AO9", "AO1", "AO1"],
+            "ao": ["The Grind", "Iron Pit", "Ruck Club", "QSource", "The Grind", "The Grind"],
+            "date": [date(2025, 1, d) for d in (2, 9, 16, 20)] + [date(2025, 1, 2), date(2025, 2, 2)],
+            "q_flag": [1, 1, 1, 0, 0, 0],
+            "backblast": ["Beatdown", "Beatdown", "Ruck", "Q1.2 lesson", "Beatdown", "Beatdown"],
+            "region": ["f3region1"] * 6,
+        }
+    )
+
+
+def test_rule_validation():
+    """Unknown periods, activities and metrics are rejected"""
+    with pytest.raises(ValueError):
+        AchievementRule("bad", "decade", 1)
+    with pytest.raises(ValueError):
+        AchievementRule("bad", "year", 1, metric="miles")
+
+
+def test_load_rules_file(tmp_path):
+    """A rules file overrides built-in rules field by field and adds new ones"""
+    path = tmp_path / "rules.toml"
+    path.write_text(
+        '[rules.the_priest]\nthreshold = 30\n\n[rules.ruck_q]\nperiod = "month"\nthreshold = 2\nq_only = true\n'
+    )
+
+    rules = load_rules(str(path))
+
+    assert rules["the_priest"] == AchievementRule("the_priest", "year", 30, activity="qsource")
+    assert rules["ruck_q"] == AchievementRule("ruck_q", "month", 2, q_only=True)
+    assert list(rules)[: len(DEFAULT_RULES)] == [rule.code for rule in DEFAULT_RULES]
+
+
+def test_region_rules_match_by_code():
+    """Awards map to rules by code whatever their id, with non-null rule columns applied"""
+    awards = pl.DataFrame(
+        {
+            "id": [7, 3, 5, 9],
+            "code": ["the_boss", "leader_of_men", "custom_award", "custom_rule"],
+            "threshold": [2, None, None, 3],
+            "period": [None, None, None, "month"],
+        }
+    )
+
+    rules = region_rules(awards, load_rules())
+
+    assert rules == {
+        7: AchievementRule("the_boss", "month", 2, q_only=True),
+        3: AchievementRule("leader_of_men", "month", 4, q_only=True),
+        9: AchievementRule("custom_rule", "month", 3),
+    }
+
+
+def test_evaluate_shares_aggregations(nation_data):
+    """Rules sharing a group reuse one aggregation, and thresholds are applied per rule"""
+    rules = {
+        "q3": AchievementRule("q3", "month", 3, q_only=True),
+        "q4": AchievementRule("q4", "month", 4, q_only=True),
+        "aos3": AchievementRule("aos3", "month", 3, q_only=True, metric="aos"),
+        "monk": AchievementRule("monk", "month", 1, activity="qsource"),
+    }
+    cache = aggregate_rules(nation_data, rules.values())
+    assert len(cache) == 2
+
+    result = evaluate_rules(nation_data, rules, region="f3region1", cache=cache)
+
+    # the ruck doesn't count as a beatdown
+    assert result["q3"].is_empty()
+    assert result["aos3"].is_empty()
+    assert result["monk"].rows() == [(1, "user1@f3.com", "f3region1", date(2025, 1, 20))]
+    assert result["q4"].columns == ["month", "email", "region", "date_awarded"]
+    assert evaluate_rules(nation_data, rules, region="f3other", cache=cache)["monk"].is_empty()
+
+
+def test_partitioned_matches_per_region_filter(nation_data):
+    """Partitioned aggregates joined to a national users table give what filtering and joining per region did"""
+    nation = pl.concat([nation_data, nation_data.with_columns(pl.lit("f3region2").alias("region"))])
+    users = pl.DataFrame(
+        {
+            "email": ["user1@f3.com", "user2@f3.com", "user1@f3.com"],
+            "slack_user_id": ["U1", "U2", "U9"],
+            "region": ["f3region1", "f3region1", "f3region2"],
+        }
+    )
+    rules = {rule.code: rule for rule in DEFAULT_RULES} | {"q1": AchievementRule("q1", "week", 1)}
+
+    regional = partition_aggregates(aggregate_rules(nation, rules.values(), users=users), ["f3region2", "f3empty"])
+    by_region = evaluate_rules(nation.filter(pl.col("region") == "f3region2"), rules, cache=regional["f3region2"])
+
+    for code, df in evaluate_rules(nation, rules, region="f3region2").items():
+        expected = df.join(users.filter(pl.col("region") == "f3region2").drop("region"), on="email")
+        assert by_region[code].sort(by_region[code].columns).equals(expected.sort(expected.columns))
+    assert by_region["q1"].get_column("slack_user_id").to_list() == ["U9"] * 2
+    assert all(df.is_empty() for df in regional["f3empty"].values())
@@ -0,0 +1,37 @@
+import polars as pl
+from sqlalchemy import Column, MetaData, String, Table, create_engine, select
+
+from ..weaselbot.activity import activity_expr, activity_sql
+
+CASES = [
+    # backblast, ao, activity
+    ("Regular workout", "The Grind", "beatdown"),
+    ("QSource 1.2 lesson on fitness", "The Grind", "qsource"),
+    ("Q2.3 Leadership\nmore text", "Coffeeteria", "qsource"),
+    ("Regular workout", "Q Source", "qsource"),
+    ("Ruck with coupons", "Ruck Club", "ruck"),
+    (None, "Q-Source", "qsource"),
+    (None, "Ruck Club", "ruck"),
+    (None, "The Grind", None),
+    ("Regular workout", None, None),
+    ("A long beatdown backblast " * 4 + "QSource", "The Grind", "beatdown"),
+    ("x" * 80 + " q source", "The Grind", "qsource"),
+]
+
+
+def test_activity_expr():
+    """The Polars classification labels QSources, rucks and beatdowns, leaving undecidable rows null"""
+    df = pl.DataFrame(CASES, schema=["backblast", "ao", "expected"], orient="row")
+    assert df.select(activity_expr()).to_series().to_list() == df.get_column("expected").to_list()
+
+
+def test_activity_sql_matches_expr():
+    """The server-side CASE expression agrees with the Polars classification"""
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    t = Table("beatdowns", metadata, Column("backblast", String), Column("ao", String))
+    metadata.create_all(engine)
+    with engine.begin() as cnxn:
+        cnxn.execute(t.insert(), [{"backblast": bb, "ao": ao} for bb, ao, _ in CASES])
+        result = cnxn.execute(select(activity_sql(t.c.backblast, t.c.ao))).scalars().all()
+    assert result == [expected for _, _, expected in CASES]
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from ..weaselbot import daily_extract as daily
+from ..weaselbot.daily_extract import EXTRACT_WEEKS
+
+
+def _fake_extracts(monkeypatch, tmp_path, failing=()):
+    """Stand in for PAXminer: every region has one post a week for a year, and one home region count row"""
+
+    calls = []
+    today = date.today()
+    monkeypatch.setenv("WEASELBOT_CACHE_DIR", str(tmp_path / "cache"))
+
+    def extract_incremental(store, build_queries, schemas, engine, start=None, casts=None, tag=None):
+        calls.append(("attendance", tuple(schemas), start))
+        for schema in schemas:
+            if schema not in failing:
+                store.merge(schema, pl.DataFrame(), store.since(schema, start))
+        return pl.DataFrame(
+            [
+                (schema, f"{n}@x", f"U{n}", f"pax{n}", "C1", "c1", today - timedelta(weeks=w), 0, "bootcamp")
+                for n, schema in enumerate(schemas)
+                for w in range(52)
+                if start is None or today - timedelta(weeks=w) >= start
+            ],
+            schema=["schema", "email", "user_id", "user_name", "ao_id", "ao", "date", "q_flag", "activity"],
+            orient="row",
+        )
+
+    def extract_schemas(queries, engine, **kwargs):
+        calls.append(("counts", tuple(queries), None))
+        return pl.DataFrame(
+            {"region": list(queries), "email": [f"{n}@x" for n in range(len(queries))], "year": 1}
+        ), pl.DataFrame()
+
+    monkeypatch.setattr(daily, "extract_incremental", extract_incremental)
+    monkeypatch.setattr(daily, "extract_schemas", extract_schemas)
+    monkeypatch.setattr(
+        daily, "home_region_queries", lambda schemas, *args, **kwargs: dict.fromkeys(schemas["schema_name"])
+    )
+    return calls
+
+
+def test_second_run_reuses_the_days_extract(monkeypatch, tmp_path):
+    """The first job builds the day's artifact and the second memory-maps it instead of querying again"""
+
+    calls = _fake_extracts(monkeypatch, tmp_path)
+    today = date.today()
+
+    first = daily.daily_extract(
+        None, None, ["f3alpha", "f3beta"], start=date(today.year, 1, 1), path=str(tmp_path / "extracts")
+    )
+    second = daily.daily_extract(
+        None, None, ["f3beta"], start=today - timedelta(weeks=4), path=str(tmp_path / "extracts")
+    )
+
+    assert [kind for kind, _, _ in calls] == ["attendance", "counts"]
+    assert first.start == min(date(today.year, 1, 1), today - timedelta(weeks=EXTRACT_WEEKS))
+    assert second.start == first.start
+    assert_frame_equal(first.attendance, second.attendance)
+    assert_frame_equal(first.counts, second.counts)
+    assert sorted(p.name for p in (tmp_path / "extracts").iterdir()) == [".lock", today.isoformat()]
+
+
+def test_wider_request_rebuilds_the_days_extract(monkeypatch, tmp_path):
+    """An earlier start or a new region rebuilds the artifact to cover everything asked for today"""
+
+    calls = _fake_extracts(monkeypatch, tmp_path)
+    today = date.today()
+    (tmp_path / "extracts" / "2000-01-01").mkdir(parents=True)
+
+    daily.daily_extract(None, None, ["f3alpha"], start=today, path=str(tmp_path / "extracts"))
+    wider = daily.daily_extract(None, None, ["f3beta"], start=today, path=str(tmp_path / "extracts"))
+    earlier = daily.daily_extract(None, None, ["f3alpha"], start=None, path=str(tmp_path / "extracts"))
+    daily.daily_extract(None, None, ["f3alpha", "f3beta"], start=date(2000, 1, 1), path=str(tmp_path / "extracts"))
+
+    assert calls[::2] == [
+        ("attendance", ("f3alpha",), wider.start),
+        ("attendance", ("f3alpha", "f3beta"), wider.start),
+        ("attendance", ("f3alpha", "f3beta"), None),
+    ]
+    assert set(wider.attendance.get_column("schema")) == {"f3alpha", "f3beta"}
+    assert earlier.start is None and earlier.attendance.height == 2 * 52
+    assert sorted(p.name for p in (tmp_path / "extracts").iterdir()) == [".lock", today.isoformat()]
+
+
+def test_manifest_records_the_history_actually_covered(monkeypatch, tmp_path):
+    """A region whose earlier history couldn't be fetched leaves the artifact starting later, so it's rebuilt"""
+
+    today = date.today()
+    calls = _fake_extracts(monkeypatch, tmp_path)
+    daily.daily_extract(None, None, ["f3alpha", "f3beta"], start=today, path=str(tmp_path / "extracts"))
+    first = calls[0][2]
+
+    calls = _fake_extracts(monkeypatch, tmp_path, failing=("f3beta",))
+    earlier = daily.daily_extract(None, None, ["f3alpha"], start=date(2000, 1, 1), path=str(tmp_path / "extracts"))
+    assert earlier.start == first
+
+    daily.daily_extract(None, None, ["f3alpha"], start=date(2000, 1, 1), path=str(tmp_path / "extracts"))
+    assert [kind for kind, _, _ in calls] == ["attendance", "counts"] * 2
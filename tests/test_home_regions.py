@@ -0,0 +1,161 @@
+import random
+from datetime import date, timedelta
+
+import polars as pl
+import pytest
+from sqlalchemy import Column, Date, MetaData, String, Table, create_engine, event
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import and_, case, func, literal_column, select, union_all
+
+from ..weaselbot.home_regions import home_region_counts_sql, resolve_home_regions
+
+TODAY = date(2025, 2, 10)  # windows reach back into the previous year
+SCHEMAS = ("f3alpha", "f3beta", "f3gamma")
+
+
+def _tables(metadata, schema):
+    u = Table("users", metadata, Column("user_id", String), Column("email", String), schema=schema)
+    a = Table(
+        "bd_attendance",
+        metadata,
+        Column("user_id", String),
+        Column("ao_id", String),
+        Column("q_user_id", String),
+        Column("date", Date),
+        schema=schema,
+    )
+    b = Table(
+        "beatdowns",
+        metadata,
+        Column("ao_id", String),
+        Column("bd_date", Date),
+        Column("q_user_id", String),
+        schema=schema,
+    )
+    ao = Table("aos", metadata, Column("channel_id", String), Column("ao", String), schema=schema)
+    return u, a, b, ao
+
+
+def _legacy_sub_query(u, a, b, ao, date_range):
+    """The pre single-pass attendance count over one look-back window"""
+    return (
+        select(u.c.email, func.count(a.c.user_id).label("attendance"))
+        .select_from(
+            u.join(a, a.c.user_id == u.c.user_id)
+            .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
+            .join(ao, b.c.ao_id == ao.c.channel_id)
+        )
+        .where(func.datediff(func.curdate(), b.c.bd_date) < date_range)
+        .group_by(u.c.email)
+        .subquery()
+    )
+
+
+def _legacy_home_region_sql(schema, u, a, b, ao, by_user):
+    """The pre single-pass query: four correlated window subqueries outer-joined per schema"""
+    s1, s2, s3, s4 = (_legacy_sub_query(u, a, b, ao, date_range) for date_range in (30, 60, 90, 120))
+    keys = [u.c.email, u.c.user_id] if by_user else [u.c.email]
+    return (
+        select(
+            literal_column(f"'{schema}'").label("region"),
+            *keys,
+            case(
+                (s1.c.attendance.is_not(None), s1.c.attendance),
+                (s2.c.attendance.is_not(None), s2.c.attendance),
+                (s3.c.attendance.is_not(None), s3.c.attendance),
+                (s4.c.attendance.is_not(None), s4.c.attendance),
+                else_=func.count(a.c.user_id),
+            ).label("attendance"),
+        )
+        .select_from(
+            u.join(a, a.c.user_id == u.c.user_id)
+            .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
+            .join(ao, b.c.ao_id == ao.c.channel_id)
+            .outerjoin(s1, u.c.email == s1.c.email)
+            .outerjoin(s2, u.c.email == s2.c.email)
+            .outerjoin(s3, u.c.email == s3.c.email)
+            .outerjoin(s4, u.c.email == s4.c.email)
+        )
+        .where(func.year(b.c.bd_date) == func.year(func.curdate()))
+        .group_by(literal_column(f"'{schema}'"), *keys)
+    )
+
+
+@pytest.fixture(scope="module")
+def paxminer():
+    """SQLite stand-in for three PAXminer schemas with MySQL's date functions registered"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def setup(dbapi_connection, connection_record):
+        for schema in SCHEMAS:
+            dbapi_connection.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+        dbapi_connection.create_function("curdate", 0, lambda: TODAY.isoformat())
+        dbapi_connection.create_function("year", 1, lambda d: date.fromisoformat(d).year)
+        dbapi_connection.create_function(
+            "datediff", 2, lambda d1, d2: (date.fromisoformat(d1) - date.fromisoformat(d2)).days
+        )
+
+    metadata = MetaData()
+    tables = {schema: _tables(metadata, schema) for schema in SCHEMAS}
+    metadata.create_all(engine)
+
+    rng = random.Random(42)
+    emails = [f"pax{i}@f3.com" for i in range(40)]
+    with engine.begin() as cnxn:
+        for schema, (u, a, b, ao) in tables.items():
+            cnxn.execute(ao.insert(), [{"channel_id": f"{schema}-ao{i}", "ao": f"AO {i}"} for i in range(3)])
+            members = rng.sample(emails, 25)
+            # a few men have two user_ids in one region
+            users = [{"user_id": f"{schema}-{e}", "email": e} for e in members]
+            users += [{"user_id": f"{schema}-{e}-alt", "email": e} for e in members[:3]]
+            cnxn.execute(u.insert(), users)
+            beatdowns = {}
+            for _ in range(300):
+                bd = (f"{schema}-ao{rng.randrange(3)}", TODAY - timedelta(days=rng.randrange(-3, 200)))
+                beatdowns.setdefault(bd, rng.choice(users)["user_id"])
+            cnxn.execute(
+                b.insert(), [{"ao_id": ao_id, "bd_date": d, "q_user_id": q} for (ao_id, d), q in beatdowns.items()]
+            )
+            attendance = set()
+            for (ao_id, d), q in beatdowns.items():
+                for user in rng.sample(users, rng.randrange(1, 8)):
+                    attendance.add((user["user_id"], ao_id, q, d))
+            cnxn.execute(
+                a.insert(), [{"user_id": x, "ao_id": y, "q_user_id": q, "date": d} for x, y, q, d in attendance]
+            )
+    yield engine, tables
+    engine.dispose()
+
+
+@pytest.mark.parametrize("by_user", [False, True])
+def test_single_pass_matches_legacy(paxminer, by_user):
+    """Single-pass counts + arg-max pick the same home region and attendance as the legacy union query"""
+    engine, tables = paxminer
+
+    def read(queries):
+        with engine.begin() as cnxn:
+            return pl.DataFrame([dict(r._mapping) for r in cnxn.execute(union_all(*queries))])
+
+    legacy = read(_legacy_home_region_sql(s, *t, by_user) for s, t in tables.items())
+    counts = read(home_region_counts_sql(s, *t, by_user) for s, t in tables.items())
+    new = resolve_home_regions(counts, by_user=by_user)
+
+    # the legacy per-email pick has no defined tie-break, so compare the winning attendance for every email
+    # and the winning region where it is unambiguous
+    legacy_best = legacy.group_by("email").agg(
+        pl.col("attendance").max(), (pl.col("attendance") == pl.col("attendance").max()).sum().alias("n_best")
+    )
+    legacy_pick = legacy.group_by("email").agg(pl.all().sort_by("attendance").last())
+    compared = new.join(legacy_best, on="email", suffix="_legacy", how="full", coalesce=True)
+    assert compared.height == new.height == legacy_best.height
+    assert (compared.get_column("attendance") == compared.get_column("attendance_legacy")).all()
+
+    unambiguous = legacy_best.filter(pl.col("n_best") == 1).get_column("email").implode()
+    keys = ["email", "region", "user_id"] if by_user else ["email", "region"]
+    assert (
+        new.filter(pl.col("email").is_in(unambiguous))
+        .select(keys)
+        .sort("email")
+        .equals(legacy_pick.filter(pl.col("email").is_in(unambiguous)).select(keys).sort("email"))
+    )
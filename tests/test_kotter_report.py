@@ -0,0 +1,189 @@
+import random
+from datetime import date, timedelta
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from ..weaselbot.kotter_report import (
+    KOTTER_THRESHOLDS,
+    build_kotter_frames,
+    build_kotter_report,
+    classify_kotter,
+    kotter_cutoffs,
+    kotter_messages,
+    lifetime_summary,
+    lookback_start,
+    preflight_regions,
+)
+from ..weaselbot.region_context import RegionContext
+
+SETTINGS = (2, 4, 6, 4, 8)  # NO_POST_THRESHOLD, NO_Q_THRESHOLD_WEEKS, REMINDER_WEEKS, ..._POSTS, HOME_AO_CAPTURE
+
+
+def _posts(seed=0, pax=40, days=900):
+    """Years of posts at three AOs, for men who stop posting at random points"""
+    rng = random.Random(seed)
+    today = date.today()
+    rows = []
+    for i in range(pax):
+        last = rng.randrange(0, days // 4)
+        for day in range(last, days, rng.choice((2, 3, 7))):
+            ao = rng.choice(("C1", "C2", "C3"))
+            q = int(rng.random() < (0.1 if i % 3 else 0.002))
+            rows.append((f"pax{i}@example.com", f"U{i}", ao, ao.lower(), today - timedelta(days=day), q))
+    return pl.DataFrame(rows, schema=["email", "user_id", "ao_id", "ao", "date", "q_flag"], orient="row").with_columns(
+        pl.lit("f3test").alias("region")
+    )
+
+
+def test_windowed_frames_match_full_history():
+    """The lookback window and a lifetime summary give the same report as every post ever"""
+
+    df = _posts()
+    siteq = pl.DataFrame({"home_ao": ["C1", "C2"], "ao": ["c1", "c2"], "site_q_user_id": ["U1", "U2"]})
+    start = lookback_start([{"REMINDER_WEEKS": SETTINGS[2], "HOME_AO_CAPTURE": SETTINGS[4]}])
+
+    full = build_kotter_frames(df, siteq, *SETTINGS)
+    windowed = build_kotter_frames(df.filter(pl.col("date") >= start), siteq, *SETTINGS, lifetime_summary(df))
+
+    assert sum(f.height for f in full) > 0
+    for expected, actual in zip(full, windowed, strict=True):
+        assert_frame_equal(expected.sort("user_id"), actual.sort("user_id"))
+
+
+def test_classify_kotter_matches_each_region_alone():
+    """Classifying every region at once, each with its own thresholds, is the same as one region at a time"""
+
+    thresholds = {"f3alpha": SETTINGS, "f3beta": (1, 3, 10, 2, 4)}
+    df = pl.concat(
+        _posts(seed=n).with_columns(pl.col("email", "user_id") + region, region=pl.lit(region))
+        for n, region in enumerate(thresholds)
+    )
+    siteqs = pl.DataFrame(
+        {
+            "region": ["f3alpha", "f3alpha", "f3beta"],
+            "home_ao": ["C1", "C2", "C3"],
+            "ao": ["c1", "c2", "c3"],
+            "site_q_user_id": ["U1", "U2", "U3"],
+        }
+    )
+    cutoffs = kotter_cutoffs({r: dict(zip(KOTTER_THRESHOLDS, t, strict=True)) for r, t in thresholds.items()})
+
+    national = classify_kotter(df, siteqs, cutoffs, lifetime_summary(df))
+
+    for region, settings in thresholds.items():
+        alone = build_kotter_frames(
+            df.filter(pl.col("region") == region), siteqs.filter(pl.col("region") == region).drop("region"), *settings
+        )
+        assert sum(f.height for f in alone) > 0
+        for expected, actual in zip(alone, national, strict=True):
+            assert_frame_equal(expected, actual.filter(pl.col("region") == region).drop("region"))
+
+
+def test_home_ao_ties_go_to_the_first_ao():
+    """A man who posted equally at two AOs is always counted at the first"""
+
+    today = date.today()
+    df = pl.DataFrame(
+        {
+            "email": ["pax@example.com"] * 4,
+            "user_id": ["U1"] * 4,
+            "ao_id": ["C2", "C1", "C2", "C1"],
+            "ao": ["c2", "c1", "c2", "c1"],
+            "date": [today - timedelta(weeks=w) for w in (3, 4, 5, 6)],
+            "q_flag": [0] * 4,
+            "region": ["f3test"] * 4,
+        }
+    )
+    siteq = pl.DataFrame({"home_ao": ["C1", "C2"], "ao": ["c1", "c2"], "site_q_user_id": ["U8", "U9"]})
+
+    for rows in (df, df.reverse()):
+        df_mia, _, _ = build_kotter_frames(rows, siteq, *SETTINGS)
+        assert df_mia.select("home_ao", "site_q_user_id").rows() == [("C1", "U8")]
+
+
+def test_lifetime_summary_combines_regions():
+    """Per-region summaries combine to the summary of all posts"""
+
+    df = _posts(seed=1).with_columns(region=pl.when(pl.col("ao_id") == "C3").then(pl.lit("b")).otherwise(pl.lit("a")))
+    by_region = pl.concat(lifetime_summary(part) for part in df.partition_by("region"))
+
+    assert_frame_equal(lifetime_summary(by_region).sort("email"), lifetime_summary(df).sort("email"))
+
+
+def test_lookback_start_is_the_widest_window():
+    settings = [
+        {"REMINDER_WEEKS": 6, "HOME_AO_CAPTURE": 8},
+        {"REMINDER_WEEKS": 12, "HOME_AO_CAPTURE": None},
+        {},
+    ]
+
+    assert lookback_start(settings) == date.today() - timedelta(weeks=12)
+    assert lookback_start([{}]) is None
+
+
+def test_preflight_prunes_regions_without_shared_pax():
+    """Only reporting regions, and regions sharing a man with one, are extracted"""
+
+    siteq = pl.DataFrame({"home_ao": ["C1"], "ao": ["c1"], "site_q_user_id": ["U1"]})
+    contexts = {
+        "f3alpha": RegionContext("f3alpha", {"slack_token": "x"}, {"siteq": siteq}),
+        "f3beta": RegionContext("f3beta"),
+        "f3gamma": RegionContext("f3gamma", {"slack_token": "y"}, {}),
+    }
+    emails = pl.DataFrame(
+        {
+            "email": ["a@x", "b@x", "b@x", "c@x", "d@x", "e@x"],
+            "schema": ["f3alpha", "f3alpha", "f3beta", "f3gamma", "f3delta", "f3delta"],
+        }
+    )
+    schemas = ["f3alpha", "f3beta", "f3gamma", "f3delta", "f3unread"]
+
+    participating, extract, pruned = preflight_regions(schemas, contexts, emails)
+
+    assert participating == ["f3alpha"]
+    assert extract == ["f3alpha", "f3beta", "f3unread"]
+    assert pruned == {
+        "f3gamma": "site Qs that couldn't be read",
+        "f3delta": "no site_q_user_id column on the aos table",
+    }
+
+
+def test_kotter_messages_one_report_per_site_q():
+    """A site Q of several AOs gets one report of all his men, and the default site Q a report of everyone"""
+
+    today = date.today()
+    siteq_df = pl.DataFrame(
+        {"home_ao": ["C1", "C2", "C3"], "ao": ["c1", "c2", "c3"], "site_q_user_id": ["U1", "U1", "U3"]}
+    )
+    df_mia = pl.DataFrame(
+        {"user_id": ["U10", "U11"], "home_ao": ["C1", "C9"], "date": ["May 01, 2025", "May 02, 2025"]}
+    ).join(siteq_df, on="home_ao", how="left")
+    df_lowq = pl.DataFrame(
+        {
+            "user_id": ["U12", "U13"],
+            "home_ao": ["C2", "C1"],
+            "date": [today - timedelta(days=30), today - timedelta(days=9)],
+        }
+    ).join(siteq_df, on="home_ao", how="left")
+    df_noq = pl.DataFrame({"user_id": ["U14"], "home_ao": ["C2"]}).join(siteq_df, on="home_ao", how="left")
+
+    messages = kotter_messages(siteq_df, df_mia, df_lowq, df_noq, "CDEFAULT")
+
+    assert [recipient for recipient, _ in messages] == ["U1", "CDEFAULT"]
+    assert messages[0][1] == (
+        "Howdy, <@U1>! This is your weekly WeaselBot Site Q report. According to my records..."
+        "\n\nThe following men haven't posted in a while.\n- <@U10> last posted May 01, 2025"
+        "\n\nThese guys haven't Q'd in a while. Here's how many days it's been:\n- <@U13>: 9!\n- <@U12>: 30!"
+        "\n\nThese guys have never been Q:\n- <@U14>"
+    )
+    assert messages[1][1].startswith("Howdy, <!channel>!")
+    assert "<@U11> last posted" in messages[1][1] and messages[1][1].endswith("gone out to them as well.")
+
+
+def test_build_kotter_report_without_anyone_to_list():
+    empty = pl.DataFrame(schema={"user_id": pl.String, "date": pl.Date, "site_q_user_id": pl.String})
+
+    assert build_kotter_report(empty, empty, empty, None) == (
+        "Howdy, <!channel>! This is your weekly WeaselBot Site Q report. According to my records..."
+    )
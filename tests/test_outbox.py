@@ -0,0 +1,184 @@
+import sqlite3
+from contextlib import closing
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
+
+from ..weaselbot.outbox import AwardOutbox
+from ..weaselbot.pax_achievements import resume_outbox
+from ..weaselbot.slack_dispatch import SlackOutcome
+
+
+def _award(pax_id, achievement_id=1, period=2025):
+    return {"achievement_id": achievement_id, "pax_id": pax_id, "period": period, "date_awarded": date(2025, 4, 1)}
+
+
+def _message(text):
+    return {"channel": "C1", "text": text, "blocks": None, "reaction": "fire"}
+
+
+def test_outbox_tracks_progress_across_runs(tmp_path):
+    """A reopened outbox knows what was announced, what still needs sending and which regions finished"""
+    path = str(tmp_path / "outbox.sqlite")
+    outbox = AwardOutbox(path)
+    sent, unsent = outbox.stage("f3alpha", [(_message("one"), [_award("U1")]), (_message("two"), [_award("U2")])])
+    outbox.mark_sent([sent])
+    outbox.finish_region("f3beta", date(2025, 4, 1))
+
+    # the process died here
+    outbox = AwardOutbox(path)
+    assert outbox.announced("f3alpha") == {(1, "U1", 2025, 2025)}
+    assert outbox.unsent().select("region", "id", "text").rows() == [("f3alpha", unsent, "two")]
+    assert sorted(outbox.unloaded().get_column("status").to_list()) == ["pending", "sent"]
+    assert outbox.finished_regions(date(2025, 4, 1)) == {"f3beta"}
+    assert outbox.finished_regions(date(2025, 4, 2)) == set()
+
+    # re-staging moves a pending award to the new message but leaves announced ones alone
+    (retry,) = outbox.stage("f3alpha", [(_message("again"), [_award("U1"), _award("U2")])])
+    outbox.mark_sent([retry])
+    assert outbox.unsent().is_empty()
+    assert outbox.announced("f3alpha") == {(1, "U1", 2025, 2025), (1, "U2", 2025, 2025)}
+
+    outbox.mark_loaded("f3alpha")
+    outbox.complete_run()
+    assert outbox.unloaded().is_empty() and outbox.finished_regions(date(2025, 4, 1)) == set()
+
+
+def test_outbox_only_holds_back_sent_awards_of_the_same_year(tmp_path):
+    """Loaded awards, and the same week the next year, are announced even if an earlier run never completed"""
+    outbox = AwardOutbox(str(tmp_path / "outbox.sqlite"))
+    week = {"achievement_id": 13, "pax_id": "U1", "period": 14}
+    (loaded,) = outbox.stage("f3alpha", [(_message("loaded"), [_award("U2")])])
+    outbox.mark_sent([loaded])
+    outbox.mark_loaded("f3alpha")
+    # a later run announced this one, then failed to load it
+    (sent,) = outbox.stage("f3alpha", [(_message("sent"), [{**week, "date_awarded": date(2025, 4, 1)}])])
+    outbox.mark_sent([sent])
+
+    assert outbox.announced("f3alpha") == {(13, "U1", 2025, 14)}
+    (next_year,) = outbox.stage("f3alpha", [(_message("again"), [{**week, "date_awarded": date(2026, 4, 1)}])])
+    assert outbox.unsent().get_column("id").to_list() == [next_year]
+
+
+def test_outbox_migrates_the_old_award_key(tmp_path):
+    """An outbox written before the award year was part of the key keeps its awards"""
+    path = tmp_path / "outbox.sqlite"
+    with closing(sqlite3.connect(path)) as cnxn, cnxn:
+        cnxn.execute(
+            "CREATE TABLE awards (region TEXT NOT NULL, achievement_id INTEGER NOT NULL, pax_id TEXT NOT NULL, "
+            "period INTEGER NOT NULL, date_awarded TEXT NOT NULL, message_id INTEGER, "
+            "status TEXT NOT NULL DEFAULT 'pending', PRIMARY KEY (region, achievement_id, pax_id, period))"
+        )
+        cnxn.execute("INSERT INTO awards VALUES ('f3alpha', 13, 'U1', 14, '2025-04-01', NULL, 'sent')")
+
+    assert AwardOutbox(str(path)).announced("f3alpha") == {(13, "U1", 2025, 14)}
+
+
+@pytest.fixture
+def awarded_engine():
+    """SQLite with a region token, and an achievements_awarded table (also in a stand-in information_schema)
+    already holding one of the staged awards"""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, connection_record):
+        for schema in ("weaselbot", "f3alpha", "information_schema"):
+            dbapi_connection.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+
+    with engine.begin() as cnxn:
+        cnxn.execute(text("CREATE TABLE weaselbot.regions (paxminer_schema VARCHAR(45), slack_token VARCHAR(100))"))
+        cnxn.execute(text("INSERT INTO weaselbot.regions VALUES ('f3alpha', 'xoxb-alpha')"))
+        cnxn.execute(
+            text(
+                "CREATE TABLE f3alpha.achievements_awarded (id INTEGER PRIMARY KEY, achievement_id INTEGER, "
+                "pax_id VARCHAR(45), date_awarded DATE)"
+            )
+        )
+        cnxn.execute(text("INSERT INTO f3alpha.achievements_awarded VALUES (1, 1, 'U1', '2025-04-01')"))
+        cnxn.execute(
+            text(
+                "CREATE TABLE information_schema.COLUMNS (TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, "
+                "ORDINAL_POSITION, DATA_TYPE, IS_NULLABLE, COLUMN_KEY)"
+            )
+        )
+        cnxn.execute(
+            text(
+                "INSERT INTO information_schema.COLUMNS VALUES "
+                "('f3alpha', 'achievements_awarded', 'id', 1, 'int', 'NO', 'PRI'), "
+                "('f3alpha', 'achievements_awarded', 'achievement_id', 2, 'int', 'YES', ''), "
+                "('f3alpha', 'achievements_awarded', 'pax_id', 3, 'varchar', 'YES', ''), "
+                "('f3alpha', 'achievements_awarded', 'date_awarded', 4, 'date', 'YES', '')"
+            )
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_resume_sends_and_loads_leftovers_once(tmp_path, awarded_engine):
+    """Unsent messages are sent, unloaded awards are loaded unless already there, and a second resume is a no-op"""
+    outbox = AwardOutbox(str(tmp_path / "outbox.sqlite"))
+    sent, _ = outbox.stage("f3alpha", [(_message("one"), [_award("U1")]), (_message("two"), [_award("U2")])])
+    outbox.mark_sent([sent])
+
+    dispatched = []
+
+    class FakeDispatcher:
+        def __init__(self):
+            self.queue = []
+
+        def submit(self, message):
+            self.queue.append(message)
+
+        def run(self):
+            dispatched.extend(self.queue)
+            return [SlackOutcome(m, ts="1.0") for m in self.queue]
+
+    with patch(f"{resume_outbox.__module__}.SlackDispatcher", FakeDispatcher):
+        resume_outbox(outbox, awarded_engine)
+        resume_outbox(outbox, awarded_engine)
+
+    assert [(m.token, m.text) for m in dispatched] == [("xoxb-alpha", "two")]
+    with awarded_engine.connect() as cnxn:
+        rows = cnxn.execute(text("SELECT pax_id FROM f3alpha.achievements_awarded ORDER BY pax_id")).scalars().all()
+    assert rows == ["U1", "U2"]
+    assert outbox.unloaded().is_empty()
+
+
+def test_resume_resends_the_digest_parts_a_crash_left_behind(tmp_path, awarded_engine):
+    """Later digest parts carry no awards of their own, but are still resent once the first part is out"""
+    outbox = AwardOutbox(str(tmp_path / "outbox.sqlite"))
+    part1, part2, part3 = outbox.stage(
+        "f3alpha",
+        [
+            (_message("digest 1/3"), [_award("U2"), _award("U3")]),
+            (_message("digest 2/3"), []),
+            (_message("digest 3/3"), []),
+        ],
+    )
+    outbox.mark_sent([part1])
+    # the process died before parts 2 and 3 went out
+
+    assert outbox.unsent().get_column("id").to_list() == [part2, part3]
+    assert outbox.announced("f3alpha") == {(1, "U2", 2025, 2025), (1, "U3", 2025, 2025)}
+
+    dispatched = []
+
+    class FakeDispatcher:
+        def __init__(self):
+            self.queue = []
+
+        def submit(self, message):
+            self.queue.append(message)
+
+        def run(self):
+            dispatched.extend(self.queue)
+            return [SlackOutcome(m, ts="1.0") for m in self.queue]
+
+    with patch(f"{resume_outbox.__module__}.SlackDispatcher", FakeDispatcher):
+        resume_outbox(AwardOutbox(str(tmp_path / "outbox.sqlite")), awarded_engine)
+
+    assert [m.text for m in dispatched] == ["digest 2/3", "digest 3/3"]
+    assert outbox.unsent().is_empty()
@@ -1,13 +1,14 @@
+import random
 import pytest
 import polars as pl
-from datetime import date, datetime
+from datetime import date, timedelta
 from unittest.mock import MagicMock, patch
-from sqlalchemy import MetaData, Table, Column, String, Integer, DateTime, select
+from sqlalchemy import MetaData, Table, Column, String, Integer, Date, DateTime, create_engine, event, select
 from sqlalchemy.sql import text
 
+from ..weaselbot.home_regions import WINDOWS, home_region_counts_sql
 from ..weaselbot.pax_achievements import (
-    home_region_sub_query,
-    build_home_regions,
+    build_achievements,
     the_priest,
     the_monk,
     leader_of_men,
@@ -75,18 +76,18 @@ def mock_tables(mock_engine, mock_metadata):
     )
     return users, bd_attendance, beatdowns, aos
 
-def test_home_region_sub_query(mock_tables):
-    """Test home region subquery generation"""
+def test_home_region_counts_sql(mock_tables):
+    """Test home region count query generation"""
     u, a, b, ao = mock_tables
-    date_range = 30
-    
-    query = home_region_sub_query(u, a, b, ao, date_range)
-    
+
+    query = home_region_counts_sql('test_schema', u, a, b, ao)
+
     assert "SELECT" in str(query)
-    assert "count" in str(query)
+    assert "sum" in str(query)
     assert "WHERE" in str(query)
     assert "GROUP BY" in str(query)
-    assert str(date_range) in str(query.compile(compile_kwargs={"literal_binds": True}))
+    assert [c.name for c in query.selected_columns] == ['region', 'email', *(f'd{days}' for days in WINDOWS), 'year']
+
 
 def test_the_priest_achievement(sample_data):
     """Test The Priest achievement calculation"""
@@ -148,38 +149,11 @@ def test_hdtf_achievement(sample_data):
     assert 'email' in result.columns
     assert 'region' in result.columns
 
-@patch('weaselbot.weaselbot.achievement_tables.mysql_connection')
-def test_load_to_database(mock_conn, mock_engine, mock_metadata):
-    """Test database loading functionality"""
-    schema = 'test_schema'
-    data_to_load = pl.DataFrame({
-        'achievement_id': [1],
-        'pax_id': ['USER1'],
-        'date_awarded': [datetime.now()]
-    })
-    
-    # Mock table
-    achievement_table = Table(
-        'achievements_awarded', mock_metadata,
-        Column('achievement_id', Integer),
-        Column('pax_id', String),
-        Column('date_awarded', DateTime),
-        schema=schema
-    )
-    
-    # Test load_to_database function
-    load_to_database(schema, mock_engine, mock_metadata, data_to_load)
-    
-    # Verify execution
-    mock_engine.begin.assert_called_once()
-    mock_engine.begin().__enter__().execute.assert_called_once()
-
-
-@pytest.mark.parametrize("date_range", [30, 60, 90, 120])
+@pytest.mark.parametrize("date_range", WINDOWS)
 def test_home_region_date_ranges(mock_tables, date_range):
     """Test home region queries with different date ranges"""
     u, a, b, ao = mock_tables
-    query = home_region_sub_query(u, a, b, ao, date_range)
+    query = home_region_counts_sql('test_schema', u, a, b, ao)
     
     # Compile query once with literals for inspection
     compiled_str = str(query.compile(compile_kwargs={"literal_binds": True}))
@@ -191,4 +165,99 @@ def test_home_region_date_ranges(mock_tables, date_range):
     assert "GROUP BY" in compiled_str
     
     # Verify date range appears in DATEDIFF context
-    assert f"datediff(curdate(), test_schema.beatdowns.bd_date) < {date_range}" in compiled_str.lower()
\ No newline at end of file
+    assert f"datediff(curdate(), test_schema.beatdowns.bd_date) < {date_range}" in compiled_str.lower()
+
+@pytest.fixture
+def nation_data():
+    """A year of random national attendance covering QSource, rucks and beatdowns"""
+    rng = random.Random(7)
+    aos = [('AO1', 'The Grind'), ('AO2', 'QSource'), ('AO3', 'Ruck Club'), ('AO4', 'Iron Pit')]
+    backblasts = ['Regular workout', 'Q Source 1.1', 'qsource lesson', 'q2.3 Leadership', None]
+    rows = []
+    for _ in range(5000):
+        ao_id, ao = rng.choice(aos)
+        rows.append({
+            'email': f"user{rng.randrange(20)}@f3.com",
+            'ao_id': ao_id,
+            'ao': ao,
+            'date': date(2025, 1, 1) + timedelta(days=rng.randrange(365)),
+            'q_flag': int(rng.random() < 0.3),
+            'backblast': rng.choice(backblasts),
+            'region': rng.choice(['f3region1', 'f3region2']),
+        })
+    return pl.DataFrame(rows)
+
+def test_build_achievements_fused_matches_eager(nation_data):
+    """The rule engine returns the same achievement frames as the hand-coded functions"""
+    fused = build_achievements(nation_data)
+    eager = build_achievements(nation_data, fused=False)
+
+    assert len(fused) == len(eager) == 14
+    for f, e in zip(fused, eager):
+        assert isinstance(f, pl.DataFrame)
+        assert f.columns == e.columns
+        assert f.sort(f.columns).equals(e.sort(e.columns))
+    assert any(not f.is_empty() for f in fused)
+
+
+@pytest.mark.parametrize('unique_key', [', UNIQUE (achievement_id, pax_id, date_awarded)', ''])
+def test_load_to_database_batches_and_ignores_duplicates(unique_key):
+    """Rows go in bounded batches, and loading them again inserts nothing, with or without the unique key"""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS f3alpha")
+
+    with engine.begin() as cnxn:
+        cnxn.execute(text(
+            "CREATE TABLE f3alpha.achievement_awarded (id INTEGER PRIMARY KEY, achievement_id INTEGER, "
+            f"pax_id VARCHAR(45), date_awarded DATE{unique_key})"
+        ))
+    data_to_load = pl.DataFrame({
+        'achievement_id': [1] * 28,
+        'pax_id': [f'U{i}' for i in range(28)],
+        'date_awarded': [date(2025, 4, 1)] * 28,
+    })
+
+    executemany = []
+    event.listen(engine, "before_cursor_execute", lambda *args: executemany.append(args[5]))
+
+    assert load_to_database('f3alpha', engine, MetaData(), data_to_load.head(25), batch_size=10) == 25
+    assert load_to_database('f3alpha', engine, MetaData(), data_to_load.tail(8), batch_size=10) == 3
+    assert load_to_database('f3alpha', engine, MetaData(), data_to_load, batch_size=10) == 0
+    assert executemany.count(True) == 4  # 10 + 10 + 5, then the 3 new ones
+    with engine.connect() as cnxn:
+        assert cnxn.execute(text("SELECT count(*) FROM f3alpha.achievement_awarded")).scalar() == 28
+
+
+def test_load_to_database_sends_mysql_tuples():
+    """The MySQL drivers' pyformat default still gets a positional statement fed tuples, not a dict per row"""
+    engine = MagicMock()
+    engine.dialect = create_engine('mysql+pymysql://weaselbot@localhost/f3alpha').dialect
+    cnxn = engine.begin.return_value.__enter__.return_value
+    cnxn.exec_driver_sql.return_value.rowcount = 2
+    awarded = Table(
+        'achievements_awarded', MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('achievement_id', Integer),
+        Column('pax_id', String),
+        Column('date_awarded', Date),
+        schema='f3alpha'
+    )
+    data_to_load = pl.DataFrame({
+        'achievement_id': [1, 2, 3],
+        'pax_id': ['U1', 'U2', 'U3'],
+        'date_awarded': [date(2025, 4, 1)] * 3,
+    })
+    existing = data_to_load.head(1)
+
+    with patch(f"{load_to_database.__module__}._awarded_table", return_value=awarded), \
+            patch(f"{load_to_database.__module__}.read_frame", return_value=existing):
+        assert load_to_database('f3alpha', engine, MetaData(), data_to_load, batch_size=10) == 2
+
+    ((statement, rows),) = [c.args for c in cnxn.exec_driver_sql.call_args_list]
+    assert statement == (
+        "INSERT IGNORE INTO f3alpha.achievements_awarded (achievement_id, pax_id, date_awarded) VALUES (%s, %s, %s)"
+    )
+    assert rows == [(2, 'U2', date(2025, 4, 1)), (3, 'U3', date(2025, 4, 1))]
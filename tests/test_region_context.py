@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import MetaData, create_engine, event, text
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import column, select, table
+
+from ..weaselbot.region_context import paxminer_log_queries, prefetch_regions
+from ..weaselbot.utils import query_stats
+
+
+@pytest.fixture
+def regions_engine():
+    """SQLite with weaselbot settings and three regions: f3alpha has a log channel, f3beta none, f3gamma no aos"""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, connection_record):
+        for schema in ("weaselbot", "f3alpha", "f3beta", "f3gamma"):
+            dbapi_connection.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+
+    with engine.begin() as cnxn:
+        cnxn.execute(text("CREATE TABLE weaselbot.regions (paxminer_schema VARCHAR(45), slack_token VARCHAR(100))"))
+        cnxn.execute(text("INSERT INTO weaselbot.regions VALUES ('f3alpha', 'xoxb-alpha')"))
+        for schema in ("f3alpha", "f3beta"):
+            cnxn.execute(text(f"CREATE TABLE {schema}.aos (channel_id VARCHAR(45), ao VARCHAR(45))"))
+        cnxn.execute(text("INSERT INTO f3alpha.aos VALUES ('C1', 'paxminer_logs'), ('C2', 'The Grind')"))
+        cnxn.execute(text("INSERT INTO f3beta.aos VALUES ('C3', 'The Grind')"))
+    yield engine
+    engine.dispose()
+
+
+def test_prefetch_splits_one_union_by_region(regions_engine):
+    """Settings are one query and each lookup one union; regions get their rows, an empty frame, or nothing"""
+    schemas = ["f3alpha", "f3beta", "f3gamma"]
+    queries = paxminer_log_queries(schemas, MetaData(), regions_engine)
+    assert set(queries) == {"f3alpha", "f3beta"}
+
+    contexts = prefetch_regions(schemas, regions_engine, settings=("slack_token",), queries={"log_channel": queries})
+
+    assert query_stats(regions_engine).height == 2
+    assert contexts["f3alpha"].settings == {"slack_token": "xoxb-alpha"}
+    assert contexts["f3alpha"].first("log_channel", "channel_id") == "C1"
+    assert contexts["f3beta"].settings == {}
+    assert contexts["f3beta"].tables["log_channel"].columns == ["channel_id"]
+    assert contexts["f3beta"].first("log_channel", "channel_id") is None
+    assert "log_channel" not in contexts["f3gamma"].tables
+
+
+def test_prefetch_falls_back_per_region(regions_engine):
+    """A drifted table fails the union; the lookup is retried per region and only the broken region misses it"""
+    with regions_engine.begin() as cnxn:
+        cnxn.execute(text("ALTER TABLE f3beta.aos RENAME COLUMN channel_id TO channel"))
+    aos = {schema: table("aos", column("channel_id"), column("ao"), schema=schema) for schema in ("f3alpha", "f3beta")}
+    queries = {schema: select(ao.c.channel_id).where(ao.c.ao == "paxminer_logs") for schema, ao in aos.items()}
+
+    contexts = prefetch_regions(["f3alpha", "f3beta"], regions_engine, queries={"log_channel": queries})
+
+    assert contexts["f3alpha"].first("log_channel", "channel_id") == "C1"
+    assert "log_channel" not in contexts["f3beta"].tables
+
+
+def test_optional_settings_read_as_none_until_added(regions_engine):
+    """A settings column that doesn't exist yet reads as None instead of failing the prefetch"""
+    contexts = prefetch_regions(["f3alpha"], regions_engine, settings=("slack_token",), optional_settings=("digest",))
+    assert contexts["f3alpha"].settings == {"slack_token": "xoxb-alpha", "digest": None}
+
+    with regions_engine.begin() as cnxn:
+        cnxn.execute(text("ALTER TABLE weaselbot.regions ADD COLUMN digest INTEGER DEFAULT 1"))
+    contexts = prefetch_regions(["f3alpha"], regions_engine, settings=("slack_token",), optional_settings=("digest",))
+    assert contexts["f3alpha"].settings == {"slack_token": "xoxb-alpha", "digest": 1}
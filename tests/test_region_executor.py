@@ -0,0 +1,44 @@
+import logging
+import threading
+import time
+
+import polars as pl
+
+from ..weaselbot.region_executor import run_regions
+
+
+def test_run_regions_overlaps_isolates_and_orders_logs(caplog):
+    """Regions run side by side, a failing region is reported, and logs come out in region order"""
+    schemas = ["f3alpha", "f3beta", "f3gamma", "f3delta"]
+    delays = {"f3alpha": 0.3, "f3beta": 0.1, "f3gamma": 0.2, "f3delta": 0.0}
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def process(schema):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        logging.info(f"{schema} start")
+        time.sleep(delays[schema])
+        with lock:
+            running[0] -= 1
+        if schema == "f3gamma":
+            raise RuntimeError("Slack said no")
+        logging.info(f"{schema} done")
+
+    with caplog.at_level(logging.INFO):
+        report = run_regions(process, schemas, workers=4)
+
+    assert peak[0] > 1
+    assert report.get_column("schema").to_list() == schemas
+    assert report.filter(pl.col("error").is_not_null()).get_column("schema").to_list() == ["f3gamma"]
+    messages = [r.getMessage() for r in caplog.records if "f3" in r.getMessage()]
+    assert messages == [
+        "f3alpha start",
+        "f3alpha done",
+        "f3beta start",
+        "f3beta done",
+        "f3gamma start",
+        "Processing f3gamma failed: Slack said no",
+        "f3delta start",
+        "f3delta done",
+    ]
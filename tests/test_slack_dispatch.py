@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from ..weaselbot import slack_dispatch
+from ..weaselbot.slack_dispatch import SlackDispatcher, SlackMessage
+
+
+class FakeResponse(dict):
+    def __init__(self, status_code, error=None, headers=None):
+        super().__init__(ok=error is None, error=error)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeClient:
+    """Async Slack client stand-in; `script` maps (method, channel) to errors to raise before succeeding"""
+
+    def __init__(self, token, calls, script):
+        self.token, self.calls, self.script = token, calls, script
+
+    async def _call(self, method, channel, **kwargs):
+        self.calls.append((time.monotonic(), self.token, method, channel))
+        await asyncio.sleep(0)
+        errors = self.script.get((self.token, method, channel), [])
+        if errors:
+            raise SlackApiError("fake", errors.pop(0))
+        return {"ok": True, "ts": f"{len(self.calls)}.0"}
+
+    async def chat_postMessage(self, channel, text, link_names, **kwargs):
+        return await self._call("chat.postMessage", channel)
+
+    async def reactions_add(self, channel, name, timestamp):
+        return await self._call("reactions.add", channel)
+
+    async def conversations_join(self, channel):
+        return await self._call("conversations.join", channel)
+
+
+@pytest.fixture
+def fake_slack(monkeypatch):
+    monkeypatch.setattr(slack_dispatch, "JITTER", 0.0)
+    monkeypatch.setattr(slack_dispatch, "BACKOFF", 0.01)
+    calls, script = [], {}
+    return calls, script, lambda token: FakeClient(token, calls, script)
+
+
+def test_rate_limit_only_pauses_its_workspace(fake_slack):
+    """A 429 pauses workspace A for Retry-After while workspace B keeps sending"""
+    calls, script, factory = fake_slack
+    script["xoxb-a", "chat.postMessage", "C1"] = [FakeResponse(429, "ratelimited", {"Retry-After": "0.3"})]
+    dispatcher = SlackDispatcher(factory)
+    dispatcher.submit(SlackMessage("xoxb-a", "C1", "a", key="a"))
+    for i in range(3):
+        dispatcher.submit(SlackMessage("xoxb-b", f"C{i}", "b", reaction="fire", key=f"b{i}"))
+
+    start = time.monotonic()
+    outcomes = dispatcher.run()
+
+    assert [o.message.key for o in outcomes] == ["a", "b0", "b1", "b2"]
+    assert all(o.ok for o in outcomes)
+    assert outcomes[0].attempts == 2
+    a_retry = max(t for t, token, *_ in calls if token == "xoxb-a")
+    assert a_retry - start >= 0.3
+    assert all(t - start < 0.3 for t, token, *_ in calls if token == "xoxb-b")
+    assert sum(method == "reactions.add" for *_, method, _ in calls) == 3
+
+
+def test_rate_limit_pauses_every_channel_in_its_workspace(fake_slack):
+    """A 429 in one channel also holds back the workspace's posts to its other channels"""
+    calls, script, factory = fake_slack
+    script["xoxb-a", "chat.postMessage", "C1"] = [FakeResponse(429, "ratelimited", {"Retry-After": "0.3"})]
+    dispatcher = SlackDispatcher(factory)
+    dispatcher.submit(SlackMessage("xoxb-a", "C1", "limited"))
+    for i in range(3):
+        dispatcher.submit(SlackMessage("xoxb-a", "C2", f"other {i}"))
+
+    start = time.monotonic()
+    outcomes = dispatcher.run()
+
+    assert all(o.ok for o in outcomes)
+    c2 = [t - start for t, _, method, channel in calls if channel == "C2"]
+    # the first post to C2 can go out while C1's is still in flight; the rest wait for the pause
+    assert len(c2) == 3 and sum(t >= 0.3 for t in c2) >= 2
+
+
+def test_bounded_retries_join_and_outcomes(fake_slack):
+    """Server errors are retried up to the limit, not_in_channel joins, and other errors are reported"""
+    calls, script, factory = fake_slack
+    script["xoxb-a", "chat.postMessage", "C1"] = [FakeResponse(500, "internal_error") for _ in range(5)]
+    script["xoxb-a", "chat.postMessage", "C2"] = [FakeResponse(200, "not_in_channel")]
+    script["xoxb-a", "chat.postMessage", "C3"] = [FakeResponse(200, "channel_not_found")]
+    dispatcher = SlackDispatcher(factory, max_attempts=3)
+    dispatcher.submit(SlackMessage("xoxb-a", "C1", "retried"))
+    dispatcher.submit(SlackMessage("xoxb-a", "C2", "joined", join=True))
+    dispatcher.submit(SlackMessage("xoxb-a", "C3", "missing", join=True))
+
+    retried, joined, missing = dispatcher.run()
+
+    assert (retried.error, retried.attempts) == ("internal_error", 3)
+    assert joined.ok and joined.attempts == 2
+    assert ("xoxb-a", "conversations.join", "C2") in [c[1:] for c in calls]
+    assert (missing.error, missing.attempts) == ("channel_not_found", 1)
+    assert dispatcher.run() == []
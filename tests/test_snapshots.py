@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import polars as pl
+import pytest
+
+from ..weaselbot.snapshots import SnapshotStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore("test", path=str(tmp_path), lookback_days=10)
+
+
+def _rows(*days):
+    return pl.DataFrame({"email": [f"pax{d.day}@f3.com" for d in days], "date": list(days)})
+
+
+def test_first_run_fetches_from_start(store):
+    """Without a watermark the whole requested range is fetched"""
+    assert store.since("f3alpha") is None
+    assert store.since("f3alpha", date(2025, 1, 1)) == date(2025, 1, 1)
+
+
+def test_merge_replaces_lookback_window(store):
+    """Rows inside the lookback window are replaced, older rows are kept, deletions are honoured"""
+    store.merge("f3alpha", _rows(date(2025, 1, 5), date(2025, 2, 10), date(2025, 2, 20)), None, date(2025, 2, 21))
+    since = store.since("f3alpha", date(2025, 1, 1))
+    assert since == date(2025, 2, 11)
+
+    # the 2/20 backblast was deleted and a 2/25 one was added
+    store.merge("f3alpha", _rows(date(2025, 2, 25)), since, date(2025, 2, 26))
+
+    df = store.load(["f3alpha"])
+    assert sorted(df.get_column("date").to_list()) == [date(2025, 1, 5), date(2025, 2, 10), date(2025, 2, 25)]
+    assert store.since("f3alpha") == date(2025, 2, 16)
+
+
+def test_load_filters_start_and_tags(store):
+    """Only rows on or after start are returned, tagged with their source region"""
+    store.merge("f3alpha", _rows(date(2024, 12, 30), date(2025, 1, 2)), None)
+    store.merge("f3beta", _rows(date(2025, 1, 3)), None)
+
+    df = store.load(["f3alpha", "f3beta", "f3missing"], start=date(2025, 1, 1), tag="schema")
+    assert df.sort("date").get_column("schema").to_list() == ["f3alpha", "f3beta"]
+
+
+def test_earlier_start_refetches_the_region(store):
+    """A snapshot started on one date is fetched again from an earlier one, and then covers it"""
+    store.merge("f3alpha", _rows(date(2025, 2, 10)), date(2025, 2, 1), date(2025, 2, 21))
+    assert store.covered("f3alpha") == date(2025, 2, 1)
+    assert store.since("f3alpha", date(2025, 2, 1)) == date(2025, 2, 11)
+    assert store.since("f3alpha", date(2025, 1, 1)) == date(2025, 1, 1)
+    assert store.since("f3alpha") is None
+
+    store.merge("f3alpha", _rows(date(2025, 1, 5), date(2025, 2, 10)), date(2025, 1, 1), date(2025, 2, 21))
+    assert store.covered("f3alpha") == date(2025, 1, 1)
+    assert store.since("f3alpha", date(2025, 1, 1)) == date(2025, 2, 11)
+    assert store.load(["f3alpha"]).height == 2
+
+
+def test_current_year_is_refetched_weekly(tmp_path):
+    """Edits older than the lookback window are picked up by a full fetch of the year every refresh_days"""
+    today = date.today()
+    year_start = date(today.year, 1, 1)
+    store = SnapshotStore("test", path=str(tmp_path), lookback_days=10, refresh_days=7)
+
+    store.merge("f3alpha", _rows(today), None, today - timedelta(days=7))
+    assert store.since("f3alpha", date(today.year - 1, 1, 1)) == min(today - timedelta(days=17), year_start)
+
+    store.merge("f3alpha", _rows(today), year_start, today)
+    assert store.since("f3alpha", date(today.year - 1, 1, 1)) == today - timedelta(days=10)
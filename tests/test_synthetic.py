@@ -0,0 +1,44 @@
+from datetime import date
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from ..benchmarks.synthetic import attendance_frame, generate, home_region_counts
+
+END = date(2025, 6, 30)
+
+
+def test_generate_is_seeded_per_region():
+    """The same seed gives the same data, and a region doesn't change with the number of regions"""
+
+    small = generate(regions=3, pax=20, aos=3, days=60, seed=7, end=END)
+    again = generate(regions=3, pax=20, aos=3, days=60, seed=7, end=END)
+    larger = generate(regions=5, pax=20, aos=3, days=60, seed=7, end=END)
+    other = generate(regions=3, pax=20, aos=3, days=60, seed=8, end=END)
+
+    for table in ("users", "aos", "beatdowns", "bd_attendance"):
+        assert_frame_equal(small["f3synth001"][table], again["f3synth001"][table])
+        assert_frame_equal(small["f3synth002"][table], larger["f3synth002"][table])
+    assert not small["f3synth001"]["bd_attendance"].equals(other["f3synth001"]["bd_attendance"])
+
+
+def test_generated_tables_join_like_paxminer():
+    """Every post joins to its beatdown and AO, every Q posted at his beatdown, and travellers keep their email"""
+
+    data = generate(regions=3, pax=30, aos=4, days=90, seed=1, end=END)
+    tables = data["f3synth001"]
+
+    posts = attendance_frame(data)
+    assert posts.height == sum(t["bd_attendance"].height for t in data.values())
+    assert posts.get_column("date").max() <= END
+    # each beatdown's Q is one of its PAX
+    assert posts.group_by("schema", "ao_id", "date").agg(pl.col("q_flag").max()).get_column("q_flag").min() == 1
+    assert tables["beatdowns"].height == tables["beatdowns"].select("ao_id", "bd_date").n_unique()
+
+    visitors = tables["users"].filter(pl.col("user_id").str.contains("V"))
+    assert visitors.height and visitors.get_column("email").str.ends_with(".000@example.com").all()
+    assert tables["aos"].filter(pl.col("ao") == "paxminer_logs").height == 1
+
+    counts = home_region_counts(data, END)
+    assert counts.columns == ["region", "email", "d30", "d60", "d90", "d120", "year"]
+    assert counts.select("region", "email").n_unique() == counts.height
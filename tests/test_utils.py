@@ -0,0 +1,329 @@
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import polars as pl
+import pytest
+from sqlalchemy import MetaData, create_engine, event, literal_column, select, text
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.pool import StaticPool
+
+from ..weaselbot.outbox import AwardOutbox
+from ..weaselbot.slack_dispatch import SlackOutcome
+from ..weaselbot.utils import (
+    ReflectionFailures,
+    SchemaDiscovery,
+    _find_new_awards,
+    _format_achievement_digest,
+    _normalize_decimals,
+    _number_awards,
+    discover_schemas,
+    extract_schemas,
+    query_stats,
+    read_frame,
+    send_to_slack,
+)
+
+
+@pytest.fixture
+def sqlite_engine():
+    """In-memory SQLite engine with an attached `f3test` schema"""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS f3test")
+
+    with engine.begin() as cnxn:
+        cnxn.execute(text("CREATE TABLE f3test.users (user_id VARCHAR(45) PRIMARY KEY, email VARCHAR(255))"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def information_schema_engine():
+    """SQLite engine with a stand-in information_schema.COLUMNS for two regions"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS information_schema")
+
+    columns = [
+        ("f3alpha", "users", "user_id", 1, "varchar", "NO", "PRI"),
+        ("f3alpha", "users", "email", 2, "varchar", "YES", ""),
+        ("f3alpha", "aos", "channel_id", 1, "varchar", "NO", "PRI"),
+        ("f3alpha", "aos", "site_q_user_id", 2, "varchar", "YES", ""),
+        ("f3alpha", "achievements_list", "id", 1, "int", "NO", "PRI"),
+        ("f3beta", "users", "user_id", 1, "varchar", "NO", "PRI"),
+        ("f3beta", "aos", "channel_id", 1, "varchar", "NO", "PRI"),
+        ("f3beta", "aos", "ao", 2, "geometry", "YES", ""),
+    ]
+    with engine.begin() as cnxn:
+        cnxn.execute(
+            text(
+                "CREATE TABLE information_schema.COLUMNS (TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, "
+                "ORDINAL_POSITION, DATA_TYPE, IS_NULLABLE, COLUMN_KEY)"
+            )
+        )
+        cnxn.execute(
+            text("INSERT INTO information_schema.COLUMNS VALUES (:s, :t, :c, :o, :d, :n, :k)"),
+            [dict(zip("stcodnk", row, strict=True)) for row in columns],
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_discover_schemas(information_schema_engine):
+    """All tables come from one query and missing requirements are reported per schema"""
+    metadata = MetaData()
+    discovery = discover_schemas(
+        information_schema_engine,
+        metadata,
+        ["f3alpha", "f3beta", "f3gone"],
+        required=("aos.site_q_user_id", "achievements_list"),
+    )
+
+    users = discovery.table("users", metadata, information_schema_engine, "f3alpha")
+    assert [c.name for c in users.columns] == ["user_id", "email"]
+    assert users.c.user_id.primary_key
+    assert "f3alpha.users" in metadata.tables
+    assert discovery.has("f3alpha", "aos.site_q_user_id", "achievements_list")
+    assert discovery.missing == {"f3beta": ["aos.site_q_user_id", "achievements_list"]}
+    assert not discovery.has("f3gone")
+    with pytest.raises(NoSuchTableError):
+        discovery.table("achievements_list", metadata, information_schema_engine, "f3beta")
+
+
+def _fallback(path, ttl=60):
+    """Discovery of nothing, so every table is autoloaded through the failure record"""
+    return SchemaDiscovery(tables={}, missing={}, discovered=(), failures=ReflectionFailures(str(path), ttl=ttl))
+
+
+def test_failed_reflections_are_not_retried_within_the_ttl(sqlite_engine, tmp_path):
+    """A missing table fails from the record on the next run, without touching the database"""
+    path = tmp_path / "reflection_failures.json"
+    users = _fallback(path).table("users", MetaData(), sqlite_engine, "f3test")
+    assert [c.name for c in users.columns] == ["user_id", "email"]
+    with pytest.raises(NoSuchTableError):
+        _fallback(path).table("aos", MetaData(), sqlite_engine, "f3test")
+
+    offline_engine = MagicMock()
+    with pytest.raises(NoSuchTableError):
+        _fallback(path).table("aos", MetaData(), offline_engine, "f3test")
+    offline_engine.connect.assert_not_called()
+
+
+def test_failed_reflections_are_retried_after_the_ttl(sqlite_engine, tmp_path):
+    """Once the TTL has passed the table is reflected again, and a success clears the failure"""
+    path = tmp_path / "reflection_failures.json"
+    with pytest.raises(NoSuchTableError):
+        _fallback(path).table("aos", MetaData(), sqlite_engine, "f3test")
+    with sqlite_engine.begin() as cnxn:
+        cnxn.execute(text("CREATE TABLE f3test.aos (channel_id VARCHAR(45), ao VARCHAR(45))"))
+
+    aos = _fallback(path, ttl=0).table("aos", MetaData(), sqlite_engine, "f3test")
+    assert [c.name for c in aos.columns] == ["channel_id", "ao"]
+    assert ReflectionFailures(str(path))._failures == {}
+
+
+def test_extract_schemas_isolates_failures(sqlite_engine):
+    """One broken schema is reported and skipped, the rest are concatenated"""
+    queries = {
+        schema: select(literal_column(f"'{schema}'").label("region"), literal_column("X'414F'").label("ao"))
+        for schema in ("f3alpha", "f3beta")
+    }
+    queries["f3broken"] = text("SELECT 'f3broken' AS region, ao FROM f3test.beatdowns")
+
+    df, report = extract_schemas(queries, sqlite_engine, workers=2, casts={"ao": pl.String()})
+
+    assert sorted(df.get_column("region").to_list()) == ["f3alpha", "f3beta"]
+    assert df.schema["ao"] == pl.String
+    failed = report.filter(pl.col("error").is_not_null())
+    assert failed.get_column("schema").to_list() == ["f3broken"]
+
+
+def test_read_frame_records_stats(sqlite_engine):
+    """Reads go through the engine's pool and are recorded against it; whole-number decimals come back as ints"""
+    with sqlite_engine.begin() as cnxn:
+        cnxn.execute(text("INSERT INTO f3test.users VALUES ('U1', 'a@f3.com'), ('U2', 'b@f3.com')"))
+
+    df = read_frame("SELECT user_id, email FROM f3test.users", sqlite_engine, label="f3test")
+    read_frame(select(literal_column("1").label("one")), sqlite_engine)
+
+    assert df.get_column("user_id").to_list() == ["U1", "U2"]
+    stats = query_stats(sqlite_engine)
+    assert stats.get_column("label").to_list() == ["f3test", "query"]
+    assert stats.get_column("rows").to_list() == [2, 1]
+    assert (stats.get_column("bytes") > 0).all()
+    assert query_stats(create_engine("sqlite://")).height == 0
+
+    decimals = pl.DataFrame({"n": [1, 2], "x": [1.5, 2.0]}, schema={"n": pl.Decimal(10, 0), "x": pl.Decimal(10, 2)})
+    assert _normalize_decimals(decimals).schema == {"n": pl.Int64, "x": pl.Float64}
+
+
+class FakeDispatcher:
+    """Records submitted messages and reports them all sent"""
+
+    sent = []
+
+    def __init__(self):
+        self.queue = []
+
+    def submit(self, message):
+        self.queue.append(message)
+
+    def run(self):
+        FakeDispatcher.sent += self.queue
+        outcomes, self.queue = [SlackOutcome(m, ts="1.0", attempts=1) for m in self.queue], []
+        return outcomes
+
+
+def test_digest_mode_batches_messages_and_keeps_rows():
+    """Digest mode posts a couple of Block Kit messages instead of one per award, loading the same rows"""
+    awards = pl.DataFrame(
+        {"id": [1, 2], "name": ["Golden Boy", "The Priest"], "verb": ["posting 50 times", "25 QSources"]}
+    )
+    awarded = pl.DataFrame({"id": [1], "achievement_id": [2], "pax_id": ["U0"], "date_awarded": [date(2025, 3, 1)]})
+    dfs = {
+        idx: pl.DataFrame(
+            {
+                "year" if idx == 1 else "week": [2025 if idx == 1 else 14] * n,
+                "region": ["f3alpha"] * n,
+                "date_awarded": [date(2025, 4, 1)] * n,
+                "slack_user_id": [f"U{i}" for i in range(n)],
+            }
+        )
+        for idx, n in ((1, 150), (2, 3))
+    }
+
+    rows = {}
+    for digest in (False, True):
+        FakeDispatcher.sent = []
+        with patch(f"{send_to_slack.__module__}.SlackDispatcher", FakeDispatcher):
+            rows[digest] = send_to_slack("f3alpha", "xoxb", "C1", 2025, awarded, awards, dfs, "CLOG", digest=digest)
+        sent = [m for m in FakeDispatcher.sent if m.channel != "CLOG"]
+        if digest:
+            assert len(sent) == 1 and all(m.blocks and m.reaction == "fire" and m.channel == "C1" for m in sent)
+            sections = [b["text"]["text"] for b in sent[0].blocks[1:]]
+            assert all(len(text) <= 3000 for text in sections)
+            assert sum(text.count("\n•") for text in sections) == 153
+            assert "<@U0> on 2025-04-01 (2nd time)" in sections[-1]
+        else:
+            assert len(sent) == 153 and not any(m.blocks for m in sent)
+
+    assert rows[True].equals(rows[False]) and rows[True].height == 153
+
+
+def test_digest_chunks_to_block_limit():
+    """More award sections than fit in one message are split across messages"""
+    awards = [(f"Award {i}", "doing it", [("U1", date(2025, 1, 1), 1)]) for i in range(60)]
+    messages = _format_achievement_digest(awards)
+    assert [len(blocks) for _, blocks in messages] == [50, 12]
+    assert messages[0][0].endswith("(1/2)")
+
+
+def test_send_to_slack_skips_awards_already_announced(tmp_path):
+    """With an outbox, an award a crashed run announced is loaded but not announced again"""
+    outbox = AwardOutbox(str(tmp_path / "outbox.sqlite"))
+    (earlier,) = outbox.stage(
+        "f3alpha",
+        [
+            (
+                {"channel": "C1", "text": "old", "blocks": None, "reaction": "fire"},
+                [{"achievement_id": 1, "pax_id": "U1", "period": 2025, "date_awarded": date(2025, 4, 1)}],
+            )
+        ],
+    )
+    outbox.mark_sent([earlier])
+    awards = pl.DataFrame({"id": [1], "name": ["Golden Boy"], "verb": ["posting 50 times"]})
+    awarded = pl.DataFrame(
+        schema={"id": pl.Int64, "achievement_id": pl.Int64, "pax_id": pl.String, "date_awarded": pl.Date}
+    )
+    dfs = {
+        1: pl.DataFrame(
+            {
+                "year": [2025, 2025],
+                "region": ["f3alpha", "f3alpha"],
+                "date_awarded": [date(2025, 4, 1)] * 2,
+                "slack_user_id": ["U1", "U2"],
+            }
+        )
+    }
+
+    FakeDispatcher.sent = []
+    with patch(f"{send_to_slack.__module__}.SlackDispatcher", FakeDispatcher):
+        rows = send_to_slack("f3alpha", "xoxb", "C1", 2025, awarded, awards, dfs, "CLOG", outbox=outbox)
+
+    assert [m.text.split("!")[0] for m in FakeDispatcher.sent if m.channel == "C1"] == ["Congrats to our man <@U2>"]
+    assert rows.get_column("pax_id").to_list() == ["U1", "U2"]
+    assert outbox.announced("f3alpha") == {(1, "U1", 2025, 2025), (1, "U2", 2025, 2025)}
+
+
+def test_find_new_awards_across_periods():
+    """One stacked anti-join per period type finds the same new awards as checking each achievement separately"""
+
+    def candidates(period, values, pax):
+        return pl.DataFrame(
+            {
+                period: values,
+                "region": ["f3alpha"] * (len(pax) - 1) + ["f3beta"],
+                "date_awarded": [date(2025, 4, 1)] * len(pax),
+                "slack_user_id": pax,
+            }
+        )
+
+    dfs = {
+        13: candidates("week", [14, 13, 14], ["U1", "U1", "U2"]),
+        2: candidates("month", [4, 4], ["U1", "U2"]),
+        5: pl.DataFrame(),
+        7: candidates("year", [2025, 2025, 2025], ["U1", "U2", "U3"]),
+    }
+    awarded = pl.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "achievement_id": ["13", "2", "7", "7"],
+            "pax_id": ["U1", "U9", "U2", "U1"],
+            "date_awarded": [date(2025, 3, 26), date(2025, 4, 2), date(2025, 1, 5), date(2024, 6, 1)],
+        }
+    )
+
+    new = _find_new_awards("f3alpha", 2025, dfs, awarded)
+
+    # U1's week 13 six-pack and U2's year award were already given; U9's award doesn't touch U1; f3beta is dropped
+    assert new.select("achievement_id", "period_type", "period", "pax_id").rows() == [
+        (13, "week", 14, "U1"),
+        (2, "month", 4, "U1"),
+        (7, "year", 2025, "U1"),
+    ]
+    assert _find_new_awards("f3alpha", 2025, {5: pl.DataFrame()}, awarded).is_empty()
+
+
+def test_number_awards_counts_existing_and_new():
+    """Totals continue from this year's awards and count up through the new ones in date order"""
+
+    new_awards = pl.DataFrame(
+        {
+            "achievement_id": [13, 13, 2, 7],
+            "period": [14, 15, 4, 2025],
+            "date_awarded": [date(2025, 4, 1), date(2025, 4, 8), date(2025, 4, 3), date(2025, 4, 1)],
+            "pax_id": ["U1", "U1", "U1", "U2"],
+        }
+    )
+    awarded = pl.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "achievement_id": ["13", "2", "7", "13"],
+            "pax_id": ["U1", "U1", "U2", "U1"],
+            "date_awarded": [date(2025, 3, 26), date(2025, 2, 2), date(2024, 1, 5), date(2024, 6, 1)],
+        }
+    )
+
+    numbered = _number_awards(new_awards, awarded, 2025)
+
+    # U1 already has two awards this year (one six-pack); last year's don't count
+    assert numbered.select("achievement_id", "pax_id", "total_achievements", "total_idx_achievements").rows() == [
+        (13, "U1", 3, 2),
+        (13, "U1", 5, 3),
+        (2, "U1", 4, 2),
+        (7, "U2", 1, 1),
+    ]
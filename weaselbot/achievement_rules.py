@@ -0,0 +1,306 @@
+"""
+Declarative achievement rules, compiled into grouped Polars aggregations.
+
+Every built-in achievement is "post (or Q) at least N times at beatdowns (or QSources) in a week, month or
+year", sometimes counting distinct AOs instead of posts or counting per AO. A rule describes one achievement in
+those terms and is matched to a region's `achievements_list` row by `code`, not by position.
+
+Rules that share a period, activity, Q filter and AO grouping are evaluated together: each such group is one
+`group_by` over the national data, producing both the post count and the distinct AO count, and every rule in the
+group is then a threshold filter over that small aggregate. The 14 built-in achievements need 8 group-bys.
+
+Rules come from three places, later ones overriding earlier ones field by field:
+    1. `DEFAULT_RULES`, the built-in achievements.
+    2. A TOML file named by WEASELBOT_ACHIEVEMENT_RULES, with one `[rules.<code>]` table per rule.
+    3. The optional rule columns (`RULE_COLUMNS`) of a region's `achievements_list`, so a region can change a
+       threshold or define a custom award without new code.
+
+Classes:
+    AchievementRule:
+        One achievement definition.
+
+Functions:
+    load_rules(path: str | None) -> dict[str, AchievementRule]:
+        The default rules, overridden and extended by the rules file.
+
+    region_rules(awards: pl.DataFrame, rules: dict[str, AchievementRule]) -> dict[int, AchievementRule]:
+        Match a region's achievements_list to rules by code, applying the region's own rule columns.
+
+    aggregate_rules(nation_df, rules, cache, users) -> dict[tuple, pl.DataFrame]:
+        Run one grouped aggregation per distinct rule group.
+
+    evaluate_rules(nation_df, rules, region, cache, users) -> dict:
+        Apply each rule's threshold, returning the frames `send_to_slack` consumes.
+
+    partition_aggregates(aggregates, regions) -> dict[str, dict[tuple, pl.DataFrame]]:
+        Split national aggregations by region once.
+"""
+
+import logging
+import os
+import tomllib
+from dataclasses import dataclass, fields, replace
+from typing import Hashable, Iterable, Mapping
+
+import polars as pl
+
+from .activity import ACTIVITIES, activity_expr
+
+PERIODS = ("week", "month", "year")
+METRICS = ("posts", "aos")
+RULE_COLUMNS = ("period", "activity", "q_only", "metric", "threshold", "per_ao")
+
+
+@dataclass(frozen=True)
+class AchievementRule:
+    """
+    One achievement: awarded when `metric` reaches `threshold` within a `period`.
+
+    :param code: matches `achievements_list.code`
+    :type code: str
+    :param period: "week", "month" or "year"
+    :type period: str
+    :param activity: "beatdown" (excluding QSource and rucks), "qsource" or "ruck", see `activity`
+    :type activity: str
+    :param q_only: only count beatdowns the man Q'd
+    :type q_only: bool
+    :param metric: "posts" counts attendance, "aos" counts distinct AOs
+    :type metric: str
+    :param threshold: the smallest metric value that earns the award
+    :type threshold: int
+    :param per_ao: count separately at each AO
+    :type per_ao: bool
+    """
+
+    code: str
+    period: str
+    threshold: int
+    activity: str = "beatdown"
+    q_only: bool = False
+    metric: str = "posts"
+    per_ao: bool = False
+
+    def __post_init__(self):
+        if self.period not in PERIODS:
+            raise ValueError(f"Achievement {self.code}: period must be one of {PERIODS}, not {self.period!r}")
+        if self.activity not in ACTIVITIES:
+            raise ValueError(f"Achievement {self.code}: activity must be one of {ACTIVITIES}, not {self.activity!r}")
+        if self.metric not in METRICS:
+            raise ValueError(f"Achievement {self.code}: metric must be one of {METRICS}, not {self.metric!r}")
+
+    @property
+    def group(self) -> tuple[str, str, bool, bool]:
+        """Rules with the same group are answered by the same aggregation."""
+        return self.period, self.activity, self.q_only, self.per_ao
+
+
+DEFAULT_RULES = (
+    AchievementRule("the_priest", "year", 25, activity="qsource"),
+    AchievementRule("the_monk", "month", 4, activity="qsource"),
+    AchievementRule("leader_of_men", "month", 4, q_only=True),
+    AchievementRule("the_boss", "month", 6, q_only=True),
+    AchievementRule("be_the_hammer_not_the_nail", "week", 6, q_only=True),
+    AchievementRule("cadre", "month", 7, q_only=True, metric="aos"),
+    AchievementRule("el_presidente", "year", 20, q_only=True),
+    AchievementRule("el_quatro", "year", 25),
+    AchievementRule("golden_boy", "year", 50),
+    AchievementRule("centurion", "year", 100),
+    AchievementRule("karate_kid", "year", 150),
+    AchievementRule("crazy_person", "year", 200),
+    AchievementRule("6_pack", "week", 6),
+    AchievementRule("holding_down_the_fort", "year", 50, per_ao=True),
+)
+
+
+def _build_rule(code: str, base: AchievementRule | None, values: Mapping) -> AchievementRule:
+    """Apply `values` over `base`, or build a new rule from them. Raises ValueError or TypeError if invalid."""
+
+    known = {f.name for f in fields(AchievementRule)} - {"code"}
+    unknown = set(values) - known
+    if unknown:
+        raise ValueError(f"Achievement {code}: unknown rule fields {sorted(unknown)}")
+    values = dict(values)
+    for flag in ("q_only", "per_ao"):
+        if flag in values:
+            values[flag] = bool(values[flag])
+    if "threshold" in values:
+        values["threshold"] = int(values["threshold"])
+    return replace(base, **values) if base is not None else AchievementRule(code=code, **values)
+
+
+def load_rules(path: str | None = None) -> dict[str, AchievementRule]:
+    """
+    The built-in rules, overridden and extended by a TOML rules file if there is one.
+
+    :param path: the rules file. Defaults to the WEASELBOT_ACHIEVEMENT_RULES environment variable; with neither,
+        only the built-in rules are used.
+    :type path: str | None
+    :return: rules keyed by code, built-in rules first
+    :rtype: dict[str, AchievementRule]
+    """
+
+    rules = {rule.code: rule for rule in DEFAULT_RULES}
+    path = path or os.getenv("WEASELBOT_ACHIEVEMENT_RULES")
+    if not path:
+        return rules
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    for code, values in config.get("rules", {}).items():
+        rules[code] = _build_rule(code, rules.get(code), values)
+    logging.info(f"Loaded achievement rules from {path}")
+    return rules
+
+
+def region_rules(awards: pl.DataFrame, rules: dict[str, AchievementRule]) -> dict[int, AchievementRule]:
+    """
+    Match a region's `achievements_list` to rules by code. Non-null rule columns on a row override the rule, or
+    define one for a custom code. Awards with no rule are left out; they must be handled separately.
+
+    :param awards: the region's achievements_list, with at least `id` and `code`
+    :type awards: pl.DataFrame
+    :param rules: rules keyed by code, from `load_rules`
+    :type rules: dict[str, AchievementRule]
+    :return: the region's rules keyed by achievement id
+    :rtype: dict[int, AchievementRule]
+    """
+
+    columns = [c for c in RULE_COLUMNS if c in awards.columns]
+    matched = {}
+    for row in awards.iter_rows(named=True):
+        code = row["code"]
+        values = {c: row[c] for c in columns if row[c] is not None}
+        if code not in rules and not values:
+            logging.debug(f"No rule for custom achievement {code}")
+            continue
+        try:
+            matched[row["id"]] = _build_rule(code, rules.get(code), values)
+        except (TypeError, ValueError) as e:
+            logging.error(f"Skipping achievement {row['id']} ({code}): {e}")
+    return matched
+
+
+def _activity(nation_df: pl.DataFrame | pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Add the period keys every rule group groups on, and the activity classification if the extract didn't
+    already return it.
+    """
+
+    df = nation_df.lazy()
+    if "activity" not in df.collect_schema().names():
+        df = df.with_columns(activity_expr().alias("activity"))
+    return df.with_columns(
+        pl.col("date").dt.year().alias("year"),
+        pl.col("date").dt.month().alias("month"),
+        pl.col("date").dt.week().alias("week"),
+    )
+
+
+def aggregate_rules(
+    nation_df: pl.DataFrame | pl.LazyFrame,
+    rules: Iterable[AchievementRule],
+    cache: dict[tuple, pl.DataFrame] | None = None,
+    users: pl.DataFrame | None = None,
+) -> dict[tuple, pl.DataFrame]:
+    """
+    Run one grouped aggregation for every distinct rule group not already in `cache`. The aggregations share a
+    single scan of `nation_df` and run in parallel through `pl.collect_all`.
+
+    :param nation_df: national beatdown data joined to home regions
+    :type nation_df: pl.DataFrame | pl.LazyFrame
+    :param rules: the rules that need answering
+    :type rules: Iterable[AchievementRule]
+    :param cache: aggregations from an earlier call, updated in place
+    :type cache: dict[tuple, pl.DataFrame] | None
+    :param users: email and region to Slack user mapping, joined onto every aggregation
+    :type users: pl.DataFrame | None
+    :return: per group, the posts and distinct AO count and the latest date for each period, email and region
+        (and AO, for per-AO groups), followed by the `users` columns
+    :rtype: dict[tuple, pl.DataFrame]
+    """
+
+    cache = {} if cache is None else cache
+    groups = sorted({rule.group for rule in rules} - set(cache))
+    if not groups:
+        return cache
+
+    df = _activity(nation_df)
+    plans = []
+    for period, activity, q_only, per_ao in groups:
+        mask = pl.col("activity") == activity
+        if q_only:
+            mask &= pl.col("q_flag") == 1
+        keys = [period, "email", "region", "ao_id"] if per_ao else [period, "email", "region"]
+        plans.append(
+            df.filter(mask)
+            .group_by(keys)
+            .agg(
+                pl.col("ao_id").count().alias("posts"),
+                pl.col("ao_id").n_unique().alias("aos"),
+                pl.col("date").max().alias("date_awarded"),
+            )
+        )
+    if users is not None:
+        plans = [plan.join(users.lazy(), on=["email", "region"]) for plan in plans]
+    cache.update(zip(groups, pl.collect_all(plans), strict=True))
+    logging.info(f"Evaluated {len(groups)} achievement rule groups")
+    return cache
+
+
+def evaluate_rules(
+    nation_df: pl.DataFrame | pl.LazyFrame,
+    rules: Mapping[Hashable, AchievementRule],
+    region: str | None = None,
+    cache: dict[tuple, pl.DataFrame] | None = None,
+    users: pl.DataFrame | None = None,
+) -> dict[Hashable, pl.DataFrame]:
+    """
+    Find everyone who meets each rule. Aggregations are taken from `cache` when present, so a job can aggregate
+    the national data once and evaluate each region's own rules against it.
+
+    :param nation_df: national beatdown data joined to home regions
+    :type nation_df: pl.DataFrame | pl.LazyFrame
+    :param rules: the rules to evaluate, under any key (code, or achievement id from `region_rules`)
+    :type rules: Mapping[Hashable, AchievementRule]
+    :param region: only return men whose home region this is
+    :type region: str | None
+    :param cache: shared aggregations from `aggregate_rules` or one region's from `partition_aggregates`, updated
+        in place
+    :type cache: dict[tuple, pl.DataFrame] | None
+    :param users: passed to `aggregate_rules` for aggregations missing from `cache`
+    :type users: pl.DataFrame | None
+    :return: for each key, one row per award earned with the period, email, region and date_awarded columns,
+        followed by the `users` columns if they were joined
+    :rtype: dict[Hashable, pl.DataFrame]
+    """
+
+    aggregates = aggregate_rules(nation_df, rules.values(), cache, users)
+    results = {}
+    for key, rule in rules.items():
+        agg = aggregates[rule.group]
+        if region is not None:
+            agg = agg.filter(pl.col("region") == region)
+        results[key] = agg.filter(pl.col(rule.metric) >= rule.threshold).drop("posts", "aos", "ao_id", strict=False)
+    return results
+
+
+def partition_aggregates(
+    aggregates: dict[tuple, pl.DataFrame], regions: Iterable[str]
+) -> dict[str, dict[tuple, pl.DataFrame]]:
+    """
+    Split national aggregations by region once, so each region's rules are evaluated against its own small
+    aggregations without filtering the national ones. Every region gets every group, empty if it has no rows.
+
+    :param aggregates: national aggregations from `aggregate_rules`
+    :type aggregates: dict[tuple, pl.DataFrame]
+    :param regions: the regions to split out
+    :type regions: Iterable[str]
+    :return: per region, a cache for `evaluate_rules`
+    :rtype: dict[str, dict[tuple, pl.DataFrame]]
+    """
+
+    partitioned = {region: {} for region in regions}
+    for group, df in aggregates.items():
+        parts = df.partition_by("region", as_dict=True)
+        for region, cache in partitioned.items():
+            cache[group] = parts.get((region,), df.clear())
+    return partitioned
@@ -22,6 +22,9 @@ Tables:
             - date_awarded: DATE, not nullable
             - created: DATETIME, not nullable, default current timestamp
             - updated: DATETIME, not nullable, default current timestamp on update
+        Unique key (achievement_id, pax_id, date_awarded), so awards can be loaded with INSERT IGNORE. Regions set
+        up before it existed need:
+            ALTER TABLE achievements_awarded ADD UNIQUE KEY uq_achievements_awarded (achievement_id, pax_id, date_awarded)
 
 Variables:
     insert_vals: List of dictionaries containing initial values to be inserted into the achievements_list table.
@@ -36,7 +39,7 @@ Usage:
     This module is intended to be executed as a script to set up the achievements tables and initial data in the database.
 """
 
-from sqlalchemy import Column, ForeignKey, MetaData, Table, func, select, text
+from sqlalchemy import Column, ForeignKey, MetaData, Table, UniqueConstraint, func, select, text
 from sqlalchemy.dialects.mysql import DATE, DATETIME, INTEGER, VARCHAR, insert
 from sqlalchemy.exc import ProgrammingError
 
@@ -84,6 +87,9 @@ achievements_awarded_columns = [
 
 achievements_list = create_table("achievements_list", achievements_list_columns, metadata, schema)
 achievements_awarded = create_table("achievements_awarded", achievements_awarded_columns, metadata, schema)
+achievements_awarded.append_constraint(
+    UniqueConstraint("achievement_id", "pax_id", "date_awarded", name="uq_achievements_awarded")
+)
 
 insert_vals = [
     {
@@ -0,0 +1,80 @@
+"""
+Classification of beatdowns into QSource lessons, rucks and regular beatdowns.
+
+A beatdown is a QSource if its backblast starts like a QSource lesson or its AO is a QSource AO. Otherwise it is
+a ruck if its AO is a ruck (or QSource) AO, and a regular beatdown if neither. When the backblast or AO name is
+missing and the rules above can't decide, the activity is NULL and it counts as neither.
+
+The classification is available both as SQL, so extracts can return a short label instead of the backblast text,
+and as the equivalent Polars expression for data that still carries the backblast.
+
+Functions:
+    activity_sql(backblast: ColumnElement, ao: ColumnElement) -> ColumnElement:
+        CASE expression labelling each row 'qsource', 'ruck' or 'beatdown'.
+
+    activity_expr(backblast: str, ao: str) -> pl.Expr:
+        The same classification over Polars columns.
+"""
+
+import polars as pl
+from sqlalchemy.sql import ColumnElement, and_, case, func, or_
+
+QSOURCE = "qsource"
+RUCK = "ruck"
+BEATDOWN = "beatdown"
+ACTIVITIES = (BEATDOWN, QSOURCE, RUCK)
+
+# only the start of the backblast is checked, where the lesson number would be
+BACKBLAST_PREFIX = 100
+# backblasts and AOs that are QSource lessons rather than beatdowns
+QSOURCE_BACKBLAST = r"q.{0,1}source|q{0,1}[1-9]\.[0-9]\s"
+QSOURCE_AO = r"q.{0,1}source"
+# AOs that don't count as beatdowns (blackops too? What is blackops?)
+NOT_BEATDOWN_AO = r"q.{0,1}source|ruck"
+
+
+def activity_sql(backblast: ColumnElement, ao: ColumnElement) -> ColumnElement:
+    """
+    Classify each row server-side so the backblast never leaves the database.
+
+    :param backblast: the beatdowns.backblast column
+    :type backblast: ColumnElement
+    :param ao: the aos.ao column
+    :type ao: ColumnElement
+    :return: 'qsource', 'ruck', 'beatdown' or NULL
+    :rtype: ColumnElement
+    """
+
+    bb = func.lower(func.substr(backblast, 1, BACKBLAST_PREFIX))
+    ao = func.lower(ao)
+    return case(
+        (or_(bb.regexp_match(QSOURCE_BACKBLAST), ao.regexp_match(QSOURCE_AO)), QSOURCE),
+        (ao.regexp_match(NOT_BEATDOWN_AO), RUCK),
+        (and_(backblast.is_not(None), ao.is_not(None)), BEATDOWN),
+        else_=None,
+    )
+
+
+def activity_expr(backblast: str = "backblast", ao: str = "ao") -> pl.Expr:
+    """
+    The Polars equivalent of `activity_sql`.
+
+    :param backblast: name of the backblast column
+    :type backblast: str
+    :param ao: name of the AO name column
+    :type ao: str
+    :return: expression evaluating to 'qsource', 'ruck', 'beatdown' or null
+    :rtype: pl.Expr
+    """
+
+    bb = pl.col(backblast).str.slice(0, BACKBLAST_PREFIX).str.to_lowercase()
+    ao = pl.col(ao).str.to_lowercase()
+    return (
+        pl.when(bb.str.contains(QSOURCE_BACKBLAST) | ao.str.contains(QSOURCE_AO))
+        .then(pl.lit(QSOURCE))
+        .when(ao.str.contains(NOT_BEATDOWN_AO))
+        .then(pl.lit(RUCK))
+        .when(bb.is_not_null() & ao.is_not_null())
+        .then(pl.lit(BEATDOWN))
+        .otherwise(None)
+    )
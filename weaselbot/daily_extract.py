@@ -0,0 +1,277 @@
+"""
+One national attendance extract a day, shared by the achievements and Kotter report jobs.
+
+The first job to run each day pulls every region's posts (through the "attendance" snapshot, so only recent
+beatdowns come from MySQL) and its home region counts, and writes both as uncompressed Arrow IPC files under
+WEASELBOT_CACHE_DIR/extracts/<date>, with a manifest of the regions and first date they cover. Later runs that day,
+of either job, memory-map those files instead of querying PAXminer again. A run needing an earlier start date or a
+region the artifact lacks rebuilds it to cover both. The manifest records the first date every region's snapshot
+actually covers, not the date asked for, and runs of both jobs take a lock on the directory while they check,
+build or read the artifact.
+
+The artifact starts at the earliest of the requested date, January 1st and `EXTRACT_WEEKS` weeks ago, so the
+achievements job's year and the Kotter report's lookback window are normally both covered by whichever job runs
+first.
+
+Classes:
+    DailyExtract:
+        The day's attendance rows and home region counts.
+
+Functions:
+    attendance_from(u: Table, a: Table, b: Table, ao: Table):
+        The joins and filters every national attendance query shares, and the Q condition.
+
+    attendance_queries(schemas, metadata, engine, source, since) -> dict[str, Selectable]:
+        Every region's canonical attendance query.
+
+    daily_extract(engine, metadata, schemas, source, start, path) -> DailyExtract:
+        Load today's artifact, building it first if it's missing or doesn't cover the request.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, Tuple
+
+import polars as pl
+from sqlalchemy import MetaData, Table
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Selectable, and_, case, func, or_, select
+
+from .activity import activity_sql
+from .home_regions import home_region_queries
+from .snapshots import SnapshotStore, extract_incremental
+from .utils import CACHE_DIR, SchemaDiscovery, extract_schemas, reflect_table
+
+EXTRACT_WEEKS = 26
+# test and national regions, left out of every job's extract
+EXCLUDED_SCHEMAS = ("f3devcommunity", "f3development", "f3csra")
+CASTS = {"user_id": pl.String(), "ao": pl.String(), "activity": pl.String(), "q_flag": pl.Int64()}
+
+
+@dataclass
+class DailyExtract:
+    """
+    The day's national extract.
+
+    :param attendance: every post from `start` on, with its source region as schema, and email, user_id, user_name,
+        ao_id, ao, date, q_flag and activity
+    :type attendance: pl.DataFrame
+    :param counts: every region's home region counts per user, as `home_region_queries(..., by_user=True)`
+    :type counts: pl.DataFrame
+    :param start: the first date `attendance` covers, None for all history
+    :type start: date | None
+    """
+
+    attendance: pl.DataFrame
+    counts: pl.DataFrame
+    start: date | None
+
+
+def attendance_from(u: Table, a: Table, b: Table, ao: Table):
+    """The joins and filters every national attendance query shares, and the condition for a man having Q'd."""
+    is_q = or_(a.c.user_id == b.c.q_user_id, a.c.user_id == b.c.coq_user_id)
+    joined = (
+        u.join(a, a.c.user_id == u.c.user_id)
+        .join(
+            b,
+            and_(
+                or_(a.c.q_user_id == b.c.q_user_id, a.c.q_user_id == b.c.coq_user_id),
+                a.c.ao_id == b.c.ao_id,
+                a.c.date == b.c.bd_date,
+            ),
+        )
+        .join(ao, b.c.ao_id == ao.c.channel_id)
+    )
+    where = (
+        b.c.bd_date > 0,
+        b.c.bd_date <= func.curdate(),
+        u.c.email != "none",
+        u.c.user_name != "PAXminer",
+        b.c.q_user_id.is_not(None),
+    )
+    return joined, where, is_q
+
+
+def attendance_queries(
+    schemas: list[str],
+    metadata: MetaData,
+    engine: Engine,
+    source: SchemaDiscovery | None = None,
+    since: dict[str, date | None] | None = None,
+) -> dict[str, Selectable[Tuple[str, str, str, str, str, date, int, str]]]:
+    """
+    Build every region's attendance query, with the columns both jobs read.
+
+    :param schemas: the regions to query
+    :type schemas: list[str]
+    :param metadata: SQLAlchemy MetaData object for schema reflection
+    :type metadata: MetaData
+    :param engine: SQLAlchemy Engine object for database connection
+    :type engine: Engine
+    :param source: tables discovered in bulk by `discover_schemas`, used instead of reflection
+    :type source: SchemaDiscovery | None
+    :param since: per-schema first beatdown date to fetch, for incremental extracts
+    :type since: dict[str, date | None] | None
+    :return: one query per schema selecting email, user_id, user_name, ao_id, ao, date, q_flag and the beatdown's
+        activity classification (see `activity.activity_sql`) in place of the backblast text
+    :rtype: dict[str, Selectable]
+    """
+
+    queries = {}
+    for schema in schemas:
+        try:
+            u = reflect_table("users", metadata, engine, schema, source)
+            a = reflect_table("bd_attendance", metadata, engine, schema, source)
+            b = reflect_table("beatdowns", metadata, engine, schema, source)
+            ao = reflect_table("aos", metadata, engine, schema, source)
+        except SQLAlchemyError as e:
+            logging.error(f"Schema {schema} error: {e}")
+            continue
+        joined, where, is_q = attendance_from(u, a, b, ao)
+        sql = (
+            select(
+                u.c.email,
+                u.c.user_id,
+                u.c.user_name,
+                a.c.ao_id,
+                ao.c.ao.label("ao"),
+                b.c.bd_date.label("date"),
+                case((is_q, 1), else_=0).label("q_flag"),
+                activity_sql(b.c.backblast, ao.c.ao).label("activity"),
+            )
+            .select_from(joined)
+            .where(*where)
+        )
+        if since is not None and since.get(schema) is not None:
+            sql = sql.where(b.c.bd_date >= since[schema])
+        queries[schema] = sql
+    return queries
+
+
+@contextmanager
+def _locked(root: str) -> Iterator[None]:
+    # overlapping runs of the two jobs would otherwise replace or remove each other's files
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_manifest(directory: str) -> dict | None:
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        start = manifest["start"] and date.fromisoformat(manifest["start"])
+        return {"start": start, "schemas": set(manifest["schemas"])}
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _read_ipc(files: dict[str, str]) -> tuple[pl.DataFrame, pl.DataFrame]:
+    # polars memory-maps local uncompressed IPC files, so this doesn't copy them into memory
+    return pl.read_ipc(files["attendance"]), pl.read_ipc(files["counts"])
+
+
+def _write_ipc(df: pl.DataFrame, file: str) -> None:
+    tmp = f"{file}.tmp"
+    # uncompressed, so readers can memory-map it
+    df.write_ipc(tmp, compression="uncompressed")
+    os.replace(tmp, file)
+
+
+def daily_extract(
+    engine: Engine,
+    metadata: MetaData,
+    schemas: list[str],
+    source: SchemaDiscovery | None = None,
+    start: date | None = None,
+    path: str | None = None,
+) -> DailyExtract:
+    """
+    Today's national attendance and home region counts, from the day's artifact if it covers the request, and
+    otherwise extracted and saved as the day's artifact first.
+
+    :param engine: SQLAlchemy engine the extract is read through
+    :type engine: Engine
+    :param metadata: SQLAlchemy MetaData object for schema reflection
+    :type metadata: MetaData
+    :param schemas: the regions needed
+    :type schemas: list[str]
+    :param source: tables discovered in bulk by `discover_schemas`, used instead of reflection
+    :type source: SchemaDiscovery | None
+    :param start: the first beatdown date needed, None for all history
+    :type start: date | None
+    :param path: root directory. Defaults to WEASELBOT_CACHE_DIR/extracts.
+    :type path: str | None
+    :return: the extract. It may cover more regions and dates than requested.
+    :rtype: DailyExtract
+    """
+
+    today = date.today()
+    root = path or os.path.join(os.getenv("WEASELBOT_CACHE_DIR", CACHE_DIR), "extracts")
+    directory = os.path.join(root, today.isoformat())
+    files = {name: os.path.join(directory, f"{name}.arrow") for name in ("attendance", "counts")}
+
+    def covers(first: date | None, needed: date | None) -> bool:
+        return first is None or (needed is not None and first <= needed)
+
+    with _locked(root):
+        manifest = _read_manifest(directory)
+        if manifest is not None and covers(manifest["start"], start) and manifest["schemas"] >= set(schemas):
+            try:
+                attendance, counts = _read_ipc(files)
+                logging.info(f"Loaded today's national extract of {attendance.height} posts")
+                return DailyExtract(attendance, counts, manifest["start"])
+            except (FileNotFoundError, pl.exceptions.ComputeError) as e:
+                logging.error(f"Rebuilding today's national extract, which couldn't be read: {e}")
+
+        if start is not None:
+            start = min(start, date(today.year, 1, 1), today - timedelta(weeks=EXTRACT_WEEKS))
+        if manifest is not None:
+            start = None if start is None or manifest["start"] is None else min(start, manifest["start"])
+            schemas = sorted(manifest["schemas"] | set(schemas))
+        logging.info(f"Building today's national extract for {len(schemas)} regions from {start or 'the start'}...")
+        store = SnapshotStore("attendance")
+        attendance = extract_incremental(
+            store,
+            lambda since: attendance_queries(schemas, metadata, engine, source, since),
+            schemas,
+            engine,
+            start=start,
+            casts=CASTS,
+            tag="schema",
+        )
+        counts, _ = extract_schemas(
+            home_region_queries(pl.DataFrame({"schema_name": schemas}), metadata, engine, source, by_user=True), engine
+        )
+        # a region whose earlier history couldn't be fetched leaves the artifact starting later than asked
+        covered = max((c for c in map(store.covered, schemas) if c is not None), default=start or date.min)
+        if covered > (start or date.min):
+            logging.error(f"Today's national extract only covers every region from {covered}")
+            start = covered
+        start = None if start == date.min else start
+
+        # earlier days' artifacts are no longer needed
+        for day in os.listdir(root):
+            if day != today.isoformat() and os.path.isdir(os.path.join(root, day)):
+                shutil.rmtree(os.path.join(root, day), ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        _write_ipc(attendance, files["attendance"])
+        _write_ipc(counts, files["counts"])
+        tmp = os.path.join(directory, "manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"start": start and start.isoformat(), "schemas": list(schemas)}, f, indent=2)
+        os.replace(tmp, os.path.join(directory, "manifest.json"))
+
+        attendance, counts = _read_ipc(files)
+    return DailyExtract(attendance, counts, start)
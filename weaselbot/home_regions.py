@@ -0,0 +1,145 @@
+"""
+Home region assignment shared by the achievements and Kotter report jobs.
+
+A man's home region is the region where he has the most recent attendance. For each region he posted at this
+year, his attendance is counted over the last 30 days, falling back to 60, 90 and 120 days and finally the whole
+year when a shorter window is empty. The region with the highest count wins.
+
+All five counts come from a single scan of each region's attendance using conditional aggregation, and the winner
+per email is picked with an arg-max rather than a per-group sort.
+
+Functions:
+    home_region_counts_sql(schema: str, u: Table, a: Table, b: Table, ao: Table, by_user: bool) -> Selectable:
+        One region's windowed attendance counts in a single pass.
+
+    home_region_queries(schemas, metadata, engine, source, by_user) -> dict[str, Selectable]:
+        The per-schema count queries, for `extract_schemas`.
+
+    resolve_home_regions(counts: pl.DataFrame, by_user: bool) -> pl.DataFrame:
+        Pick each email's home region from the counts.
+"""
+
+import logging
+from typing import Tuple
+
+import polars as pl
+from sqlalchemy import MetaData, Table
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Selectable, and_, case, func, literal_column, or_, select
+
+from .utils import SchemaDiscovery, reflect_table
+
+WINDOWS = (30, 60, 90, 120)
+
+
+def home_region_counts_sql(
+    schema: str, u: Table, a: Table, b: Table, ao: Table, by_user: bool = False
+) -> Selectable[Tuple[str, str, int, int, int, int, int]]:
+    """
+    Count each man's attendance in the region over the 30/60/90/120 day windows and the current year in one
+    scan. Only men who posted in the region this year are returned, though with `by_user` a user_id without
+    posts this year is kept so it can still count towards its email's windows.
+
+    Args:
+        schema (str): The region's schema name.
+        u (Table): The users table.
+        a (Table): The bd_attendance table.
+        b (Table): The beatdowns table.
+        ao (Table): The aos table.
+        by_user (bool): Group by user_id as well as email.
+    Returns:
+        Selectable[Tuple[str, str, int, int, int, int, int]]: region, email, (user_id,) d30, d60, d90, d120 and year.
+    """
+
+    days_ago = func.datediff(func.curdate(), b.c.bd_date)
+    this_year = func.year(b.c.bd_date) == func.year(func.curdate())
+    year_count = func.sum(case((this_year, 1), else_=0))
+    keys = [u.c.email, u.c.user_id] if by_user else [u.c.email]
+    sql = (
+        select(
+            literal_column(f"'{schema}'").label("region"),
+            *keys,
+            *(func.sum(case((days_ago < days, 1), else_=0)).label(f"d{days}") for days in WINDOWS),
+            year_count.label("year"),
+        )
+        .select_from(
+            u.join(a, a.c.user_id == u.c.user_id)
+            .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
+            .join(ao, b.c.ao_id == ao.c.channel_id)
+        )
+        .where(or_(this_year, days_ago < max(WINDOWS)))
+        .group_by(*keys)
+    )
+    # per-user rows still feed the email's window counts, so they're only dropped after pooling
+    return sql if by_user else sql.having(year_count > 0)
+
+
+def home_region_queries(
+    schemas: pl.DataFrame,
+    metadata: MetaData,
+    engine: Engine,
+    source: SchemaDiscovery | None = None,
+    by_user: bool = False,
+) -> dict[str, Selectable]:
+    """
+    Build `home_region_counts_sql` for every schema.
+
+    Args:
+        schemas (pl.DataFrame): A DataFrame containing schema names.
+        metadata (MetaData): SQLAlchemy MetaData object.
+        engine (Engine): SQLAlchemy Engine object.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
+        by_user (bool): Group by user_id as well as email.
+    Returns:
+        dict[str, Selectable]: One query per schema, keyed by schema name. Schemas that error are logged and skipped.
+    """
+
+    queries = {}
+    for row in schemas.iter_rows():
+        schema = row[0]
+        try:
+            u = reflect_table("users", metadata, engine, schema, source)
+            a = reflect_table("bd_attendance", metadata, engine, schema, source)
+            b = reflect_table("beatdowns", metadata, engine, schema, source)
+            ao = reflect_table("aos", metadata, engine, schema, source)
+            queries[schema] = home_region_counts_sql(schema, u, a, b, ao, by_user)
+        except SQLAlchemyError as e:
+            logging.error(f"Schema {schema} error: {e}")
+        except Exception as e:
+            logging.error(f"Unexpected error in schema {schema}: {str(e)}")
+    return queries
+
+
+def resolve_home_regions(counts: pl.DataFrame, by_user: bool = False) -> pl.DataFrame:
+    """
+    Pick each email's home region from the windowed counts. A region's attendance is its count over the shortest
+    non-empty window, falling back to the year. Ties go to the alphabetically first region.
+
+    Args:
+        counts (pl.DataFrame): The combined results of `home_region_queries`.
+        by_user (bool): The counts are per user_id. Window counts are then pooled across every user_id sharing
+            the email in the region, while the year fallback stays per user_id.
+    Returns:
+        pl.DataFrame: One row per email with region, (user_id,) and attendance.
+    """
+
+    windows = [pl.col(f"d{days}") for days in WINDOWS]
+    if by_user:
+        windows = [w.sum().over("region", "email") for w in windows]
+    else:
+        counts = counts.group_by("region", "email").agg(pl.col(*(f"d{days}" for days in WINDOWS), "year").sum())
+
+    attendance = pl.when(windows[0] > 0).then(windows[0])
+    for w in windows[1:]:
+        attendance = attendance.when(w > 0).then(w)
+    keys = ["region", "email", "user_id"] if by_user else ["region", "email"]
+
+    return (
+        counts.with_columns(attendance.otherwise(pl.col("year")).cast(pl.Int64).alias("attendance"))
+        .filter(pl.col("year") > 0)
+        .select(*keys, "attendance")
+        .sort("email", "region")
+        .group_by("email", maintain_order=True)
+        .agg(pl.all().get(pl.col("attendance").arg_max()))
+    )
@@ -3,185 +3,308 @@
 """
 This module contains functions to generate and send Kotter reports for different regions using SQLAlchemy and Slack SDK.
 The main functionalities include:
-1. Generating subqueries to retrieve user attendance data.
-2. Building SQL queries to retrieve home region attendance data.
-3. Generating SQL queries to retrieve user attendance and beatdown information.
-4. Building a weekly report message for WeaselBot Site Q.
-5. Sending the generated report to specified site Q users via Slack.
-6. Logging the successful sending of Kotter reports to a Slack channel.
+1. Reading the day's national attendance and home regions from `daily_extract`, shared with the achievements job.
+2. Building a weekly report message for WeaselBot Site Q.
+3. Sending the generated report to specified site Q users via Slack, every region's concurrently.
+4. Logging the successful sending of Kotter reports to a Slack channel.
 Functions:
-    home_region_sub_query(u: Table, a: Table, b: Table, ao: Table, date_range: int) -> Subquery[Tuple[str, int]]:
-    build_home_regions(schemas: pl.DataFrame, metadata: MetaData, engine: Engine) -> Selectable[Tuple[str, str, str]]:
-    nation_sql(schemas: pl.DataFrame, engine: Engine, metadata: MetaData) -> Selectable[Tuple[str, str, str, str, str, str]]:
+    lifetime_queries(schemas: pl.DataFrame, engine: Engine, metadata: MetaData, source) -> dict[str, Selectable]:
+    lifetime_summary(df: pl.DataFrame) -> pl.DataFrame:
+    lookback_start(settings: Iterable[dict]) -> date | None:
+    pax_email_queries(schemas: list[str], metadata: MetaData, engine: Engine, source) -> dict[str, Selectable]:
+    preflight_regions(schemas: list[str], contexts: dict[str, RegionContext], emails: pl.DataFrame) -> tuple[list[str], list[str], dict[str, str]]:
+    kotter_cutoffs(settings: dict[str, dict]) -> pl.DataFrame:
+    classify_kotter(df: pl.DataFrame, siteqs: pl.DataFrame, cutoffs: pl.DataFrame, lifetime: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    build_kotter_frames(df: pl.DataFrame, siteq_df: pl.DataFrame, no_post_threshold: int, ...) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    render_kotter_reports(df_mia: pl.DataFrame, df_lowq: pl.DataFrame, df_noq: pl.DataFrame) -> pl.DataFrame:
     build_kotter_report(df_posts: pl.DataFrame, df_qs: pl.DataFrame, df_noqs: pl.DataFrame, siteq: str) -> str:
-    send_weaselbot_report(schema: str, client: WebClient, siteq_df: pl.DataFrame, df_mia: pl.DataFrame, df_lowq: pl.DataFrame, df_noq: pl.DataFrame, default_siteq: str) -> None:
-    slack_log(schema: str, engine: Engine, metadata: MetaData, client: WebClient) -> None:
+    kotter_messages(siteq_df: pl.DataFrame, df_mia: pl.DataFrame, df_lowq: pl.DataFrame, df_noq: pl.DataFrame, default_siteq: str) -> list[tuple[str, str]]:
+    send_weaselbot_report(schema: str, dispatcher: SlackDispatcher, token: str, siteq_df: pl.DataFrame, df_mia: pl.DataFrame, df_lowq: pl.DataFrame, df_noq: pl.DataFrame, default_siteq: str) -> None:
+    siteq_queries(schemas: list[str], metadata: MetaData, engine: Engine, source) -> dict[str, Selectable]:
+    slack_log(schema: str, engine: Engine, metadata: MetaData, dispatcher: SlackDispatcher, token: str, source, paxminer_log_channel) -> None:
+    log_outcomes(outcomes: list[SlackOutcome]) -> None:
     main() -> None:
 """
 
 import logging
 from datetime import date, timedelta
-from typing import Tuple
+from typing import Iterable, Tuple
 
 import polars as pl
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from sqlalchemy import MetaData, Subquery, Table
+from sqlalchemy import MetaData
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.sql import Selectable, and_, case, func, literal_column, or_, select, union_all
+from sqlalchemy.sql import Selectable, case, func, select
+
+from .daily_extract import EXCLUDED_SCHEMAS, attendance_from, daily_extract
+from .home_regions import resolve_home_regions
+from .region_context import RegionContext, paxminer_log_queries, prefetch_regions
+from .slack_dispatch import SlackDispatcher, SlackMessage, SlackOutcome
+from .utils import (
+    ReflectionFailures,
+    SchemaDiscovery,
+    discover_schemas,
+    extract_schemas,
+    log_query_stats,
+    mysql_connection,
+    read_frame,
+    reflect_table,
+)
+
+# weaselbot.regions columns read for each region, in unpacking order
+KOTTER_SETTINGS = (
+    "default_siteq",
+    "slack_token",
+    "NO_POST_THRESHOLD",
+    "NO_Q_THRESHOLD_WEEKS",
+    "REMINDER_WEEKS",
+    "NO_Q_THRESHOLD_POSTS",
+    "HOME_AO_CAPTURE",
+)
+KOTTER_THRESHOLDS = KOTTER_SETTINGS[2:]
+# the settings bounding how far back a region's report looks at attendance
+LOOKBACK_SETTINGS = ("REMINDER_WEEKS", "HOME_AO_CAPTURE")
+GREETING = "Howdy, <{}>! This is your weekly WeaselBot Site Q report. According to my records..."
+SECTION_HEADINGS = (
+    "\n\nThe following men haven't posted in a while.",
+    "\n\nThese guys haven't Q'd in a while. Here's how many days it's been:",
+    "\n\nThese guys have never been Q:",
+)
+DEFAULT_NOTE = (
+    "\n\nNote: If you have listed your site Qs on your aos table, this information will have gone out to them as well."
+)
+LIFETIME_CASTS = {"first_post": pl.Date, "last_post": pl.Date, "last_q": pl.Date, "total_qs": pl.Int64}
+
+
+def lifetime_queries(
+    schemas: pl.DataFrame, engine: Engine, metadata: MetaData, source: SchemaDiscovery | None = None
+) -> dict[str, Selectable[Tuple[str, date, date, date, int]]]:
+    """
+    Build each region's per-pax summary of all its attendance, so the national extract only needs recent rows.
+    Args:
+        schemas (pl.DataFrame): A DataFrame containing schema names.
+        engine (Engine): SQLAlchemy Engine object for database connection.
+        metadata (MetaData): SQLAlchemy MetaData object for schema reflection.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
+    Returns:
+        dict[str, Selectable[Tuple[str, date, date, date, int]]]: One query per schema selecting each email's first
+        post, last post, last Q and total Qs in the region, over the same posts as `daily_extract.attendance_queries`.
+    """
 
-from .utils import mysql_connection, slack_client
+    queries = {}
+    for schema in schemas.get_column("schema_name").to_list():
+        try:
+            u = reflect_table("users", metadata, engine, schema, source)
+            a = reflect_table("bd_attendance", metadata, engine, schema, source)
+            b = reflect_table("beatdowns", metadata, engine, schema, source)
+            ao = reflect_table("aos", metadata, engine, schema, source)
+        except SQLAlchemyError as e:
+            logging.error(f"Schema {schema} error: {e}")
+            continue
+        joined, where, is_q = attendance_from(u, a, b, ao)
+        queries[schema] = (
+            select(
+                u.c.email,
+                func.min(b.c.bd_date).label("first_post"),
+                func.max(b.c.bd_date).label("last_post"),
+                func.max(case((is_q, b.c.bd_date))).label("last_q"),
+                func.sum(case((is_q, 1), else_=0)).label("total_qs"),
+            )
+            .select_from(joined)
+            .where(*where)
+            .group_by(u.c.email)
+        )
+    return queries
 
 
-def home_region_sub_query(u: Table, a: Table, b: Table, ao: Table, date_range: int) -> Subquery[Tuple[str, int]]:
+def lifetime_summary(df: pl.DataFrame) -> pl.DataFrame:
     """
-    Generates a subquery to retrieve user email and their attendance count within a specified date range.
+    Combine per-pax lifetime summaries across regions, or summarise rows of the daily national extract.
     Args:
-        u (Table): The user table.
-        a (Table): The attendance table.
-        b (Table): The bridge table linking attendance and another entity.
-        ao (Table): The table containing additional information about the entity.
-        date_range (int): The number of days to look back from the current date.
+        df (pl.DataFrame): Either the `lifetime_queries` results, or email, date and q_flag of every post.
     Returns:
-        Subquery[Tuple[str, int]]: A subquery object that returns tuples of user email and attendance count.
+        pl.DataFrame: email, first_post, last_post, last_q and total_qs, one row per email.
     """
 
+    if "q_flag" in df.columns:
+        df = df.select(
+            "email",
+            pl.col("date").alias("first_post"),
+            pl.col("date").alias("last_post"),
+            pl.when(pl.col("q_flag") == 1).then(pl.col("date")).alias("last_q"),
+            pl.col("q_flag").alias("total_qs"),
+        )
     return (
-        select(u.c.email, func.count(a.c.user_id).label("attendance"))
-        .select_from(
-            u.join(a, a.c.user_id == u.c.user_id)
-            .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
-            .join(ao, b.c.ao_id == ao.c.channel_id)
+        df.cast(LIFETIME_CASTS)
+        .group_by("email")
+        .agg(
+            pl.col("first_post").min(),
+            pl.col("last_post").max(),
+            pl.col("last_q").max(),
+            pl.col("total_qs").sum(),
         )
-        .where(func.datediff(func.curdate(), b.c.bd_date) < date_range)
-        .group_by(u.c.email)
-        .subquery()
     )
 
 
-def build_home_regions(schemas: pl.DataFrame, metadata: MetaData, engine: Engine) -> Selectable[Tuple[str, str, str]]:
+def lookback_start(settings: Iterable[dict]) -> date | None:
     """
-    Builds a SQL query to retrieve home region attendance data for users across multiple schemas.
+    The first beatdown date any region's report looks at: the widest of every region's REMINDER_WEEKS and
+    HOME_AO_CAPTURE. A man's posts in every region count towards his home region's report, so each region's rows
+    are fetched over the widest window rather than its own.
     Args:
-        schemas (pl.DataFrame): A DataFrame containing schema names.
-        metadata (MetaData): SQLAlchemy MetaData object.
-        engine (Engine): SQLAlchemy Engine object.
+        settings (Iterable[dict]): Each region's `weaselbot.regions` settings.
     Returns:
-        Selectable[Tuple[str, str, str]]: A union of SQL queries for each schema, selecting region, user email, user ID, and attendance.
-    The function iterates over each schema, constructs tables for users, attendance, beatdowns, and AOs, and builds subqueries for different date ranges.
-    It then constructs a main query to select the region, user email, user ID, and attendance, joining the necessary tables and subqueries.
-    The queries are combined using a union_all operation and returned.
-    If an error occurs while processing a schema, it logs the error and continues with the next schema.
+        date | None: The date, or None if no region has the settings and all history is needed.
     """
 
-    queries = []
-    for row in schemas.iter_rows():
-        schema = row[0]
+    weeks = [int(s[c]) for s in settings for c in LOOKBACK_SETTINGS if s.get(c) is not None]
+    return date.today() - timedelta(weeks=max(weeks)) if weeks else None
+
+
+def siteq_queries(
+    schemas: list[str], metadata: MetaData, engine: Engine, source: SchemaDiscovery | None = None
+) -> dict[str, Selectable[Tuple[str, str, str]]]:
+    """
+    Build each region's query for the AOs that have a site Q assigned, for `region_context.prefetch_regions`.
+    Args:
+        schemas (list[str]): The regions to query. Their aos tables must have the site_q_user_id column.
+        metadata (MetaData): SQLAlchemy MetaData object for schema reflection.
+        engine (Engine): SQLAlchemy Engine object for database connection.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
+    Returns:
+        dict[str, Selectable[Tuple[str, str, str]]]: One query per schema selecting home_ao, ao and site_q_user_id.
+    """
+
+    queries = {}
+    for schema in schemas:
         try:
-            u = Table("users", metadata, autoload_with=engine, schema=schema)
-            a = Table("bd_attendance", metadata, autoload_with=engine, schema=schema)
-            b = Table("beatdowns", metadata, autoload_with=engine, schema=schema)
-            ao = Table("aos", metadata, autoload_with=engine, schema=schema)
-
-            s1, s2, s3, s4 = (home_region_sub_query(u, a, b, ao, date_range) for date_range in (30, 60, 90, 120))
-
-            sql = (
-                select(
-                    literal_column(f"'{schema}'").label("region"),
-                    u.c.email,
-                    u.c.user_id,
-                    case(
-                        (s1.c.attendance.is_not(None), s1.c.attendance),
-                        (s2.c.attendance.is_not(None), s2.c.attendance),
-                        (s3.c.attendance.is_not(None), s3.c.attendance),
-                        (s4.c.attendance.is_not(None), s4.c.attendance),
-                        else_=func.count(a.c.user_id),
-                    ).label("attendance"),
-                )
-                .select_from(
-                    u.join(a, a.c.user_id == u.c.user_id)
-                    .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
-                    .join(ao, b.c.ao_id == ao.c.channel_id)
-                    .outerjoin(s1, u.c.email == s1.c.email)
-                    .outerjoin(s2, u.c.email == s2.c.email)
-                    .outerjoin(s3, u.c.email == s3.c.email)
-                    .outerjoin(s4, u.c.email == s4.c.email)
-                )
-                .where(func.year(b.c.bd_date) == func.year(func.curdate()))
-                .group_by(literal_column(f"'{schema}'").label("region"), u.c.email, u.c.user_id)
-            )
-            queries.append(sql)
+            ao = reflect_table("aos", metadata, engine, schema, source)
         except SQLAlchemyError as e:
             logging.error(f"Schema {schema} error: {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error in schema {schema}: {str(e)}")
-
-    return union_all(*queries)
+            continue
+        queries[schema] = select(ao.c.channel_id.label("home_ao"), ao.c.ao, ao.c.site_q_user_id).where(
+            ao.c.site_q_user_id.is_not(None)
+        )
+    return queries
 
 
-def nation_sql(
-    schemas: pl.DataFrame, engine: Engine, metadata: MetaData
-) -> Selectable[Tuple[str, str, str, str, str, str]]:
+def pax_email_queries(
+    schemas: list[str], metadata: MetaData, engine: Engine, source: SchemaDiscovery | None = None
+) -> dict[str, Selectable[Tuple[str]]]:
     """
-    Generates a SQL query to retrieve user attendance and beatdown information from multiple schemas.
+    Build each region's query for its users' distinct emails, for `preflight_regions`.
     Args:
-        schemas (pl.DataFrame): A DataFrame containing schema names.
-        engine (Engine): SQLAlchemy Engine object for database connection.
+        schemas (list[str]): The regions to query.
         metadata (MetaData): SQLAlchemy MetaData object for schema reflection.
+        engine (Engine): SQLAlchemy Engine object for database connection.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
     Returns:
-        Selectable[Tuple[str, str, str, str, str, str]]: A union of SQL queries for each schema, selecting user email,
-        AO ID, AO name, beatdown date, and a flag indicating if the user was a Q (leader) for the beatdown.
-    The function iterates over each schema, constructs a SQL query to join the 'users', 'bd_attendance', 'beatdowns',
-    and 'aos' tables, and applies necessary filters. If an error occurs during query construction for a schema,
-    it logs the error and continues with the next schema.
+        dict[str, Selectable[Tuple[str]]]: One query per schema selecting email.
     """
-    queries = []
-    for row in schemas.iter_rows():
-        schema = row[0]
+
+    queries = {}
+    for schema in schemas:
         try:
-            u = Table("users", metadata, autoload_with=engine, schema=schema)
-            a = Table("bd_attendance", metadata, autoload_with=engine, schema=schema)
-            b = Table("beatdowns", metadata, autoload_with=engine, schema=schema)
-            ao = Table("aos", metadata, autoload_with=engine, schema=schema)
-
-            sql = (
-                select(
-                    u.c.email,
-                    a.c.ao_id,
-                    ao.c.ao.label("ao"),
-                    b.c.bd_date.label("date"),
-                    case((or_(a.c.user_id == b.c.q_user_id, a.c.user_id == b.c.coq_user_id), 1), else_=0).label(
-                        "q_flag"
-                    ),
-                )
-                .select_from(
-                    u.join(a, a.c.user_id == u.c.user_id)
-                    .join(
-                        b,
-                        and_(
-                            or_(a.c.q_user_id == b.c.q_user_id, a.c.q_user_id == b.c.coq_user_id),
-                            a.c.ao_id == b.c.ao_id,
-                            a.c.date == b.c.bd_date,
-                        ),
-                    )
-                    .join(ao, b.c.ao_id == ao.c.channel_id)
-                )
-                .where(
-                    b.c.bd_date > 0,
-                    b.c.bd_date <= func.curdate(),
-                    u.c.email != "none",
-                    u.c.user_name != "PAXminer",
-                    b.c.q_user_id.is_not(None),
-                )
-            )
-            queries.append(sql)
+            u = reflect_table("users", metadata, engine, schema, source)
         except SQLAlchemyError as e:
             logging.error(f"Schema {schema} error: {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error in schema {schema}: {str(e)}")
+            continue
+        queries[schema] = select(u.c.email).where(u.c.email != "none", u.c.user_name != "PAXminer").group_by(u.c.email)
+    return queries
+
+
+def preflight_regions(
+    schemas: list[str], contexts: dict[str, RegionContext], emails: pl.DataFrame
+) -> tuple[list[str], list[str], dict[str, str]]:
+    """
+    Find the regions that get a Kotter report, and the regions whose data their reports need: their own, and any
+    region sharing a man with them, since his posts there count towards his home region and his report.
+    Args:
+        schemas (list[str]): Every region.
+        contexts (dict[str, RegionContext]): The prefetched settings and site Qs of the regions whose aos table
+            has a site_q_user_id column.
+        emails (pl.DataFrame): schema and email of every region's users, from `pax_email_queries`. Regions missing
+            here are kept, as they can't be ruled out.
+    Returns:
+        tuple[list[str], list[str], dict[str, str]]: The regions that get a report, the regions to extract, and
+        the regions left out of the extract, each with why it doesn't get a report.
+    """
+
+    if not emails.width:
+        emails = pl.DataFrame(schema={"email": pl.String, "schema": pl.String})
+    participating, reasons = [], {}
+    for schema in schemas:
+        context = contexts.get(schema)
+        if context is None:
+            reasons[schema] = "no site_q_user_id column on the aos table"
+        elif not context.settings:
+            reasons[schema] = "no weaselbot.regions row"
+        elif "siteq" not in context.tables:
+            reasons[schema] = "site Qs that couldn't be read"
+        else:
+            participating.append(schema)
 
-    return union_all(*queries)
+    reported = emails.filter(pl.col("schema").is_in(participating)).get_column("email")
+    needed = set(emails.filter(pl.col("email").is_in(reported.implode())).get_column("schema").to_list())
+    needed |= set(schemas) - set(emails.get_column("schema").to_list())
+    extract = [schema for schema in schemas if schema in needed or schema in participating]
+    pruned = {schema: reasons[schema] for schema in schemas if schema not in extract}
+    return participating, extract, pruned
+
+
+def _greeting(siteq: str | None) -> str:
+    try:
+        siteq = f"@{siteq}" if siteq[0].upper() == "U" else "!channel"
+    except (IndexError, TypeError):
+        logging.error("No Site Q in the table. Proceeding with @channel")
+        siteq = "!channel"
+    return GREETING.format(siteq)
+
+
+def render_kotter_reports(df_mia: pl.DataFrame, df_lowq: pl.DataFrame, df_noq: pl.DataFrame) -> pl.DataFrame:
+    """
+    Render every site Q's weekly report at once, from frames holding any number of site Qs' men.
+    Args:
+        df_mia (pl.DataFrame): Men who haven't posted in a while, with user_id, date and site_q_user_id.
+        df_lowq (pl.DataFrame): Men who haven't Q'd in a while, with user_id, date and site_q_user_id.
+        df_noq (pl.DataFrame): Men who have never Q'd, with user_id and site_q_user_id.
+    Returns:
+        pl.DataFrame: site_q_user_id and message, one row per site Q with at least one man listed, in the order
+        they first appear.
+    """
+
+    today = date.today()
+    lines = (
+        df_mia.select("site_q_user_id", pl.format("\n- <@{}> last posted {}", "user_id", "date").alias("line")),
+        df_lowq.sort("date", descending=True, maintain_order=True).select(
+            "site_q_user_id",
+            pl.format("\n- <@{}>: {}!", "user_id", (pl.lit(today) - pl.col("date")).dt.total_days()).alias("line"),
+        ),
+        df_noq.select("site_q_user_id", pl.format("\n- <@{}>", "user_id").alias("line")),
+    )
+    sections = [
+        df.cast({"site_q_user_id": pl.String})
+        .filter(pl.col("site_q_user_id").is_not_null())
+        .group_by("site_q_user_id", maintain_order=True)
+        .agg((pl.lit(heading) + pl.col("line").str.join("")).alias(f"section{i}"))
+        for i, (df, heading) in enumerate(zip(lines, SECTION_HEADINGS, strict=True))
+    ]
+
+    reports = pl.concat(section.select("site_q_user_id") for section in sections).unique(maintain_order=True)
+    for section in sections:
+        reports = reports.join(section, on="site_q_user_id", how="left", maintain_order="left")
+    mention = (
+        pl.when(pl.col("site_q_user_id").str.slice(0, 1).str.to_uppercase() == "U")
+        .then(pl.format("@{}", "site_q_user_id"))
+        .otherwise(pl.lit("!channel"))
+    )
+    return reports.select(
+        "site_q_user_id",
+        pl.concat_str(
+            pl.format(GREETING, mention),
+            *(pl.col(f"section{i}").fill_null("") for i in range(len(sections))),
+        ).alias("message"),
+    )
 
 
 def build_kotter_report(df_posts: pl.DataFrame, df_qs: pl.DataFrame, df_noqs: pl.DataFrame, siteq: str) -> str:
@@ -196,45 +319,191 @@ def build_kotter_report(df_posts: pl.DataFrame, df_qs: pl.DataFrame, df_noqs: pl
         str: The generated report message.
     """
 
-    try:
-        siteq = f"@{siteq}" if siteq[0].upper() == "U" else "!channel"
-    except (IndexError, TypeError):
-        logging.error("No Site Q in the table. Proceeding with @channel")
-        siteq = "!channel"
-    sMessage = [
-        f"Howdy, <{siteq}>! This is your weekly WeaselBot Site Q report. According to my records...",
-    ]
+    greeting = _greeting(siteq)
+    # everyone is listed for this one recipient, so the report is rendered as if they were all his
+    everyone = (df.with_columns(site_q_user_id=pl.lit(siteq or "", pl.String)) for df in (df_posts, df_qs, df_noqs))
+    reports = render_kotter_reports(*everyone)
+    return reports.item(0, "message") if reports.height else greeting
 
-    if df_posts.height > 0:
-        sMessage.append("\n\nThe following men haven't posted in a while.")
 
-        for row in df_posts.iter_rows(named=True):
-            sMessage.append(f"\n- <@{row['user_id']}> last posted {row['date']}")
+def kotter_messages(
+    siteq_df: pl.DataFrame,
+    df_mia: pl.DataFrame,
+    df_lowq: pl.DataFrame,
+    df_noq: pl.DataFrame,
+    default_siteq: str,
+) -> list[tuple[str, str]]:
+    """
+    Build a region's Kotter reports: one for each site Q with men to check on, and one listing everyone for the
+    region's default site Q, unless he is one of the site Qs.
+    Args:
+        siteq_df (pl.DataFrame): The region's AOs with a site Q.
+        df_mia (pl.DataFrame): The region's men who haven't posted in a while.
+        df_lowq (pl.DataFrame): The region's men who haven't Q'd in a while.
+        df_noq (pl.DataFrame): The region's men who have never Q'd.
+        default_siteq (str): The region's default site Q, a user or a channel.
+    Returns:
+        list[tuple[str, str]]: (recipient, message) pairs, the site Qs' in siteq_df order and the default's last.
+    """
+
+    site_qs = siteq_df.select(pl.col("site_q_user_id").cast(pl.String)).unique(maintain_order=True)
+    messages = list(
+        site_qs.join(render_kotter_reports(df_mia, df_lowq, df_noq), on="site_q_user_id", maintain_order="left")
+        .select("site_q_user_id", "message")
+        .iter_rows()
+    )
+    if default_siteq not in site_qs.get_column("site_q_user_id"):
+        messages.append((default_siteq, build_kotter_report(df_mia, df_lowq, df_noq, default_siteq) + DEFAULT_NOTE))
+    return messages
 
-    if df_qs.height > 0:
-        sMessage.append("\n\nThese guys haven't Q'd in a while. Here's how many days it's been:")
 
-        df_qs = (
-            df_qs.with_columns(pl.lit(date.today()).alias("today"))
-            .with_columns(pl.col("today").sub(pl.col("date")))
-            .sort("today")
-            .with_columns(pl.col("date").dt.strftime("%B %d, %Y"))
-        )
+def kotter_cutoffs(settings: dict[str, dict]) -> pl.DataFrame:
+    """
+    Turn each region's Kotter thresholds, in weeks, into the dates `classify_kotter` compares against.
+    Args:
+        settings (dict[str, dict]): Each region's `weaselbot.regions` settings, keyed by schema.
+    Returns:
+        pl.DataFrame: region, home_from (the first post counted towards a man's home AO), reminder_from (the
+        earliest last post or Q still reported), and no_post_to, no_q_to and low_q_to (the latest last post, post
+        without ever Q'ing, and last Q that are reported). A threshold that isn't set reports nobody.
+    """
+
+    today = date.today()
+
+    def weeks_ago(weeks) -> date | None:
+        return None if weeks is None else today - timedelta(weeks=int(weeks))
+
+    columns = {
+        "home_from": "HOME_AO_CAPTURE",
+        "reminder_from": "REMINDER_WEEKS",
+        "no_post_to": "NO_POST_THRESHOLD",
+        "no_q_to": "NO_Q_THRESHOLD_WEEKS",
+        "low_q_to": "NO_Q_THRESHOLD_POSTS",
+    }
+    return pl.DataFrame(
+        [{"region": schema, **{c: weeks_ago(s.get(k)) for c, k in columns.items()}} for schema, s in settings.items()],
+        schema={"region": pl.String, **dict.fromkeys(columns, pl.Date)},
+    )
+
+
+def classify_kotter(
+    df: pl.DataFrame, siteqs: pl.DataFrame, cutoffs: pl.DataFrame, lifetime: pl.DataFrame
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Find the men every region's site Qs should check in on, in one plan over the national data.
+    Args:
+        df (pl.DataFrame): Recent beatdown data, with each man's home region as region and his user_id there. Only
+            the last REMINDER_WEEKS and HOME_AO_CAPTURE weeks are needed.
+        siteqs (pl.DataFrame): Every region's AOs with a site Q, as region, home_ao, ao and site_q_user_id.
+        cutoffs (pl.DataFrame): Each reporting region's `kotter_cutoffs`. Other regions are left out.
+        lifetime (pl.DataFrame): Each man's `lifetime_summary`.
+    Returns:
+        tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]: The men who haven't posted in a while, who haven't Q'd in
+        a while, and who have never Q'd, each with their region and their home AO's site Q. A man's home AO is
+        where he posted most in the last HOME_AO_CAPTURE weeks, ties going to the first ao_id. He is only listed
+        under the first that applies.
+    """
+
+    posts = df.lazy().join(cutoffs.lazy(), on="region")
+    home = (
+        posts.filter(pl.col("date") > pl.col("home_from"))
+        .group_by("region", "email", "ao_id")
+        .agg(pl.len().alias("posts"))
+        .group_by("region", "email")
+        # most posts, ties going to the alphabetically first AO so every window and run agrees
+        .agg(pl.col("ao_id").sort_by("posts", "ao_id", descending=[True, False]).first().alias("home_ao"))
+    )
+    pax = (
+        posts.select("region", "email", "user_id")
+        .unique()
+        .join(home, on=["region", "email"])
+        .join(lifetime.lazy(), on="email")
+        .join(cutoffs.lazy(), on="region")
+    )
+    siteqs = siteqs.lazy()
+    since_reminder = pl.col("date") >= pl.col("reminder_from")
+
+    # men that haven't posted in a while
+    mia = (
+        pax.select("region", "email", "user_id", "home_ao", "reminder_from", "no_post_to", date="last_post")
+        .filter(since_reminder, pl.col("date") <= pl.col("no_post_to"))
+        .select("region", "user_id", "home_ao", "date")
+    )
+    # men that haven't q'ed in a while but have in the past
+    lowq = (
+        pax.select("region", "email", "user_id", "home_ao", "reminder_from", "low_q_to", date="last_q")
+        .filter(since_reminder, pl.col("date") <= pl.col("low_q_to"))
+        .select("region", "user_id", "home_ao", "date")
+        .join(mia, on=["region", "user_id"], how="anti")
+    )
+    # men that have never been Q, anywhere, who posted in the time period
+    noq = (
+        posts.join(home, on=["region", "email"])
+        .join(lifetime.lazy().filter(pl.col("total_qs") == 0).select("email"), on="email")
+        .filter(since_reminder, pl.col("date") <= pl.col("no_q_to"))
+        .select("region", "user_id", "home_ao")
+        .unique()
+        .join(mia, on=["region", "user_id"], how="anti")
+        .join(lowq, on=["region", "user_id"], how="anti")
+    )
+
+    def with_siteq(lf: pl.LazyFrame) -> pl.LazyFrame:
+        return lf.join(siteqs, how="left", on=["region", "home_ao"], coalesce=True)
+
+    df_mia, df_lowq, df_noq = pl.collect_all(
+        [
+            with_siteq(mia)
+            .sort("region", "date", "user_id", descending=[False, True, False])
+            .with_columns(pl.col("date").dt.strftime("%B %d, %Y")),
+            with_siteq(lowq).sort("region", "date", "user_id", descending=[False, True, False]),
+            with_siteq(noq).sort("region", "user_id"),
+        ]
+    )
+    return df_mia, df_lowq, df_noq
 
-        for row in df_qs.iter_rows():
-            sMessage.append(f"\n- <@{row[0]}>: {row[5].days}!")
 
-    if df_noqs.height > 0:
-        sMessage.append("\n\nThese guys have never been Q:")
-        for row in df_noqs.iter_rows(named=True):
-            sMessage.append(f"\n- <@{row['user_id']}>")
+def build_kotter_frames(
+    df: pl.DataFrame,
+    siteq_df: pl.DataFrame,
+    no_post_threshold: int,
+    no_q_threshold: int,
+    reminder_weeks: int,
+    no_q_threshold_posts: int,
+    home_ao_capture: int,
+    lifetime: pl.DataFrame | None = None,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Find the men one region's site Qs should check in on, with `classify_kotter`.
+    Args:
+        df (pl.DataFrame): The region's beatdown data, with each man's user_id in the region. Only the last
+            `reminder_weeks` and `home_ao_capture` weeks are needed when `lifetime` is given.
+        siteq_df (pl.DataFrame): The region's AOs with a site Q, as home_ao, ao and site_q_user_id.
+        no_post_threshold (int): Weeks without a post before a man is listed.
+        no_q_threshold (int): Weeks of posts without ever Q'ing before a man is listed.
+        reminder_weeks (int): Weeks after which a man is no longer listed.
+        no_q_threshold_posts (int): Weeks since a man's last Q before he is listed.
+        home_ao_capture (int): Weeks of posts used to pick each man's home AO.
+        lifetime (pl.DataFrame | None): Each man's `lifetime_summary`. Defaults to summarising `df`, which must
+            then hold all history.
+    Returns:
+        tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]: The men who haven't posted in a while, who haven't Q'd in
+        a while, and who have never Q'd, each with their home AO's site Q.
+    """
 
-    return "".join(sMessage)
+    if lifetime is None:
+        lifetime = lifetime_summary(df)
+    thresholds = (no_post_threshold, no_q_threshold, reminder_weeks, no_q_threshold_posts, home_ao_capture)
+    cutoffs = kotter_cutoffs({"region": dict(zip(KOTTER_THRESHOLDS, thresholds, strict=True))})
+    frames = classify_kotter(
+        df.with_columns(region=pl.lit("region")), siteq_df.with_columns(region=pl.lit("region")), cutoffs, lifetime
+    )
+    return tuple(frame.drop("region") for frame in frames)
 
 
 def send_weaselbot_report(
     schema: str,
-    client: WebClient,
+    dispatcher: SlackDispatcher,
+    token: str,
     siteq_df: pl.DataFrame,
     df_mia: pl.DataFrame,
     df_lowq: pl.DataFrame,
@@ -242,10 +511,12 @@ def send_weaselbot_report(
     default_siteq: str,
 ) -> None:
     """
-    Sends a report to specified site Q users and a default site Q user via Slack.
+    Queues a report to specified site Q users and a default site Q user via Slack, as built by `kotter_messages`.
+    The reports are sent, with every other region's, when the dispatcher runs.
     Parameters:
-    schema (str): The schema name for logging purposes.
-    client (WebClient): The Slack WebClient instance used to send messages.
+    schema (str): The schema name, used as the messages' key for logging.
+    dispatcher (SlackDispatcher): The dispatcher the messages are submitted to.
+    token (str): The region's Slack token.
     siteq_df (pl.DataFrame): DataFrame containing site Q user IDs.
     df_mia (pl.DataFrame): DataFrame containing MIA data.
     df_lowq (pl.DataFrame): DataFrame containing low quality data.
@@ -254,69 +525,57 @@ def send_weaselbot_report(
     Returns:
     None
     """
-    for row in siteq_df.iter_rows(named=True):
-        siteq = row["site_q_user_id"]
-        filter = pl.col("site_q_user_id") == siteq
-        mia = df_mia.filter(filter)
-        lowq = df_lowq.filter(filter)
-        noq = df_noq.filter(filter)
-        sMessage = build_kotter_report(mia, lowq, noq, siteq)
-
-        if sum((mia.height, lowq.height, noq.height)) > 0:
-            try:
-                client.chat_postMessage(channel=siteq, text=sMessage, link_names=True)
-                logging.info(f"Sent {siteq} this message:\n\n{sMessage}\n\n")
-            except Exception as e:
-                logging.error(f"Error sending message to {siteq} with {e}")
-
-    sMessage = build_kotter_report(df_mia, df_lowq, df_noq, default_siteq)
-    sMessage += "\n\nNote: If you have listed your site Qs on your aos table, this information will have gone out to them as well."
-    try:
-        if default_siteq not in siteq_df.get_column("site_q_user_id"):
-            client.chat_postMessage(channel=default_siteq, text=sMessage, link_names=True)
-            logging.info(f"Sent {default_siteq} this message:\n\n{sMessage}\n\n")
-    except SlackApiError as e:
-        if e.response.get("error") == "not_in_channel":
-            try:
-                logging.info("trying to join channel")
-                client.conversations_join(channel=default_siteq)
-                client.chat_postMessage(channel=default_siteq, text=sMessage, link_names=True)
-                logging.info(f"sent this message:\n\n{sMessage}\n\n")
-            except Exception as e:
-                logging.error("hit exception joining channel")
-        elif e.response.get("error") == "channel_not_found":
-            logging.error(f"The channel or user {default_siteq} doesn't exist for {schema}.")
-        else:
-            logging.error(f"hit the following exception for {schema}: {e}")
+    for recipient, message in kotter_messages(siteq_df, df_mia, df_lowq, df_noq, default_siteq):
+        # the default site Q is often a channel; join it if Weaselbot isn't a member yet
+        join = recipient == default_siteq
+        dispatcher.submit(SlackMessage(token, recipient, message, join=join, key=(schema, "report")))
 
 
-def slack_log(schema: str, engine: Engine, metadata: MetaData, client: WebClient) -> None:
+def slack_log(
+    schema: str,
+    engine: Engine,
+    metadata: MetaData,
+    dispatcher: SlackDispatcher,
+    token: str,
+    source: SchemaDiscovery | None = None,
+    paxminer_log_channel: str | None = None,
+) -> None:
     """
-    Sends a message to a Slack channel indicating that kotter reports have been successfully sent.
+    Queues a message to a Slack channel indicating that kotter reports have been successfully sent.
     Args:
         schema (str): The database schema to use.
         engine (Engine): The SQLAlchemy engine connected to the database.
         metadata (MetaData): The SQLAlchemy MetaData object.
-        client (WebClient): The Slack WebClient used to send messages.
-    Raises:
-        SlackApiError: If there is an error sending the message to Slack.
+        dispatcher (SlackDispatcher): The dispatcher the message is submitted to.
+        token (str): The region's Slack token.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
+        paxminer_log_channel (str | None): The region's paxminer_logs channel if already known, e.g. prefetched.
+            Otherwise it is looked up.
     """
 
-    ao = Table("aos", metadata, autoload_with=engine, schema=schema)
-    with engine.begin() as cnxn:
-        paxminer_log_channel = cnxn.execute(select(ao.c.channel_id).where(ao.c.ao == "paxminer_logs")).scalar()
-    try:
-        client.chat_postMessage(channel=paxminer_log_channel, text="Successfully sent kotter reports")
-        logging.info(f"Sent {paxminer_log_channel} this message:\n\nSuccessfully sent kotter reports\n\n")
-        logging.info("All done!")
-    except SlackApiError as e:
-        if e.response.get("error") == "not_in_channel":
+    if paxminer_log_channel is None:
+        ao = reflect_table("aos", metadata, engine, schema, source)
+        with engine.begin() as cnxn:
+            paxminer_log_channel = cnxn.execute(select(ao.c.channel_id).where(ao.c.ao == "paxminer_logs")).scalar()
+    dispatcher.submit(
+        SlackMessage(token, paxminer_log_channel, "Successfully sent kotter reports", key=(schema, "log"))
+    )
+
+
+def log_outcomes(outcomes: list[SlackOutcome]) -> None:
+    """Log what happened to each report and log message queued by `send_weaselbot_report` and `slack_log`."""
+    for outcome in outcomes:
+        (schema, kind), channel = outcome.message.key, outcome.message.channel
+        if outcome.ok:
+            logging.info(f"Sent {channel} this message:\n\n{outcome.message.text}\n\n")
+        elif kind == "log" and outcome.error == "not_in_channel":
             logging.error(
                 f"Weaselbot is not added to the paxminer_logs channel for {schema}. Their admin needs to do this."
             )
+        elif outcome.error == "channel_not_found":
+            logging.error(f"The channel or user {channel} doesn't exist for {schema}.")
         else:
-            logging.error(e)
-        logging.error("Finished with errors.")
+            logging.error(f"Error sending message to {channel} for {schema} with {outcome.error}")
 
 
 def main():
@@ -326,14 +585,20 @@ def main():
     1. Sets up logging configuration.
     2. Establishes a connection to the MySQL database.
     3. Retrieves the list of schemas to process.
-    4. Builds SQL queries for home regions and national data.
-    5. Reads data from the database and processes it to generate dataframes.
-    6. Iterates through each schema to generate specific reports.
-    7. Filters and processes data to identify men who haven't posted or Q'ed in a while.
-    8. Sends the generated reports to Slack using the Weaselbot.
+    4. Prefetches every region's settings, site Qs and log channel with one query per lookup, and prunes the
+       regions that neither get a report nor share pax with a region that does (`preflight_regions`).
+    5. Loads home regions and national attendance from the day's shared extract (`daily_extract`), built first if no
+       job has yet today. Attendance is only read as far back as the widest region's REMINDER_WEEKS or
+       HOME_AO_CAPTURE, with each man's lifetime posts and Qs summarised server-side.
+    6. Reads data from the database and processes it to generate dataframes.
+    7. Joins every region's thresholds and site Qs onto the national data and finds the men who haven't posted or
+       Q'ed in a while, in every region at once (`classify_kotter`).
+    8. Iterates through each schema to render its reports.
+    9. Queues the generated reports, then sends every region's at once through a `SlackDispatcher`.
+    10. Sends each region's log message once its reports are out.
     The function handles exceptions for schemas that are not set up for Kotter reports and logs errors accordingly.
     Note: This function assumes the existence of several helper functions such as `mysql_connection`,
-    `build_home_regions`, `nation_sql`, `slack_client`, `send_weaselbot_report`, and `slack_log`.
+    `daily_extract`, `send_weaselbot_report`, and `slack_log`.
     Raises:
         Exception: If there is an error in processing a schema, it logs the error and continues with the next schema.
     """
@@ -343,118 +608,122 @@ def main():
     )
     engine = mysql_connection()
     metadata = MetaData()
-    uri = engine.url.render_as_string(hide_password=False).replace("+mysqlconnector", "")
 
-    schemas = pl.read_database_uri("SELECT schema_name FROM paxminer.regions WHERE schema_name LIKE 'f3%'", uri=uri)
-    schemas = schemas.filter(~pl.col("schema_name").is_in(("f3devcommunity", "f3development", "f3csra")))
+    schemas = read_frame(
+        "SELECT schema_name FROM paxminer.regions WHERE schema_name LIKE 'f3%'", engine, label="paxminer.regions"
+    )
+    schemas = schemas.filter(~pl.col("schema_name").is_in(EXCLUDED_SCHEMAS))
+    source = discover_schemas(
+        engine,
+        metadata,
+        schemas.get_column("schema_name").to_list(),
+        required=("aos.site_q_user_id",),
+        failures=ReflectionFailures(),
+    )
+    source.log_missing()
 
-    home_regions_sql = str(
-        build_home_regions(schemas, metadata, engine).compile(engine, compile_kwargs={"literal_binds": True})
+    all_schemas = schemas.get_column("schema_name").to_list()
+    kotter_schemas = []
+    for schema in all_schemas:
+        if source.has(schema, "aos.site_q_user_id"):
+            kotter_schemas.append(schema)
+        else:
+            logging.error(f"{schema}: no site_q_user_id column on the aos table; not set up for Kotter reports.")
+    logging.info("Prefetching region settings and site Qs...")
+    contexts = prefetch_regions(
+        kotter_schemas,
+        engine,
+        settings=KOTTER_SETTINGS,
+        queries={
+            "siteq": siteq_queries(kotter_schemas, metadata, engine, source),
+            "log_channel": paxminer_log_queries(kotter_schemas, metadata, engine, source),
+        },
+    )
+
+    # pre-flight: only the reporting regions, and the regions their pax also post in, are extracted
+    emails, _ = extract_schemas(pax_email_queries(all_schemas, metadata, engine, source), engine, tag="schema")
+    kotter_schemas, extract, pruned = preflight_regions(all_schemas, contexts, emails)
+    del emails
+    for schema in sorted(contexts.keys() - set(kotter_schemas)):
+        logging.error(f"{schema}: not set up for Kotter reports.")
+    logging.info(
+        f"{len(kotter_schemas)} regions get Kotter reports and {len(extract) - len(kotter_schemas)} more share pax "
+        f"with them; pruned {len(pruned)} of {len(all_schemas)} regions from the extract"
     )
-    nation_query = str(nation_sql(schemas, engine, metadata).compile(engine, compile_kwargs={"literal_binds": True}))
-    logging.info("Building home regions dataframe...")
-    home_regions = pl.read_database_uri(home_regions_sql, uri=uri)
+    by_reason = {}
+    for schema, reason in pruned.items():
+        by_reason.setdefault(reason, []).append(schema)
+    for reason, regions in sorted(by_reason.items()):
+        logging.info(f"Pruned {len(regions)} regions with {reason}: {', '.join(regions)}")
+    if not kotter_schemas:
+        logging.error("No regions are set up for Kotter reports.")
+        engine.dispose()
+        return
+    schemas = schemas.filter(pl.col("schema_name").is_in(extract))
+
+    # only the reports' lookback window is read row by row; older history comes summarised per man. The day's
+    # extract is shared with the achievements job, and may cover more regions than these
     logging.info("Building national dataframe...")
-    nation_df = pl.read_database_uri(nation_query, uri=uri)
+    start = lookback_start(contexts[schema].settings for schema in kotter_schemas)
+    daily = daily_extract(engine, metadata, extract, source, start=start)
+    home_regions = resolve_home_regions(daily.counts.filter(pl.col("region").is_in(extract)), by_user=True)
+    nation_df = daily.attendance.filter(pl.col("schema").is_in(extract))
+    if start is not None:
+        nation_df = nation_df.filter(pl.col("date") >= start)
+    nation_df = nation_df.select("email", "ao_id", "ao", "date", "q_flag")
+    del daily
+    lifetimes, _ = extract_schemas(lifetime_queries(schemas, engine, metadata, source), engine, casts=LIFETIME_CASTS)
+    if not lifetimes.height:
+        logging.error("No region's lifetime summary could be read; not sending Kotter reports.")
+        engine.dispose()
+        return
+    lifetime = lifetime_summary(lifetimes)
 
-    home_regions = home_regions.group_by("email").agg(pl.all().sort_by("attendance").last())
     nation_df = nation_df.join(home_regions.drop("attendance"), on="email")
     del home_regions
 
-    for row in schemas.iter_rows():
-        schema = row[0]
+    # every region's thresholds and site Qs are joined on as columns, and every man classified in one pass
+    siteqs = pl.concat(
+        [
+            contexts[schema]
+            .tables["siteq"]
+            .select(pl.lit(schema).alias("region"), pl.col("home_ao", "ao", "site_q_user_id").cast(pl.String))
+            for schema in kotter_schemas
+        ]
+    )
+    cutoffs = kotter_cutoffs({schema: contexts[schema].settings for schema in kotter_schemas})
+    frames = classify_kotter(nation_df, siteqs, cutoffs, lifetime)
+    del nation_df
+    df_mia, df_lowq, df_noq = (frame.partition_by("region", as_dict=True, include_key=False) for frame in frames)
+    no_mia, no_lowq, no_noq = (frame.clear().drop("region") for frame in frames)
+
+    dispatcher = SlackDispatcher()
+    log_channels = {}
+    for schema in kotter_schemas:
         logging.info(f"running {schema}...")
-        try:
-            query = (
-                f"SELECT channel_id AS home_ao, ao, site_q_user_id FROM {schema}.aos WHERE site_q_user_id IS NOT NULL"
-            )
-            siteq_df = pl.read_database_uri(query=query, uri=uri)
-            query = f"SELECT default_siteq, slack_token, NO_POST_THRESHOLD, NO_Q_THRESHOLD_WEEKS, REMINDER_WEEKS, NO_Q_THRESHOLD_POSTS, HOME_AO_CAPTURE FROM weaselbot.regions WHERE paxminer_schema = '{schema}'"
-            (
-                default_siteq,
-                slack_token,
-                NO_POST_THRESHOLD,
-                NO_Q_THRESHOLD,
-                REMINDER_WEEKS,
-                NO_Q_THRESHOLD_POSTS,
-                HOME_AO_CAPTURE,
-            ) = pl.read_database_uri(query=query, uri=uri).row(0)
-        except Exception as e:
-            # if the site_q_user_id column isn't in their ao table, they're not set up for Kotter reports. We can stop here.
-            logging.error(f"{schema}: {e}")
-            continue
-        df = nation_df.filter(pl.col("region") == schema)
-
-        df = df.join(
-            df.filter(pl.col("date") > date.today() + timedelta(weeks=-HOME_AO_CAPTURE))
-            .group_by("email", "ao_id")
-            .agg(pl.col("ao").count())
-            .group_by("email")
-            .agg(pl.all().sort_by("ao").last())
-            .with_columns(pl.col("ao_id").alias("home_ao"))
-            .drop("ao", "ao_id"),
-            on="email",
-        )
-
-        # men that haven't posted in a while
-        df_mia = (
-            df.group_by("email", "user_id", "home_ao")
-            .agg(pl.col("date").max())
-            .filter(
-                pl.col("date").is_between(
-                    date.today() + timedelta(weeks=-REMINDER_WEEKS), date.today() + timedelta(weeks=-NO_POST_THRESHOLD)
-                )
-            )
-            .join(siteq_df, how="left", on="home_ao", coalesce=True)
-            .drop("email")
-            .sort("date", descending=True)
-            .with_columns(pl.col("date").dt.strftime("%B %d, %Y"))
-        )
-
-        # men that haven't q'ed in a while but have in the past
-        df_lowq = (
-            df.filter(pl.col("q_flag") == 1)
-            .group_by("email", "user_id", "home_ao")
-            .agg(pl.col("date").max())
-            .filter(
-                pl.col("date").is_between(
-                    date.today() + timedelta(weeks=-REMINDER_WEEKS),
-                    date.today() + timedelta(weeks=-NO_Q_THRESHOLD_POSTS),
-                )
-            )
-            .join(siteq_df, how="left", on="home_ao", coalesce=True)
-            .drop("email")
-            .sort("date", descending=True)
-        )
-        df_lowq = df_lowq.filter(~pl.col("user_id").is_in(df_mia.get_column("user_id").to_list()))
-
-        # men that have never been Q
-        # data filtered for the time period. May have been Q prior.
-        df_noq = (
-            df.join(
-                df.group_by("email", "user_id")
-                .agg(pl.col("q_flag").sum())
-                .filter(pl.col("q_flag") == 0)
-                .drop("q_flag"),
-                on="email",
-            )
-            .filter(
-                pl.col("date").is_between(
-                    date.today() + timedelta(weeks=-REMINDER_WEEKS), date.today() + timedelta(weeks=-NO_Q_THRESHOLD)
-                )
-            )
-            .select("email", "user_id", "home_ao")
-            .unique()
-            .join(siteq_df, how="left", on="home_ao", coalesce=True)
-            .drop("email")
+        context = contexts[schema]
+        default_siteq, slack_token = context.settings["default_siteq"], context.settings["slack_token"]
+        send_weaselbot_report(
+            schema,
+            dispatcher,
+            slack_token,
+            context.tables["siteq"],
+            df_mia.get((schema,), no_mia),
+            df_lowq.get((schema,), no_lowq),
+            df_noq.get((schema,), no_noq),
+            default_siteq,
         )
-        df_noq = df_noq.filter(~pl.col("user_id").is_in(df_mia.get_column("user_id").to_list()))
-        df_noq = df_noq.filter(~pl.col("user_id").is_in(df_lowq.get_column("user_id").to_list()))
+        log_channels[schema] = (slack_token, context.first("log_channel", "channel_id"))
 
-        client = slack_client(slack_token)
-        send_weaselbot_report(schema, client, siteq_df, df_mia, df_lowq, df_noq, default_siteq)
-        slack_log(schema, engine, metadata, client)
+    # every region's reports go out together, each workspace at its own rate limit, then the log messages
+    logging.info("Sending Kotter reports...")
+    log_outcomes(dispatcher.run())
+    for schema, (slack_token, log_channel) in log_channels.items():
+        slack_log(schema, engine, metadata, dispatcher, slack_token, source, log_channel)
+    log_outcomes(dispatcher.run())
+    logging.info("All done!")
 
+    log_query_stats(engine)
     engine.dispose()
 
 
@@ -0,0 +1,245 @@
+"""
+Durable outbox for achievement announcements, so an interrupted run resumes instead of re-announcing.
+
+Before a region's Slack messages are sent, every new award and the message announcing it are written to a local
+SQLite file under WEASELBOT_CACHE_DIR. Awards move from "pending" to "sent" as their message goes out and to
+"loaded" once they're in the region's achievements_awarded table, and a region is marked done when it's
+finished. A message without awards of its own, such as a later part of a digest, continues the message before
+it and is resent as long as that message's awards are outstanding. If the run dies part way, the next run first sends whatever is still pending and loads whatever was
+sent, then only processes the regions the interrupted run didn't finish. Awards that were already announced are
+never announced again, even if the next run recomputes them.
+
+Classes:
+    AwardOutbox:
+        The outbox: staging awards and messages, marking progress and listing unfinished work.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import date
+
+import polars as pl
+
+from .utils import CACHE_DIR
+
+AwardKey = tuple[int, str, int, int]  # achievement_id, pax_id, year, period
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    region TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    text TEXT NOT NULL,
+    blocks TEXT,
+    reaction TEXT,
+    sent INTEGER NOT NULL DEFAULT 0,
+    part_of INTEGER REFERENCES messages (id)
+);
+CREATE TABLE IF NOT EXISTS awards (
+    region TEXT NOT NULL,
+    achievement_id INTEGER NOT NULL,
+    pax_id TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    period INTEGER NOT NULL,
+    date_awarded TEXT NOT NULL,
+    message_id INTEGER REFERENCES messages (id),
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (region, achievement_id, pax_id, year, period)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    region TEXT PRIMARY KEY,
+    run_date TEXT NOT NULL
+);
+"""
+
+
+class AwardOutbox:
+    """
+    SQLite-backed outbox of one job's achievement announcements. Safe to use from several region threads: every
+    call opens its own connection.
+
+    :param path: the SQLite file. Defaults to WEASELBOT_CACHE_DIR/outbox.sqlite.
+    :type path: str | None
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join(os.getenv("WEASELBOT_CACHE_DIR", CACHE_DIR), "outbox.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with closing(self._connect()) as cnxn, cnxn:
+            columns = [row[1] for row in cnxn.execute("PRAGMA table_info(awards)")]
+            if columns and "year" not in columns:
+                # outboxes from before the award year was part of the key: week and month periods repeat yearly
+                cnxn.execute("ALTER TABLE awards RENAME TO awards_old")
+            cnxn.executescript(_SCHEMA)
+            if columns and "year" not in columns:
+                cnxn.execute(
+                    """
+                    INSERT INTO awards
+                    SELECT region, achievement_id, pax_id, CAST(strftime('%Y', date_awarded) AS INTEGER), period,
+                        date_awarded, message_id, status
+                    FROM awards_old
+                    """
+                )
+                cnxn.execute("DROP TABLE awards_old")
+            if "part_of" not in [row[1] for row in cnxn.execute("PRAGMA table_info(messages)")]:
+                cnxn.execute("ALTER TABLE messages ADD COLUMN part_of INTEGER REFERENCES messages (id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        cnxn = sqlite3.connect(self.path, timeout=30)
+        cnxn.execute("PRAGMA journal_mode=WAL")
+        return cnxn
+
+    def announced(self, region: str) -> set[AwardKey]:
+        """
+        The region's awards whose announcement went out but that aren't loaded yet. Loaded awards are in the
+        region's achievements_awarded table, so they're never found new again.
+        """
+        with closing(self._connect()) as cnxn:
+            rows = cnxn.execute(
+                "SELECT achievement_id, pax_id, year, period FROM awards WHERE region = ? AND status = 'sent'",
+                (region,),
+            ).fetchall()
+        return set(rows)
+
+    def stage(self, region: str, messages: list[tuple[dict, list[dict]]]) -> list[int]:
+        """
+        Record messages and the awards each announces before they're sent. An award still pending from an
+        earlier run is moved to its new message; one that was already announced is left alone. A message with no
+        awards is recorded as a later part of the message before it.
+
+        :param region: the region's schema
+        :type region: str
+        :param messages: per message, its channel, text, blocks and reaction, and its awards' achievement_id,
+            pax_id, period and date_awarded
+        :type messages: list[tuple[dict, list[dict]]]
+        :return: the id of each message, in order
+        :rtype: list[int]
+        """
+
+        ids = []
+        first = None  # the message later parts continue
+        with closing(self._connect()) as cnxn, cnxn:
+            for message, awards in messages:
+                cursor = cnxn.execute(
+                    "INSERT INTO messages (region, channel, text, blocks, reaction, part_of) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        region,
+                        message["channel"],
+                        message["text"],
+                        json.dumps(message["blocks"]) if message.get("blocks") else None,
+                        message.get("reaction"),
+                        None if awards else first,
+                    ),
+                )
+                ids.append(cursor.lastrowid)
+                if awards:
+                    first = cursor.lastrowid
+                cnxn.executemany(
+                    """
+                    INSERT INTO awards (region, achievement_id, pax_id, year, period, date_awarded, message_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (region, achievement_id, pax_id, year, period)
+                    DO UPDATE SET message_id = excluded.message_id WHERE status = 'pending'
+                    """,
+                    [
+                        (
+                            region,
+                            a["achievement_id"],
+                            a["pax_id"],
+                            a["date_awarded"].year,
+                            a["period"],
+                            str(a["date_awarded"]),
+                            cursor.lastrowid,
+                        )
+                        for a in awards
+                    ],
+                )
+        return ids
+
+    def mark_sent(self, message_ids: list[int]) -> None:
+        """Record that these messages went out, and so the awards they announce."""
+        with closing(self._connect()) as cnxn, cnxn:
+            cnxn.executemany("UPDATE messages SET sent = 1 WHERE id = ?", [(i,) for i in message_ids])
+            cnxn.executemany(
+                "UPDATE awards SET status = 'sent' WHERE message_id = ? AND status = 'pending'",
+                [(i,) for i in message_ids],
+            )
+
+    def mark_loaded(self, region: str) -> None:
+        """Record that all the region's awards are in its achievements_awarded table."""
+        with closing(self._connect()) as cnxn, cnxn:
+            cnxn.execute("UPDATE awards SET status = 'loaded' WHERE region = ?", (region,))
+
+    def unsent(self) -> pl.DataFrame:
+        """
+        Staged messages that haven't gone out, with region, id, channel, text, blocks (JSON) and reaction: those
+        with pending awards, and the later parts of a message whose awards haven't been forgotten.
+        """
+        with closing(self._connect()) as cnxn:
+            rows = cnxn.execute(
+                """
+                SELECT region, id, channel, text, blocks, reaction FROM messages
+                WHERE sent = 0 AND (
+                    id IN (SELECT message_id FROM awards WHERE status = 'pending')
+                    OR part_of IN (SELECT message_id FROM awards)
+                )
+                ORDER BY id
+                """
+            ).fetchall()
+        return pl.DataFrame(
+            rows,
+            schema={
+                "region": pl.String,
+                "id": pl.Int64,
+                "channel": pl.String,
+                "text": pl.String,
+                "blocks": pl.String,
+                "reaction": pl.String,
+            },
+            orient="row",
+        )
+
+    def unloaded(self) -> pl.DataFrame:
+        """Awards not yet in achievements_awarded, with region, achievement_id, pax_id, date_awarded and status."""
+        with closing(self._connect()) as cnxn:
+            rows = cnxn.execute(
+                "SELECT region, achievement_id, pax_id, date_awarded, status FROM awards WHERE status != 'loaded'"
+            ).fetchall()
+        return pl.DataFrame(
+            rows,
+            schema={
+                "region": pl.String,
+                "achievement_id": pl.Int64,
+                "pax_id": pl.String,
+                "date_awarded": pl.String,
+                "status": pl.String,
+            },
+            orient="row",
+        ).with_columns(pl.col("date_awarded").str.to_date())
+
+    def finish_region(self, region: str, run_date: date | None = None) -> None:
+        """Record that the region is done for the run."""
+        with closing(self._connect()) as cnxn, cnxn:
+            cnxn.execute(
+                "INSERT OR REPLACE INTO runs (region, run_date) VALUES (?, ?)",
+                (region, (run_date or date.today()).isoformat()),
+            )
+
+    def finished_regions(self, run_date: date | None = None) -> set[str]:
+        """Regions an unfinished run already completed on `run_date` (default today), which can be skipped."""
+        with closing(self._connect()) as cnxn:
+            rows = cnxn.execute(
+                "SELECT region FROM runs WHERE run_date = ?", ((run_date or date.today()).isoformat(),)
+            ).fetchall()
+        return {region for (region,) in rows}
+
+    def complete_run(self) -> None:
+        """The whole run finished: forget the region markers and everything that's been loaded."""
+        with closing(self._connect()) as cnxn, cnxn:
+            cnxn.execute("DELETE FROM runs")
+            cnxn.execute("DELETE FROM awards WHERE status = 'loaded'")
+            cnxn.execute(
+                "DELETE FROM messages WHERE id NOT IN (SELECT message_id FROM awards WHERE message_id IS NOT NULL)"
+            )
@@ -1,166 +1,127 @@
+import json
 import logging
+import time
 from datetime import date
-from typing import Tuple
+from typing import Tuple, TypeVar
 
 import polars as pl
-from sqlalchemy import MetaData, Selectable, Subquery, Table, text
+from sqlalchemy import MetaData, Selectable, Table
 from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import NoSuchTableError, SQLAlchemyError
-from sqlalchemy.sql import and_, case, func, literal_column, or_, select, union_all
-
-from .utils import mysql_connection, send_to_slack
-
-
-def home_region_sub_query(u: Table, a: Table, b: Table, ao: Table, date_range: int) -> Subquery[Tuple[str, int]]:
-    """
-    Abstract the subquery needed for length of time to look back for considering the home region. This is
-    needed because there are many scenarios where a man could lapse in attending F3. Many different checks
-    should be considered before defaulting to the maximium date range
+from sqlalchemy.sql import func, null, select
+
+from .achievement_rules import (
+    DEFAULT_RULES,
+    RULE_COLUMNS,
+    aggregate_rules,
+    evaluate_rules,
+    load_rules,
+    partition_aggregates,
+    region_rules,
+)
+from .activity import BEATDOWN, QSOURCE, activity_expr
+from .daily_extract import EXCLUDED_SCHEMAS, daily_extract
+from .home_regions import resolve_home_regions
+from .outbox import AwardOutbox
+from .region_context import paxminer_log_queries, prefetch_regions, region_settings
+from .region_executor import run_regions
+from .slack_dispatch import SlackDispatcher, SlackMessage
+from .utils import (
+    ReflectionFailures,
+    SchemaDiscovery,
+    discover_schemas,
+    extract_schemas,
+    log_query_stats,
+    mysql_connection,
+    read_frame,
+    reflect_table,
+    send_to_slack,
+)
+
+Frame = TypeVar("Frame", pl.DataFrame, pl.LazyFrame)
+
+LOAD_BATCH_ROWS = 1000  # awards per INSERT statement
+
+
+def users_queries(
+    schemas: list[str], metadata: MetaData, engine: Engine, source: SchemaDiscovery | None = None
+) -> dict[str, Selectable[Tuple[str, str]]]:
     """
-    return (
-        select(u.c.email, func.count(a.c.user_id).label("attendance"))
-        .select_from(
-            u.join(a, a.c.user_id == u.c.user_id)
-            .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
-            .join(ao, b.c.ao_id == ao.c.channel_id)
-        )
-        .where(func.datediff(func.curdate(), b.c.bd_date) < date_range)
-        .group_by(u.c.email)
-        .subquery()
-    )
-
-
-def build_home_regions(schemas: pl.DataFrame, metadata: MetaData, engine: Engine) -> Selectable[Tuple[str, str, str]]:
-    """
-    Constructs a SQL query to build home region attendance data for multiple schemas.
-    This function filters out specific schemas and iterates over the remaining schemas to build
-    SQL queries that calculate user attendance data for different date ranges (30, 60, 90, 120 days).
-    The results are then combined into a single query using `union_all`.
+    Build each region's email to Slack user id query, so every region's users can be read as one national table
+    with `extract_schemas(..., tag="region")`.
     Args:
-        schemas (pl.DataFrame): A DataFrame containing schema names.
-        metadata (MetaData): SQLAlchemy MetaData object for reflecting tables.
+        schemas (list[str]): The regions to query.
+        metadata (MetaData): SQLAlchemy MetaData object for schema reflection.
         engine (Engine): SQLAlchemy Engine object for database connection.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
     Returns:
-        Selectable[Tuple[str, str, str]]: A SQLAlchemy selectable object representing the combined query.
+        dict[str, Selectable[Tuple[str, str]]]: One query per schema selecting email and slack_user_id.
     """
 
-    queries = []
-    schemas = schemas.filter(~pl.col("schema_name").is_in(["f3devcommunity", "f3development", "f3csra", "f3texarcana"]))
-    for row in schemas.iter_rows():
-        schema = row[0]
+    queries = {}
+    for schema in schemas:
         try:
-            u = Table("users", metadata, autoload_with=engine, schema=schema)
-            a = Table("bd_attendance", metadata, autoload_with=engine, schema=schema)
-            b = Table("beatdowns", metadata, autoload_with=engine, schema=schema)
-            ao = Table("aos", metadata, autoload_with=engine, schema=schema)
-
-            s1, s2, s3, s4 = (home_region_sub_query(u, a, b, ao, date_range) for date_range in (30, 60, 90, 120))
-
-            sql = (
-                select(
-                    literal_column(f"'{schema}'").label("region"),
-                    u.c.email,
-                    case(
-                        (s1.c.attendance.is_not(None), s1.c.attendance),
-                        (s2.c.attendance.is_not(None), s2.c.attendance),
-                        (s3.c.attendance.is_not(None), s3.c.attendance),
-                        (s4.c.attendance.is_not(None), s4.c.attendance),
-                        else_=func.count(a.c.user_id),
-                    ).label("attendance"),
-                )
-                .select_from(
-                    u.join(a, a.c.user_id == u.c.user_id)
-                    .join(b, and_(a.c.q_user_id == b.c.q_user_id, a.c.ao_id == b.c.ao_id, a.c.date == b.c.bd_date))
-                    .join(ao, b.c.ao_id == ao.c.channel_id)
-                    .outerjoin(s1, u.c.email == s1.c.email)
-                    .outerjoin(s2, u.c.email == s2.c.email)
-                    .outerjoin(s3, u.c.email == s3.c.email)
-                    .outerjoin(s4, u.c.email == s4.c.email)
-                )
-                .where(func.year(b.c.bd_date) == func.year(func.curdate()))
-                .group_by(literal_column(f"'{schema}'").label("region"), u.c.email)
-            )
-            queries.append(sql)
+            u = reflect_table("users", metadata, engine, schema, source)
+            queries[schema] = select(u.c.email, u.c.user_id.label("slack_user_id"))
         except SQLAlchemyError as e:
             logging.error(f"Schema {schema} error: {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error in schema {schema}: {str(e)}")
+    return queries
 
-    return union_all(*queries)
 
-
-def nation_sql(
-    schemas: pl.DataFrame, engine: Engine, metadata: MetaData
-) -> Selectable[Tuple[str, str, str, str, str, str, int, str]]:
+def achievement_queries(
+    schemas: list[str], metadata: MetaData, engine: Engine, source: SchemaDiscovery | None = None
+) -> dict[str, dict[str, Selectable]]:
     """
-    Generates a SQL query to retrieve user attendance and beatdown information from multiple schemas.
+    Build each region's achievements lookups for `region_context.prefetch_regions`. Regions without an
+    achievements_list table aren't signed up and are left out.
     Args:
-        schemas (pl.DataFrame): A DataFrame containing schema names to be queried.
-        engine (Engine): SQLAlchemy Engine object for database connection.
+        schemas (list[str]): The regions to query.
         metadata (MetaData): SQLAlchemy MetaData object for schema reflection.
+        engine (Engine): SQLAlchemy Engine object for database connection.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
     Returns:
-        Selectable[Tuple[str, str, str, str, str, str, int, str]]: A union of SQL queries for each schema,
-        selecting user email, user name, AO ID, AO name, beatdown date, Q flag, and backblast status.
-    The function filters out specific schemas and iterates over the remaining schemas to construct
-    SQL queries. It joins the 'users', 'bd_attendance', 'beatdowns', and 'aos' tables to gather
-    relevant information. The queries are combined using a union_all operation.
-    Raises:
-        SQLAlchemyError: If there is an error with SQLAlchemy operations.
-        Exception: For any other unexpected errors.
+        dict[str, dict[str, Selectable]]: "awards", each region's achievements_list (with NULL for any rule columns
+        it lacks, so the regions union cleanly), and "awarded", the achievements already awarded this year.
     """
-    queries = []
-    schemas = schemas.filter(~pl.col("schema_name").is_in(["f3devcommunity", "f3development", "f3csra", "f3texarcana"]))
-    for row in schemas.iter_rows():
-        schema = row[0]
+
+    awards, awarded = {}, {}
+    for schema in schemas:
         try:
-            u = Table("users", metadata, autoload_with=engine, schema=schema)
-            a = Table("bd_attendance", metadata, autoload_with=engine, schema=schema)
-            b = Table("beatdowns", metadata, autoload_with=engine, schema=schema)
-            ao = Table("aos", metadata, autoload_with=engine, schema=schema)
-
-            sql = (
-                select(
-                    u.c.email,
-                    u.c.user_name,
-                    a.c.ao_id,
-                    ao.c.ao.label("ao"),
-                    b.c.bd_date.label("date"),
-                    case((or_(a.c.user_id == b.c.q_user_id, a.c.user_id == b.c.coq_user_id), 1), else_=0).label(
-                        "q_flag"
-                    ),
-                    b.c.backblast,
-                )
-                .select_from(
-                    u.join(a, a.c.user_id == u.c.user_id)
-                    .join(
-                        b,
-                        and_(
-                            or_(a.c.q_user_id == b.c.q_user_id, a.c.q_user_id == b.c.coq_user_id),
-                            a.c.ao_id == b.c.ao_id,
-                            a.c.date == b.c.bd_date,
-                        ),
-                    )
-                    .join(ao, b.c.ao_id == ao.c.channel_id)
-                )
-                .where(
-                    func.year(b.c.bd_date) == func.year(func.curdate()),
-                    b.c.bd_date <= date.today(),
-                    u.c.email != "none",
-                    u.c.user_name != "PAXminer",
-                    b.c.q_user_id.is_not(None),
-                )
-            )
-            queries.append(sql)
-        except SQLAlchemyError as e:
-            logging.error(f"Schema {schema} error: {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error in schema {schema}: {str(e)}")
+            al = reflect_table("achievements_list", metadata, engine, schema, source)
+            try:
+                aa = reflect_table("achievements_awarded", metadata, engine, schema, source)
+            except NoSuchTableError:
+                aa = reflect_table("achievement_awarded", metadata, engine, schema, source)
+        except SQLAlchemyError:
+            continue
+        awards[schema] = select(
+            al.c.id,
+            al.c.name,
+            al.c.verb,
+            al.c.code,
+            *(al.c[c] if c in al.c else null().label(c) for c in RULE_COLUMNS),
+        )
+        awarded[schema] = (
+            select(aa.c.id, aa.c.achievement_id, aa.c.pax_id, aa.c.date_awarded, al.c.code)
+            .select_from(aa.join(al, aa.c.achievement_id == al.c.id))
+            .where(func.year(aa.c.date_awarded) == func.year(func.curdate()))
+        )
+    return {"awards": awards, "awarded": awarded}
+
+
+def _with_period(df: Frame, period: str) -> Frame:
+    """
+    Add the `year`, `month` or `week` of each beatdown, unless the column was already computed upstream (as
+    `build_achievements` does once for every achievement).
+    """
 
-    return union_all(*queries)
+    if period in df.collect_schema().names():
+        return df
+    return df.with_columns(getattr(pl.col("date").dt, period)().alias(period))
 
 
-def the_priest(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def the_priest(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Filters and processes a DataFrame to identify users who have completed at least 25 Qsource lessons.
 
@@ -175,18 +136,18 @@ def the_priest(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.D
 
     grouping = ["year", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.year().alias("year"))
+        _with_period(df, "year")
         .filter((bb_filter) | (ao_filter))
         .group_by(pl.col(grouping))
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 25)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 25)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def the_monk(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def the_monk(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Filters and processes a DataFrame to identify and award achievements based on specific criteria.
     Args:
@@ -203,18 +164,18 @@ def the_monk(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.Dat
 
     grouping = ["month", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.month().alias("month"))
+        _with_period(df, "month")
         .filter((bb_filter) | (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 4)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 4)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def leader_of_men(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def leader_of_men(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Filters and processes a DataFrame to identify leaders based on specific criteria.
     Args:
@@ -231,18 +192,18 @@ def leader_of_men(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> p
 
     grouping = ["month", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.month().alias("month"))
+        _with_period(df, "month")
         .filter((pl.col("q_flag") == 1) & (bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 4)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 4)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def the_boss(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def the_boss(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Processes the given DataFrame to filter and aggregate data based on specific criteria.
     Args:
@@ -259,18 +220,18 @@ def the_boss(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.Dat
 
     grouping = ["month", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.month().alias("month"))
+        _with_period(df, "month")
         .filter((pl.col("q_flag") == 1) & (bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 6)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 6)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def hammer_not_nail(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def hammer_not_nail(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Filters and processes a DataFrame to identify and award achievements based on specific criteria.
     Args:
@@ -287,18 +248,18 @@ def hammer_not_nail(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) ->
 
     grouping = ["week", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.week().alias("week"))
+        _with_period(df, "week")
         .filter((pl.col("q_flag") == 1) & (bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 6)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 6)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def cadre(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def cadre(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Processes the given DataFrame to filter and group data based on specific criteria,
     and returns a DataFrame with the date awarded for each group.
@@ -312,18 +273,18 @@ def cadre(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFr
 
     grouping = ["month", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.month().alias("month"))
+        _with_period(df, "month")
         .filter((pl.col("q_flag") == 1) & (bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").n_unique(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 7)
+        .agg(pl.col("ao_id").n_unique().alias("aos"), pl.col("date").max())
+        .filter(pl.col("aos") >= 7)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["aos", "date"])
     )
     return x
 
 
-def el_presidente(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def el_presidente(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Filters and processes a DataFrame to identify users who meet specific criteria
     and awards them based on their activity.
@@ -338,18 +299,18 @@ def el_presidente(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> p
 
     grouping = ["year", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.year().alias("year"))
+        _with_period(df, "year")
         .filter((pl.col("q_flag") == 1) & (bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 20)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 20)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def posts(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def posts(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Processes the given DataFrame by applying filters, grouping, and aggregating data.
     Args:
@@ -357,20 +318,21 @@ def posts(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFr
         bb_filter (pl.Expr): The filter expression to be applied to the DataFrame.
         ao_filter (pl.Expr): Another filter expression to be applied to the DataFrame.
     Returns:
-        pl.DataFrame: A DataFrame with the aggregated results, grouped by year, email, and region.
+        pl.DataFrame: A DataFrame with the aggregated results, grouped by year, email, and region, with the
+            number of posts and the date of the latest one.
     """
 
     grouping = ["year", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.year().alias("year"))
+        _with_period(df, "year")
         .filter((bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
     )
     return x
 
 
-def six_pack(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def six_pack(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Filters and processes a DataFrame to identify users who have achieved a "six pack"
     within a given week, based on specific filters.
@@ -385,18 +347,18 @@ def six_pack(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.Dat
 
     grouping = ["week", "email", "region"]
     x = (
-        df.with_columns(pl.col("date").dt.week().alias("week"))
+        _with_period(df, "week")
         .filter((bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao_id").count(), pl.col("date").max())
-        .filter(pl.col("ao_id") >= 6)
+        .agg(pl.col("ao_id").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 6)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao_id", "date"])
+        .drop(["posts", "date"])
     )
     return x
 
 
-def hdtf(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFrame:
+def hdtf(df: Frame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> Frame:
     """
     Processes the given DataFrame to filter, group, and aggregate data based on specified criteria.
     Args:
@@ -413,58 +375,193 @@ def hdtf(df: pl.DataFrame, bb_filter: pl.Expr, ao_filter: pl.Expr) -> pl.DataFra
 
     grouping = ["year", "email", "region", "ao_id"]
     x = (
-        df.with_columns(pl.col("date").dt.year().alias("year"))
+        _with_period(df, "year")
         .filter((bb_filter) & (ao_filter))
         .group_by(grouping)
-        .agg(pl.col("ao").count(), pl.col("date").max())
-        .filter(pl.col("ao") >= 50)
+        .agg(pl.col("ao").count().alias("posts"), pl.col("date").max())
+        .filter(pl.col("posts") >= 50)
         .with_columns(pl.col("date").alias("date_awarded"))
-        .drop(["ao", "date", "ao_id"])
+        .drop(["posts", "date", "ao_id"])
     )
     return x
 
 
-def load_to_database(schema: str, engine: Engine, metadata: MetaData, data_to_load: pl.DataFrame) -> None:
+def build_achievements(nation_df: pl.DataFrame, fused: bool = True) -> list[pl.DataFrame]:
+    """
+    Compute every built-in national achievement DataFrame, in the order of the default `achievements_list` ids.
+
+    Args:
+        nation_df (pl.DataFrame): National beatdown data joined to home regions.
+        fused (bool): Evaluate `DEFAULT_RULES` with the rule engine, which answers all 14 achievements with a
+            handful of grouped aggregations that `pl.collect_all` runs together. With False, each hand-coded
+            achievement function is computed eagerly against `nation_df` in turn.
+    Returns:
+        list[pl.DataFrame]: The Priest, The Monk, Leader of Men, The Boss, Hammer not Nail, Cadre, El Presidente,
+            the 25/50/100/150/200 post milestones, Six Pack and HDTF.
+    """
+
+    if fused:
+        return list(evaluate_rules(nation_df, {rule.code: rule for rule in DEFAULT_RULES}).values())
+
+    activity = pl.col("activity") if "activity" in nation_df.columns else activity_expr()
+
+    # for QSource, we want to capture only QSource
+    qsource = (activity == QSOURCE, pl.lit(False))
+    dfs = [the_priest(nation_df, *qsource), the_monk(nation_df, *qsource)]
+
+    # for beatdowns, we want to exclude QSource and Ruck
+    beatdown = (activity == BEATDOWN, pl.lit(True))
+    dfs += [f(nation_df, *beatdown) for f in (leader_of_men, the_boss, hammer_not_nail, cadre, el_presidente)]
+    s = posts(nation_df, *beatdown)
+    for val in [25, 50, 100, 150, 200]:
+        dfs.append(
+            s.filter(pl.col("posts") >= val).with_columns(pl.col("date").alias("date_awarded")).drop(["posts", "date"])
+        )
+    dfs += [six_pack(nation_df, *beatdown), hdtf(nation_df, *beatdown)]
+    return dfs
+
+
+def _awarded_table(schema: str, engine: Engine, metadata: MetaData, source: SchemaDiscovery | None = None) -> Table:
+    """The region's awarded table, which is named achievements_awarded or achievement_awarded."""
+    try:
+        return reflect_table("achievements_awarded", metadata, engine, schema, source)
+    except NoSuchTableError:
+        return reflect_table("achievement_awarded", metadata, engine, schema, source)
+
+
+def load_to_database(
+    schema: str,
+    engine: Engine,
+    metadata: MetaData,
+    data_to_load: pl.DataFrame,
+    batch_size: int = LOAD_BATCH_ROWS,
+    source: SchemaDiscovery | None = None,
+) -> int:
     """
     Load data into the database.
     This function attempts to load data into a table named "achievements_awarded" within the specified schema.
-    If the table does not exist, it falls back to a table named "achievement_awarded". The data is loaded
-    using SQLAlchemy's insert functionality.
+    If the table does not exist, it falls back to a table named "achievement_awarded". Awards the table already
+    holds are dropped first, so loading the same awards twice is harmless even in regions whose table predates the
+    unique key on (achievement_id, pax_id, date_awarded). The rest are streamed in batches of `batch_size` as
+    tuples straight from the frame's columns, each batch one executemany of a positional INSERT IGNORE (which the
+    MySQL drivers send as a multi-row VALUES).
     Args:
         schema (str): The schema in which the table resides.
         engine (Engine): The SQLAlchemy engine connected to the database.
         metadata (MetaData): The SQLAlchemy MetaData object.
         data_to_load (pl.DataFrame): The data to be loaded into the database, provided as a Polars DataFrame.
+        batch_size (int): Rows per statement.
+        source (SchemaDiscovery | None): Tables discovered in bulk by `discover_schemas`, used instead of reflection.
+    Returns:
+        int: The rows inserted, not counting those already in the table.
     Raises:
         NoSuchTableError: If neither "achievements_awarded" nor "achievement_awarded" tables are found.
     """
 
-    try:
-        aa = Table("achievements_awarded", metadata, autoload_with=engine, schema=schema)
-    except NoSuchTableError:
-        aa = Table("achievement_awarded", metadata, autoload_with=engine, schema=schema)
+    aa = _awarded_table(schema, engine, metadata, source)
+    columns = ["achievement_id", "pax_id", "date_awarded"]
+    data_to_load = data_to_load.select(columns).unique(maintain_order=True)
+    if data_to_load.is_empty():
+        return 0
+    existing = read_frame(
+        select(*(aa.c[column] for column in columns)).where(
+            aa.c.date_awarded.between(data_to_load["date_awarded"].min(), data_to_load["date_awarded"].max())
+        ),
+        engine,
+        label=schema,
+    )
+    if existing.height:
+        data_to_load = data_to_load.join(
+            existing.cast({"achievement_id": pl.Int64, "pax_id": pl.String, "date_awarded": pl.Date}),
+            on=columns,
+            how="anti",
+        )
 
-    load_records = data_to_load.to_dicts()
-    sql = insert(aa).values(load_records)
+    sql = insert(aa).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+    dialect = engine.dialect
+    if not dialect.positional:
+        # mysqlconnector and pymysql default to pyformat, which needs a dict per row; both also take %s and tuples
+        dialect = type(dialect)(paramstyle="format")
+    compiled = sql.compile(dialect=dialect, column_keys=columns)
+
+    start = time.perf_counter()
+    inserted = 0
     with engine.begin() as cnxn:
-        cnxn.execute(sql)
+        for batch in data_to_load.iter_slices(batch_size):
+            result = cnxn.exec_driver_sql(str(compiled), batch.select(compiled.positiontup).rows())
+            inserted += max(result.rowcount, 0)
+    seconds = time.perf_counter() - start
+    logging.info(
+        f"Loaded {inserted} of {data_to_load.height} new awards into {schema}.{aa.name} in {seconds:.2f}s "
+        f"({data_to_load.height / seconds if seconds else 0:.0f} rows/s)"
+    )
+    return inserted
+
+
+def resume_outbox(outbox: AwardOutbox, engine: Engine) -> None:
+    """
+    Finish what an interrupted run left in the outbox: send its staged messages that never went out, then load
+    its awards that never reached the database. `load_to_database` skips awards already in a region's awarded
+    table, so resuming twice is harmless.
+
+    Args:
+        outbox (AwardOutbox): The job's outbox.
+        engine (Engine): The SQLAlchemy engine connected to the database.
+    """
+
+    unsent, unloaded = outbox.unsent(), outbox.unloaded()
+    regions = sorted(set(unsent.get_column("region").to_list()) | set(unloaded.get_column("region").to_list()))
+    if not regions:
+        return
+    logging.info(f"Resuming {unsent.height} messages and {unloaded.height} awards for {len(regions)} regions...")
+
+    tokens = region_settings(engine, regions, ["slack_token"])
+    dispatcher = SlackDispatcher()
+    for row in unsent.iter_rows(named=True):
+        token = tokens.get(row["region"], {}).get("slack_token")
+        if token is None:
+            logging.error(f"{row['region']} has no Slack token; can't resend its achievement message.")
+            continue
+        blocks = tuple(json.loads(row["blocks"])) if row["blocks"] else None
+        dispatcher.submit(
+            SlackMessage(token, row["channel"], row["text"], reaction=row["reaction"], key=row["id"], blocks=blocks)
+        )
+    outbox.mark_sent([outcome.message.key for outcome in dispatcher.run() if outcome.ok])
+
+    if unloaded.is_empty():
+        return
+    metadata = MetaData()
+    source = discover_schemas(
+        engine,
+        metadata,
+        unloaded.get_column("region").unique().sort().to_list(),
+        tables=("achievements_awarded", "achievement_awarded"),
+    )
+    for (schema,), rows in unloaded.partition_by("region", as_dict=True).items():
+        try:
+            loaded = load_to_database(schema, engine, metadata, rows, source=source)
+            outbox.mark_loaded(schema)
+            logging.info(f"Resumed {schema}: loaded {loaded} awards.")
+        except SQLAlchemyError as e:
+            logging.error(f"Couldn't resume {schema}'s awards: {e}")
 
 
 def main():
     """
     Main function to process and send achievement data to Slack channels for various regions.
     This function performs the following steps:
-    1. Establishes a connection to the MySQL database.
+    1. Establishes a connection to the MySQL database and resumes anything an interrupted run left in the outbox.
     2. Retrieves schema names from the "regions" table.
-    3. Builds SQL queries to fetch home regions and national beatdown data.
-    4. Filters and processes the data to create various achievement dataframes.
-    5. Iterates through each schema to:
-        a. Retrieve AO table and Slack channel information.
-        b. Fetch achievements awarded and achievements list data.
-        c. Filter and join dataframes for the specific region.
-        d. Send the processed data to Slack and load it into the database.
-    6. Logs the progress and errors encountered during the process.
-    7. Disposes of the database engine connection.
+    3. Loads the day's national beatdown data and home regions (see `daily_extract`), shared with the Kotter report.
+    4. Aggregates the national data once for every achievement rule group.
+    5. Prefetches every region's settings, log channel and achievements tables with one query per lookup.
+    6. Processes the regions concurrently (see `run_regions`), each one:
+        a. Look up its Slack settings, log channel and whether it wants a daily digest.
+        b. Look up its achievements awarded and achievements list.
+        c. Evaluate the region's achievement rules, matched by code, against the national aggregates.
+        d. Stage the new awards in the outbox, send them to Slack and load them into the database.
+    7. Logs the progress and errors encountered during the process, each region's as one block in order.
+    8. Disposes of the database engine connection.
     Raises:
         NoSuchTableError: If a required table is not found in the schema.
     """
@@ -472,119 +569,126 @@ def main():
     year = date.today().year
     engine = mysql_connection()
     metadata = MetaData()
-    uri = engine.url.render_as_string(hide_password=False).replace("+mysqlconnector", "")
-    t = Table("regions", metadata, autoload_with=engine, schema="paxminer")
-    sql = str(
-        select(t.c.schema_name)
-        .where(t.c.schema_name.like("f3%"))
-        .compile(engine, compile_kwargs={"literal_binds": True})
+    outbox = AwardOutbox()
+    resume_outbox(outbox, engine)
+    # regions an interrupted run already finished today aren't processed again
+    finished = outbox.finished_regions()
+    t = reflect_table(
+        "regions", metadata, engine, "paxminer", discover_schemas(engine, metadata, ["paxminer"], tables=("regions",))
     )
-    schemas = pl.read_database_uri(query=sql, uri=uri)
-
-    home_regions_sql = str(
-        build_home_regions(schemas, metadata, engine).compile(engine, compile_kwargs={"literal_binds": True})
+    schemas = read_frame(select(t.c.schema_name).where(t.c.schema_name.like("f3%")), engine, label="paxminer.regions")
+    source = discover_schemas(
+        engine,
+        metadata,
+        schemas.get_column("schema_name").to_list(),
+        required=("aos", "achievements_list"),
+        failures=ReflectionFailures(),
     )
-    nation_query = str(nation_sql(schemas, engine, metadata).compile(engine, compile_kwargs={"literal_binds": True}))
-
-    logging.info("Building home regions...")
-    home_regions = pl.read_database_uri(query=home_regions_sql, uri=uri)
+    source.log_missing()
+    region_schemas = [
+        schema
+        for schema in schemas.get_column("schema_name").to_list()
+        if schema not in ("f3devcommunity", "f3development", "f3csra", "f3texarcana", "f3yellowhammer")
+        and schema not in finished
+    ]
+    if finished:
+        logging.info(f"Skipping {len(finished)} regions finished by an earlier run today.")
+    if not region_schemas:
+        outbox.complete_run()
+        engine.dispose()
+        return
+
+    # the day's national extract is shared with the Kotter report, whichever job runs first building it
     logging.info("Building national beatdown data...")
-    nation_df = pl.read_database_uri(query=nation_query, uri=uri).with_columns(
-        pl.col("backblast").cast(pl.String()), pl.col("ao").cast(pl.String())
+    extract = daily_extract(
+        engine,
+        metadata,
+        [schema for schema in schemas.get_column("schema_name").to_list() if schema not in EXCLUDED_SCHEMAS],
+        source,
+        start=date(year, 1, 1),
     )
+    home_regions = resolve_home_regions(extract.counts.filter(pl.col("region") != "f3texarcana"))
+    nation_df = extract.attendance.filter(pl.col("schema") != "f3texarcana", pl.col("date") >= date(year, 1, 1)).select(
+        "email", "user_name", "ao_id", "ao", "date", "q_flag", "activity"
+    )
+    del extract
 
-    home_regions = home_regions.group_by("email").agg(pl.all().sort_by("attendance").last())
     nation_df = nation_df.join(home_regions.drop("attendance"), on="email")
     del home_regions
 
-    # for QSource, we want to capture only QSource
-    bb_filter = (
-        pl.col("backblast").str.slice(0, 100).str.to_lowercase().str.contains(r"q.{0,1}source|q{0,1}[1-9]\.[0-9]\s")
-    )
-    ao_filter = pl.col("ao").str.to_lowercase().str.contains(r"q.{0,1}source")
     logging.info("Building national achievements dataframes...")
-
-    dfs = []
-    ############# Q Source ##############
-    dfs.append(the_priest(nation_df, bb_filter, ao_filter))
-    dfs.append(the_monk(nation_df, bb_filter, ao_filter))
-    ############### END #################
-
-    # For beatdowns, we want to exclude QSource and Ruck (blackops too? What is blackops?)
-    bb_filter = ~pl.col("backblast").str.slice(0, 100).str.to_lowercase().str.contains(
-        r"q.{0,1}source|q{0,1}[1-9]\.[0-9]\s"
+    # one national users table, joined to the national results once, then everything is split by region once
+    users, users_report = extract_schemas(users_queries(region_schemas, metadata, engine, source), engine, tag="region")
+    if "email" not in users.columns:
+        # with no Slack ids nothing can be announced; the regions are left unfinished for the next run
+        failed = users_report.filter(pl.col("error").is_not_null()).height
+        logging.error(f"No users read from any region ({failed} failed); no achievements are announced this run.")
+        log_query_stats(engine)
+        engine.dispose()
+        return
+    rules = load_rules()
+    regional = partition_aggregates(aggregate_rules(nation_df, rules.values(), users=users), region_schemas)
+    regions = nation_df.partition_by("region", as_dict=True)
+    region_users = users.partition_by("region", as_dict=True) if users.height else {}
+    no_posts = nation_df.clear()
+    del nation_df
+
+    logging.info("Prefetching region settings and achievements tables...")
+    contexts = prefetch_regions(
+        region_schemas,
+        engine,
+        settings=("slack_token", "achievement_channel"),
+        optional_settings=("achievement_digest",),
+        queries={
+            "log_channel": paxminer_log_queries(region_schemas, metadata, engine, source),
+            **achievement_queries(region_schemas, metadata, engine, source),
+        },
     )
-    ao_filter = ~pl.col("ao").str.to_lowercase().str.contains(r"q.{0,1}source|ruck")
-
-    ############ ALL ELSE ###############
-    dfs.append(leader_of_men(nation_df, bb_filter, ao_filter))
-    dfs.append(the_boss(nation_df, bb_filter, ao_filter))
-    dfs.append(hammer_not_nail(nation_df, bb_filter, ao_filter))
-    dfs.append(cadre(nation_df, bb_filter, ao_filter))
-    dfs.append(el_presidente(nation_df, bb_filter, ao_filter))
 
-    s = posts(nation_df, bb_filter, ao_filter)
-    for val in [25, 50, 100, 150, 200]:
-        dfs.append(
-            s.filter(pl.col("ao_id") >= val).with_columns(pl.col("date").alias("date_awarded")).drop(["ao_id", "date"])
-        )
-
-    dfs.append(six_pack(nation_df, bb_filter, ao_filter))
-    dfs.append(hdtf(nation_df, bb_filter, ao_filter))
-
-    logging.info("Parsing region info and sending to Slack...")
-    for row in schemas.iter_rows():
-        schema = row[0]
-        if schema in ("f3devcommunity", "f3development", "f3csra", "f3texarcana", "f3yellowhammer"):
-            continue
-        try:
-            ao = Table("aos", metadata, autoload_with=engine, schema=schema)
-        except NoSuchTableError:
-            logging.error(f"No AO table found in in {schema}")
-            continue
-
-        with engine.begin() as cnxn:
-            paxminer_log_channel = cnxn.execute(select(ao.c.channel_id).where(ao.c.ao == "paxminer_logs")).scalar()
-            token = cnxn.execute(
-                text(f"SELECT slack_token FROM weaselbot.regions WHERE paxminer_schema = '{schema}'")
-            ).scalar()
-            channel = cnxn.execute(
-                text(f"SELECT achievement_channel FROM weaselbot.regions WHERE paxminer_schema = '{schema}'")
-            ).scalar()
-        if channel is None:
-            logging.error(f"{schema} isn't signed up for Weaselbot achievements.")
-            continue
-        try:
-            al = Table("achievements_list", metadata, autoload_with=engine, schema=schema)
-        except NoSuchTableError:
+    def announce_region(schema: str) -> None:
+        context = contexts[schema]
+        if "log_channel" not in context.tables:
+            return
+        paxminer_log_channel = context.first("log_channel", "channel_id")
+        token = context.settings.get("slack_token")
+        channel = context.settings.get("achievement_channel")
+        if channel is None or "awards" not in context.tables:
             logging.error(f"{schema} isn't signed up for Weaselbot achievements.")
-            continue
-        try:
-            aa = Table("achievements_awarded", metadata, autoload_with=engine, schema=schema)
-        except NoSuchTableError:
-            aa = Table("achievement_awarded", metadata, autoload_with=engine, schema=schema)
-
-        sql = (
-            select(aa, al.c.code)
-            .select_from(aa.join(al, aa.c.achievement_id == al.c.id))
-            .where(func.year(aa.c.date_awarded) == func.year(func.curdate()))
+            return
+        awarded, awards = context.tables["awarded"], context.tables["awards"]
+
+        # awards are matched to rules by code, so regions can reorder, drop, retune or add rule-based awards.
+        # Results were joined to users on email and region, so every slack_id is valid for this specific schema
+        frames = evaluate_rules(
+            regions.get((schema,), no_posts),
+            region_rules(awards, rules),
+            cache=regional[schema],
+            users=region_users.get((schema,), users.clear()),
         )
+        dfs_regional = {idx: df.drop("email") for idx, df in frames.items()}
 
-        awarded = pl.read_database_uri(str(sql.compile(engine, compile_kwargs={"literal_binds": True})), uri=uri)
-        awards = pl.read_database_uri(f"SELECT * FROM {schema}.achievements_list", uri=uri)
-
-        # we're pushing one schema at a time to Slack. Ensure all slack_id's are valid for that specific schema
-        users = pl.read_database_uri(f"SELECT email, user_id as slack_user_id FROM {schema}.users", uri=uri)
-        dfs_regional = []
-        for df in dfs:
-            dfs_regional.append(df.filter(pl.col("region") == schema).join(users, on="email").drop("email"))
-
-        data_to_load = send_to_slack(schema, token, channel, year, awarded, awards, dfs_regional, paxminer_log_channel)
+        digest = bool(context.settings.get("achievement_digest"))
+        data_to_load = send_to_slack(
+            schema, token, channel, year, awarded, awards, dfs_regional, paxminer_log_channel, digest, outbox
+        )
         if not data_to_load.is_empty():
-            load_to_database(schema, engine, metadata, data_to_load)
+            # the awarded table comes from discovery, so nothing is reflected into the shared MetaData here
+            load_to_database(schema, engine, metadata, data_to_load, source=source)
+        outbox.mark_loaded(schema)
 
         logging.info(f"Successfully loaded all records and sent all Slack messages for {schema}.")
 
+    def process_region(schema: str) -> None:
+        announce_region(schema)
+        outbox.finish_region(schema)
+
+    logging.info("Parsing region info and sending to Slack...")
+    # regions only share read-only frames and the engine's pool, and each has its own Slack token
+    report = run_regions(process_region, region_schemas)
+    if report.filter(pl.col("error").is_not_null()).is_empty():
+        outbox.complete_run()
+
+    log_query_stats(engine)
     engine.dispose()
 
 
@@ -0,0 +1,170 @@
+"""
+Per-region configuration and lookup tables, prefetched for every region before a job's region loop.
+
+The region loops used to open a connection for each lookup (Slack token, channels, achievements tables, site Qs)
+for each region. Instead, each lookup is sent once for all regions, as a single `union_all` tagged with the source
+schema, and each region's `RegionContext` holds its slice. A lookup whose union fails (e.g. one region's table has
+drifted) is retried as concurrent per-schema queries so a single region can't fail the whole prefetch.
+
+Classes:
+    RegionContext:
+        A region's `weaselbot.regions` settings and prefetched tables.
+
+Functions:
+    region_settings(engine: Engine, schemas: list[str], columns: Iterable[str], optional) -> dict[str, dict]:
+        Read the given `weaselbot.regions` columns for every region in one query.
+
+    paxminer_log_queries(schemas, metadata, engine, source) -> dict[str, Selectable]:
+        Each region's paxminer_logs channel query.
+
+    prefetch_regions(schemas, engine, settings, queries, optional_settings) -> dict[str, RegionContext]:
+        Load settings and every lookup table for every region.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+import polars as pl
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Selectable, column, null, select, table
+
+from .utils import SchemaDiscovery, extract_schemas, read_frame, reflect_table
+
+_TAG = "_region"
+
+
+@dataclass
+class RegionContext:
+    """
+    Everything a job looks up about one region, loaded up front by `prefetch_regions`.
+
+    :param schema: the region's PAXminer schema
+    :type schema: str
+    :param settings: the region's `weaselbot.regions` columns. Empty if the region has no row there.
+    :type settings: dict[str, Any]
+    :param tables: the region's rows of each prefetched lookup. A lookup is missing when the region's query
+        couldn't be built (e.g. the table doesn't exist), and empty when the region has no rows.
+    :type tables: dict[str, pl.DataFrame]
+    """
+
+    schema: str
+    settings: dict[str, Any] = field(default_factory=dict)
+    tables: dict[str, pl.DataFrame] = field(default_factory=dict)
+
+    def first(self, name: str, col: str) -> Any:
+        """The first value of `col` in lookup `name`, or None if it's missing or empty."""
+        df = self.tables.get(name)
+        return df.item(0, col) if df is not None and df.height else None
+
+
+def region_settings(
+    engine: Engine, schemas: list[str], columns: Iterable[str], optional: Iterable[str] = ()
+) -> dict[str, dict]:
+    """
+    Read `weaselbot.regions` settings for every region in one query.
+
+    :param engine: SQLAlchemy engine the settings are read through
+    :type engine: Engine
+    :param schemas: the regions' PAXminer schemas
+    :type schemas: list[str]
+    :param columns: the settings columns to read
+    :type columns: Iterable[str]
+    :param optional: settings columns that may not exist yet; they read as None where they don't
+    :type optional: Iterable[str]
+    :return: settings keyed by schema. Regions without a row are left out.
+    :rtype: dict[str, dict]
+    """
+
+    columns, optional = list(columns), list(optional)
+    if optional:
+        existing = {c["name"] for c in inspect(engine).get_columns("regions", schema="weaselbot")}
+        columns += [c for c in optional if c in existing]
+    regions = table("regions", column("paxminer_schema"), *(column(c) for c in columns), schema="weaselbot")
+    missing = [null().label(c) for c in optional if c not in columns]
+    sql = select(regions.c.paxminer_schema, *(regions.c[c] for c in columns), *missing).where(
+        regions.c.paxminer_schema.in_(schemas)
+    )
+    df = read_frame(sql, engine, label="weaselbot.regions")
+    return {row.pop("paxminer_schema"): row for row in df.iter_rows(named=True)}
+
+
+def paxminer_log_queries(
+    schemas: list[str], metadata: MetaData, engine: Engine, source: SchemaDiscovery | None = None
+) -> dict[str, Selectable]:
+    """
+    Build each region's query for its paxminer_logs channel id. Regions without an aos table are left out.
+
+    :param schemas: the regions' PAXminer schemas
+    :type schemas: list[str]
+    :param metadata: SQLAlchemy MetaData object
+    :type metadata: MetaData
+    :param engine: SQLAlchemy Engine object
+    :type engine: Engine
+    :param source: tables discovered in bulk by `discover_schemas`, used instead of reflection
+    :type source: SchemaDiscovery | None
+    :return: one query per schema selecting channel_id
+    :rtype: dict[str, Selectable]
+    """
+
+    queries = {}
+    for schema in schemas:
+        try:
+            ao = reflect_table("aos", metadata, engine, schema, source)
+        except SQLAlchemyError as e:
+            logging.error(f"No AO table found in {schema}: {e}")
+            continue
+        queries[schema] = select(ao.c.channel_id).where(ao.c.ao == "paxminer_logs")
+    return queries
+
+
+def _prefetch(name: str, queries: dict[str, Selectable], engine: Engine) -> dict[str, pl.DataFrame]:
+    """Run one lookup for every region as a single union, falling back to per-schema queries if it fails."""
+
+    try:
+        df, report = extract_schemas(queries, engine, workers=1, tag=_TAG)
+    except SQLAlchemyError as e:
+        logging.warning(f"Prefetching {name} as one query failed, retrying per region: {e}")
+        df, report = extract_schemas(queries, engine, tag=_TAG)
+    failed = set(report.filter(pl.col("error").is_not_null()).get_column("schema").to_list())
+    if not df.columns:
+        return {schema: pl.DataFrame() for schema in queries if schema not in failed}
+    parts = df.partition_by(_TAG, as_dict=True, include_key=False)
+    empty = df.drop(_TAG).clear()
+    return {schema: parts.get((schema,), empty) for schema in queries if schema not in failed}
+
+
+def prefetch_regions(
+    schemas: list[str],
+    engine: Engine,
+    settings: Iterable[str] = (),
+    queries: dict[str, dict[str, Selectable]] | None = None,
+    optional_settings: Iterable[str] = (),
+) -> dict[str, RegionContext]:
+    """
+    Load every region's settings and lookup tables with one query per lookup.
+
+    :param schemas: the regions' PAXminer schemas
+    :type schemas: list[str]
+    :param engine: SQLAlchemy engine the lookups are read through
+    :type engine: Engine
+    :param settings: `weaselbot.regions` columns to load
+    :type settings: Iterable[str]
+    :param queries: per lookup name, one query per region as built for `extract_schemas`
+    :type queries: dict[str, dict[str, Selectable]] | None
+    :param optional_settings: `weaselbot.regions` columns to load if they exist, None otherwise
+    :type optional_settings: Iterable[str]
+    :return: a context per schema
+    :rtype: dict[str, RegionContext]
+    """
+
+    settings, optional_settings = list(settings), list(optional_settings)
+    found = region_settings(engine, schemas, settings, optional_settings) if settings or optional_settings else {}
+    contexts = {schema: RegionContext(schema, found.get(schema, {})) for schema in schemas}
+    for name, lookup in (queries or {}).items():
+        for schema, df in _prefetch(name, lookup, engine).items():
+            contexts[schema].tables[name] = df
+    logging.info(f"Prefetched {len(queries or {})} lookups and settings for {len(schemas)} regions")
+    return contexts
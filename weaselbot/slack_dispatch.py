@@ -0,0 +1,242 @@
+"""
+Asynchronous Slack message dispatch, rate limited per workspace token and Slack method tier.
+
+Messages are queued with `SlackDispatcher.submit` and sent together by `SlackDispatcher.run`. Messages to the same
+channel go out in the order they were submitted; different channels and workspaces are sent concurrently. Each
+(token, tier) pair has its own token bucket, so a `Retry-After` from one workspace pauses only that workspace's
+calls of that tier while the others carry on. chat.postMessage also has a bucket per channel, taken after the
+workspace's, so a rate limit in one channel pauses posting to all of that workspace's channels. Rate limits and Slack server errors are retried a bounded number of
+times with jitter, and every message's outcome is returned rather than raised.
+
+Classes:
+    SlackMessage:
+        One message to send, optionally with a reaction.
+
+    SlackOutcome:
+        What happened to a message: its timestamp, or the Slack error and how many attempts were made.
+
+    SlackDispatcher:
+        Queue messages and send them all on one event loop.
+"""
+
+import asyncio
+import logging
+import random
+import ssl
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+from slack_sdk.errors import SlackApiError
+
+# Slack's documented limits as (requests per second, burst). chat.postMessage is "special": about one message per
+# second per channel, so it also has a bucket per channel, under a workspace-wide one of several hundred a minute.
+TIER_LIMITS = {"special": (300 / 60, 20), "tier3": (50 / 60, 5), "tier4": (100 / 60, 10)}
+CHANNEL_LIMIT = (1.0, 3)  # chat.postMessage per channel
+METHOD_TIERS = {"chat.postMessage": "special", "reactions.add": "tier3", "conversations.join": "tier3"}
+MAX_ATTEMPTS = 4
+BACKOFF = 1.0  # seconds before the first retry of a server error, doubling after that
+JITTER = 1.0  # up to this many seconds are added to every wait, so paused workspaces don't retry in lockstep
+
+
+@dataclass(frozen=True)
+class SlackMessage:
+    """
+    :param token: the workspace's bot token
+    :type token: str
+    :param channel: channel or user id to post to
+    :type channel: str
+    :param text: the message, or the notification fallback when there are blocks
+    :type text: str
+    :param reaction: emoji name to react to the message with once it's posted
+    :type reaction: str | None
+    :param join: on `not_in_channel`, join the channel and post again
+    :type join: bool
+    :param key: anything identifying the message to the caller
+    :type key: Hashable
+    :param blocks: Block Kit layout to post instead of plain text
+    :type blocks: tuple[dict, ...] | None
+    """
+
+    token: str
+    channel: str
+    text: str
+    reaction: str | None = None
+    join: bool = False
+    key: Hashable = None
+    blocks: tuple[dict, ...] | None = None
+
+
+@dataclass
+class SlackOutcome:
+    """
+    :param message: the message that was sent
+    :type message: SlackMessage
+    :param ts: the posted message's timestamp, if it was posted
+    :type ts: str | None
+    :param error: the Slack error code (or exception text) that stopped it, if it wasn't
+    :type error: str | None
+    :param attempts: chat.postMessage calls made
+    :type attempts: int
+    """
+
+    message: SlackMessage
+    ts: str | None = None
+    error: str | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def async_slack_client(token: str) -> Any:
+    """The async counterpart of `utils.slack_client`. Needs aiohttp, so it's only imported when used."""
+    from slack_sdk.web.async_client import AsyncWebClient
+
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return AsyncWebClient(token=token, ssl=ssl_context)
+
+
+class _TokenBucket:
+    """Allows `rate` calls per second with bursts of `burst`, and can be paused for a `Retry-After`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # callers queue on the lock, so they are served in order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class SlackDispatcher:
+    """
+    Queue Slack messages and send them concurrently under per-workspace rate limits.
+
+    :param client_factory: builds an async Slack client for a token. Defaults to `async_slack_client`.
+    :type client_factory: Callable[[str], Any] | None
+    :param max_attempts: calls made for a message before giving up on rate limits and server errors
+    :type max_attempts: int
+    """
+
+    def __init__(self, client_factory: Callable[[str], Any] | None = None, max_attempts: int = MAX_ATTEMPTS):
+        self.client_factory = client_factory or async_slack_client
+        self.max_attempts = max_attempts
+        self.queue: list[SlackMessage] = []
+
+    def submit(self, message: SlackMessage) -> None:
+        self.queue.append(message)
+
+    def run(self) -> list[SlackOutcome]:
+        """Send every queued message, returning outcomes in submission order. The queue is emptied."""
+        messages, self.queue = self.queue, []
+        if not messages:
+            return []
+        return asyncio.run(self._run(messages))
+
+    async def _run(self, messages: list[SlackMessage]) -> list[SlackOutcome]:
+        self._clients = {}
+        self._buckets = {}
+        channels = defaultdict(list)
+        for i, message in enumerate(messages):
+            channels[message.token, message.channel].append(i)
+        outcomes: list[SlackOutcome | None] = [None] * len(messages)
+
+        async def send_channel(indices: list[int]) -> None:
+            for i in indices:
+                outcomes[i] = await self._send(messages[i])
+
+        await asyncio.gather(*(send_channel(indices) for indices in channels.values()))
+        failed = sum(not outcome.ok for outcome in outcomes)
+        logging.info(f"Dispatched {len(messages) - failed} of {len(messages)} Slack messages")
+        return outcomes
+
+    def _buckets_for(self, token: str, method: str, channel: str) -> list[_TokenBucket]:
+        """The method's buckets in the order they're acquired: the workspace's for its tier, then any channel's."""
+        tier = METHOD_TIERS.get(method, "tier3")
+        if (token, tier) not in self._buckets:
+            self._buckets[token, tier] = _TokenBucket(*TIER_LIMITS[tier])
+        buckets = [self._buckets[token, tier]]
+        if tier == "special":
+            if (token, tier, channel) not in self._buckets:
+                self._buckets[token, tier, channel] = _TokenBucket(*CHANNEL_LIMIT)
+            buckets.append(self._buckets[token, tier, channel])
+        return buckets
+
+    async def _call(self, token: str, method: str, outcome: SlackOutcome | None = None, **kwargs) -> Any:
+        """Call a Slack method under its bucket, retrying rate limits and server errors with jitter."""
+        if token not in self._clients:
+            self._clients[token] = self.client_factory(token)
+        workspace, *channel = self._buckets_for(token, method, kwargs["channel"])
+        for attempt in range(1, self.max_attempts + 1):
+            if outcome is not None:
+                outcome.attempts += 1
+            for bucket in (workspace, *channel):
+                await bucket.acquire()
+            try:
+                return await getattr(self._clients[token], method.replace(".", "_"))(**kwargs)
+            except SlackApiError as e:
+                status = e.response.status_code
+                if attempt == self.max_attempts or not (status == 429 or status >= 500):
+                    raise
+                if status == 429:
+                    delay = float(e.response.headers.get("Retry-After", 1))
+                    # all of this workspace's calls of this tier, in every channel, wait out the rate limit
+                    workspace.pause(delay + random.uniform(0, JITTER))
+                    logging.info(f"Slack rate limited {method}, pausing that workspace for {delay:.0f} seconds.")
+                else:
+                    await asyncio.sleep(BACKOFF * 2 ** (attempt - 1) + random.uniform(0, JITTER))
+
+    async def _send(self, message: SlackMessage) -> SlackOutcome:
+        outcome = SlackOutcome(message)
+        post = {"channel": message.channel, "text": message.text, "link_names": True}
+        if message.blocks:
+            post["blocks"] = list(message.blocks)
+        try:
+            try:
+                response = await self._call(message.token, "chat.postMessage", outcome, **post)
+            except SlackApiError as e:
+                if not (message.join and e.response.get("error") == "not_in_channel"):
+                    raise
+                await self._call(message.token, "conversations.join", channel=message.channel)
+                response = await self._call(message.token, "chat.postMessage", outcome, **post)
+            outcome.ts = response.get("ts")
+        except SlackApiError as e:
+            outcome.error = e.response.get("error") or str(e)
+            return outcome
+        except Exception as e:
+            outcome.error = str(e)
+            return outcome
+
+        if message.reaction:
+            try:
+                await self._call(
+                    message.token, "reactions.add", channel=message.channel, name=message.reaction, timestamp=outcome.ts
+                )
+            except Exception as e:
+                # the message itself went out, so this doesn't count as a failure
+                logging.warning(f"Couldn't add :{message.reaction}: to the message in {message.channel}: {e}")
+        return outcome
@@ -0,0 +1,259 @@
+"""
+Local columnar snapshots of the national attendance extract, so each run only pulls recent beatdowns.
+
+Rows are stored as Parquet, one file per source region and month, under WEASELBOT_CACHE_DIR. Each region has
+a watermark: the date of its last successful extract. The next run re-fetches everything from
+`watermark - lookback_days` onwards and replaces that range in the snapshot, which picks up new beatdowns as
+well as backblasts that were added late, edited or deleted inside the lookback window. PAXminer doesn't keep
+an edit timestamp, so every `refresh_days` each region's current year is re-fetched in full as well, which
+catches late edits to everything the year-level achievements count. Each region also records the first date its rows are complete from, and a run asking for earlier beatdowns fetches
+the region again from there.
+
+Classes:
+    SnapshotStore:
+        Per-job snapshot store with `since`, `covered`, `merge` and `load`.
+
+Functions:
+    extract_incremental(store, build_queries, schemas, engine, start, casts, tag) -> pl.DataFrame:
+        Fetch each region's rows since its watermark, merge them into the snapshot and return the full data set.
+"""
+
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Callable
+
+import polars as pl
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Selectable
+
+from .utils import CACHE_DIR, extract_schemas
+
+SNAPSHOT_LOOKBACK_DAYS = 45
+SNAPSHOT_REFRESH_DAYS = 7
+
+
+def _month_key(d: date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+class SnapshotStore:
+    """
+    Partitioned Parquet snapshot of one job's national extract with a per-region watermark.
+
+    :param name: name of the snapshot, e.g. the job using it. Jobs whose extracts differ in shape need their
+        own store.
+    :type name: str
+    :param path: root directory. Defaults to WEASELBOT_CACHE_DIR/snapshots.
+    :type path: str | None
+    :param lookback_days: days before the watermark that are re-fetched each run. Defaults to the
+        WEASELBOT_SNAPSHOT_LOOKBACK_DAYS environment variable, or 45.
+    :type lookback_days: int | None
+    :param refresh_days: days between full re-fetches of each region's current year. Defaults to the
+        WEASELBOT_SNAPSHOT_REFRESH_DAYS environment variable, or 7.
+    :type refresh_days: int | None
+    :param date_col: the column holding the beatdown date
+    :type date_col: str
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str | None = None,
+        lookback_days: int | None = None,
+        date_col: str = "date",
+        refresh_days: int | None = None,
+    ):
+        root = path or os.path.join(os.getenv("WEASELBOT_CACHE_DIR", CACHE_DIR), "snapshots")
+        self.path = os.path.join(root, name)
+        self.lookback_days = (
+            lookback_days
+            if lookback_days is not None
+            else int(os.getenv("WEASELBOT_SNAPSHOT_LOOKBACK_DAYS", SNAPSHOT_LOOKBACK_DAYS))
+        )
+        self.refresh_days = (
+            refresh_days
+            if refresh_days is not None
+            else int(os.getenv("WEASELBOT_SNAPSHOT_REFRESH_DAYS", SNAPSHOT_REFRESH_DAYS))
+        )
+        self.date_col = date_col
+        os.makedirs(self.path, exist_ok=True)
+        self._watermark_file = os.path.join(self.path, "watermarks.json")
+        self._coverage_file = os.path.join(self.path, "coverage.json")
+        self._refreshed_file = os.path.join(self.path, "refreshed.json")
+        self._watermarks = self._read_dates(self._watermark_file)
+        self._coverage = self._read_dates(self._coverage_file)
+        self._refreshed = self._read_dates(self._refreshed_file)
+
+    @staticmethod
+    def _read_dates(file: str) -> dict[str, date]:
+        try:
+            with open(file) as f:
+                return {k: date.fromisoformat(v) for k, v in json.load(f).items()}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _write_dates(file: str, dates: dict[str, date]) -> None:
+        tmp = f"{file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({k: v.isoformat() for k, v in dates.items()}, f, indent=2)
+        os.replace(tmp, file)
+
+    def since(self, schema: str, start: date | None = None) -> date | None:
+        """
+        The first beatdown date to fetch for the region, or `start` (None meaning all history) if the region
+        has no usable snapshot yet or its snapshot doesn't go back as far as `start`. When the region's current
+        year hasn't been fetched in full for `refresh_days`, it's fetched from the first of the year.
+        """
+
+        watermark = self._watermarks.get(schema)
+        covered = self.covered(schema)
+        if watermark is None or covered is None or covered > (start or date.min):
+            return start
+        cut = watermark - timedelta(days=self.lookback_days)
+        today = date.today()
+        refreshed = self._refreshed.get(schema)
+        if refreshed is None or refreshed.year != today.year or (today - refreshed).days >= self.refresh_days:
+            cut = min(cut, date(today.year, 1, 1))
+        return max(cut, start) if start is not None else cut
+
+    def covered(self, schema: str) -> date | None:
+        """
+        The first beatdown date the region's snapshot is complete from, `date.min` for all history, or None if
+        it has no snapshot (or one from before coverage was recorded).
+        """
+
+        return self._coverage.get(schema) if schema in self._watermarks else None
+
+    def merge(self, schema: str, df: pl.DataFrame, since: date | None, watermark: date | None = None) -> None:
+        """
+        Replace the region's rows on or after `since` with `df` and advance its watermark.
+
+        :param schema: the source region
+        :type schema: str
+        :param df: everything the region returned for beatdowns on or after `since`
+        :type df: pl.DataFrame
+        :param since: the date the fetch started from, None for a full fetch
+        :type since: date | None
+        :param watermark: the date to record as extracted, defaults to today
+        :type watermark: date | None
+        """
+
+        region_dir = os.path.join(self.path, schema)
+        os.makedirs(region_dir, exist_ok=True)
+        existing = {f.removesuffix(".parquet") for f in os.listdir(region_dir) if f.endswith(".parquet")}
+        if df.height:
+            fresh = df.with_columns(pl.col(self.date_col).cast(pl.Date).dt.strftime("%Y-%m").alias("_month"))
+            fresh_months = set(fresh.get_column("_month").unique().to_list())
+        else:
+            fresh, fresh_months = None, set()
+        touched = fresh_months | {m for m in existing if since is None or m >= _month_key(since)}
+
+        for month in sorted(touched):
+            file = os.path.join(region_dir, f"{month}.parquet")
+            parts = [] if fresh is None else [fresh.filter(pl.col("_month") == month).drop("_month")]
+            if month in existing and since is not None:
+                parts.insert(0, pl.read_parquet(file).filter(pl.col(self.date_col) < since))
+            part = pl.concat(parts, how="vertical_relaxed") if parts else pl.DataFrame()
+            if part.height:
+                tmp = f"{file}.tmp"
+                part.write_parquet(tmp)
+                os.replace(tmp, file)
+            elif month in existing:
+                os.remove(file)
+
+        covered = self.covered(schema)
+        if covered is None or (since or date.min) < covered:
+            self._coverage[schema] = since or date.min
+            self._write_dates(self._coverage_file, self._coverage)
+        watermark = watermark or date.today()
+        if since is None or since <= date(watermark.year, 1, 1):
+            self._refreshed[schema] = watermark
+            self._write_dates(self._refreshed_file, self._refreshed)
+        self._watermarks[schema] = watermark
+        self._write_dates(self._watermark_file, self._watermarks)
+
+    def load(self, schemas: list[str], start: date | None = None, tag: str | None = None) -> pl.DataFrame:
+        """
+        Read the snapshot for the given regions, optionally only from `start` onwards.
+
+        :param schemas: the source regions to read
+        :type schemas: list[str]
+        :param start: the earliest beatdown date to return, None for all history
+        :type start: date | None
+        :param tag: if given, a column of this name holds each row's source region
+        :type tag: str | None
+        :return: the snapshot rows, in the same shape that was merged
+        :rtype: pl.DataFrame
+        """
+
+        frames = []
+        for schema in schemas:
+            region_dir = os.path.join(self.path, schema)
+            if not os.path.isdir(region_dir):
+                continue
+            files = sorted(
+                os.path.join(region_dir, f)
+                for f in os.listdir(region_dir)
+                if f.endswith(".parquet") and (start is None or f.removesuffix(".parquet") >= _month_key(start))
+            )
+            if not files:
+                continue
+            lf = pl.scan_parquet(files)
+            if tag is not None:
+                lf = lf.with_columns(pl.lit(schema).alias(tag))
+            frames.append(lf)
+        if not frames:
+            return pl.DataFrame()
+        lf = pl.concat(frames, how="vertical_relaxed")
+        if start is not None:
+            lf = lf.filter(pl.col(self.date_col) >= start)
+        df = lf.collect()
+        logging.info(f"Loaded {df.height} snapshot rows from {len(frames)} regions")
+        return df
+
+
+def extract_incremental(
+    store: SnapshotStore,
+    build_queries: Callable[[dict[str, date | None]], dict[str, Selectable]],
+    schemas: list[str],
+    engine: Engine,
+    start: date | None = None,
+    casts: dict[str, pl.DataType] | None = None,
+    tag: str | None = None,
+) -> pl.DataFrame:
+    """
+    Bring the snapshot up to date and return it. Each region is only asked for beatdowns since its own
+    watermark; regions whose extract fails keep their previous snapshot and watermark.
+
+    :param store: the job's snapshot store
+    :type store: SnapshotStore
+    :param build_queries: called with the per-region start dates, returns one query per region
+    :type build_queries: Callable[[dict[str, date | None]], dict[str, Selectable]]
+    :param schemas: the regions to extract
+    :type schemas: list[str]
+    :param engine: SQLAlchemy engine the extract is read through
+    :type engine: Engine
+    :param start: the earliest beatdown date the job needs, None for all history
+    :type start: date | None
+    :param casts: column dtypes to enforce on each region's rows
+    :type casts: dict[str, pl.DataType] | None
+    :param tag: if given, a column of this name holds each row's source region
+    :type tag: str | None
+    :return: the job's national data set, in the same shape as a full extract
+    :rtype: pl.DataFrame
+    """
+
+    since = {schema: store.since(schema, start) for schema in schemas}
+    queries = build_queries(since)
+    fresh, report = extract_schemas(queries, engine, casts=casts, tag="_schema")
+    failed = set(report.filter(pl.col("error").is_not_null()).get_column("schema").to_list())
+    parts = fresh.partition_by("_schema", as_dict=True, include_key=False) if fresh.height else {}
+    for schema in queries:
+        if schema in failed:
+            logging.error(f"Using the previous snapshot for {schema}")
+            continue
+        store.merge(schema, parts.get((schema,), pl.DataFrame()), since[schema])
+    return store.load(list(queries), start, tag)
@@ -4,15 +4,36 @@ achievement data.
 
 Functions:
     mysql_connection() -> Engine:
-        Connect to MySQL. This involves loading environment variables from file.
+        Connect to MySQL with a warm connection pool. This involves loading environment variables from file.
 
     slack_client(token: str) -> WebClient:
         Instantiate Slack Web client.
 
-    _check_for_new_results(schema: str, year: int, idx: int, df: pl.DataFrame, awarded: pl.DataFrame) -> pl.DataFrame:
-        Check for new earned achievements in the data. By looking at the current achievement number and comparing it
-        against what we've already seen, determine if there are new achievements to issue. If there are no new
-        achievements, continue to the next one.
+    ReflectionFailures:
+        On-disk record of failed table reflections, so broken regions aren't reflected again until a TTL expires.
+
+    discover_schemas(engine: Engine, metadata: MetaData, schemas: list[str], ...) -> SchemaDiscovery:
+        Build every region's tables from a single information_schema query and report what each schema lacks.
+
+    reflect_table(name: str, metadata: MetaData, engine: Engine, schema: str, source) -> Table:
+        Reflect a table, going through schema discovery when it's supplied.
+
+    read_frame(query: Selectable | str, engine: Engine, label: str | None) -> pl.DataFrame:
+        Read a query into Polars over a pooled connection, recording its timing and row and byte counts.
+
+    query_stats(engine: Engine) -> pl.DataFrame:
+        Every read made through the engine so far. `log_query_stats` logs a summary.
+
+    extract_schemas(queries: dict[str, Selectable], engine: Engine, uri: str | None, workers: int | None, ...):
+        Run per-schema queries concurrently, concatenating the results and reporting per-schema timings and failures.
+
+    _find_new_awards(schema: str, year: int, dfs, awarded: pl.DataFrame) -> pl.DataFrame:
+        Check for new earned achievements in the data. Every achievement's results are compared against what we've
+        already awarded in one anti-join per kind of period, giving a single frame of new achievements to issue.
+
+    _number_awards(new_awards: pl.DataFrame, awarded: pl.DataFrame, year: int) -> pl.DataFrame:
+        Number every new award for its message (achievement #N this year, the Nth time for this award) in one
+        join and window over the frame.
 
     ordinal_suffix(n: int) -> str:
         Logic to add the ordinal suffix to the numbers. i.e. 3rd, 9th, 1st, etc...
@@ -22,21 +43,54 @@ Functions:
         Take the data and, after comparing it to the already-awarded achievements, find what hasn't been awarded.
         This also makes comparisons to each region's `awards_list` table. Some regions have customized it to exclude
         some base awards and include some custom ones. Custom awards are not taken into account. They must be
-        separately addressed.
+        separately addressed. The messages are sent through a `SlackDispatcher`.
 """
 
+import json
 import logging
 import os
 import ssl
+import threading
 import time
-from collections import Counter, defaultdict
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from weakref import WeakKeyDictionary
 
 import polars as pl
 from dotenv import load_dotenv
 from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from sqlalchemy import create_engine
+from sqlalchemy import Column, MetaData, Table, bindparam, create_engine, text
+from sqlalchemy.dialects.mysql.base import ischema_names
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import NoSuchTableError, SQLAlchemyError
+from sqlalchemy.sql import Selectable, literal_column, union_all
+from sqlalchemy.types import NullType, TypeEngine
+
+from .slack_dispatch import SlackDispatcher, SlackMessage
+
+if TYPE_CHECKING:
+    from .outbox import AwardOutbox
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+DIGEST_BLOCKS = 50  # Slack's limit on blocks per message
+DIGEST_SECTION_CHARS = 3000  # Slack's limit on a section block's text
+REFLECTION_FAILURE_TTL = 24 * 60 * 60  # seconds before a failed reflection is retried
+POOL_RECYCLE = 3600  # seconds before a pooled connection is replaced, inside MySQL's wait_timeout
+DISCOVERED_TABLES = (
+    "users",
+    "bd_attendance",
+    "beatdowns",
+    "aos",
+    "achievements_list",
+    "achievements_awarded",
+    "achievement_awarded",
+)
+
+# per-engine record of `read_frame` calls, for `query_stats`
+_query_stats: WeakKeyDictionary[Engine, list[dict]] = WeakKeyDictionary()
+_query_stats_lock = threading.Lock()
 
 
 def mysql_connection() -> Engine:
@@ -51,12 +105,75 @@ def mysql_connection() -> Engine:
 
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     load_dotenv()
+    # keep enough warm connections for every concurrent extract worker; `read_frame` checks them out per query
     engine = create_engine(
-        f"mysql+mysqlconnector://{os.getenv('DATABASE_USER')}:{os.getenv('DATABASE_PASSWORD')}@{os.getenv('DATABASE_HOST')}:3306"
+        f"mysql+mysqlconnector://{os.getenv('DATABASE_USER')}:{os.getenv('DATABASE_PASSWORD')}@{os.getenv('DATABASE_HOST')}:3306",
+        pool_size=int(os.getenv("WEASELBOT_EXTRACT_WORKERS", "8")),
+        max_overflow=4,
+        pool_pre_ping=True,
+        pool_recycle=POOL_RECYCLE,
     )
     return engine
 
 
+def _normalize_decimals(df: pl.DataFrame) -> pl.DataFrame:
+    """MySQL returns SUM and COUNT-derived values as DECIMAL; whole-number decimals become Int64, others Float64."""
+    return df.with_columns(
+        pl.col(name).cast(pl.Int64 if dtype.scale == 0 else pl.Float64)
+        for name, dtype in df.schema.items()
+        if isinstance(dtype, pl.Decimal)
+    )
+
+
+def read_frame(query: Selectable | str, engine: Engine, label: str | None = None) -> pl.DataFrame:
+    """
+    Run a query over a pooled connection and return the result as a Polars DataFrame. Every read is timed and its
+    row and byte counts are recorded against the engine, see `query_stats`.
+
+    :param query: the query. Plain strings are run as SQL text.
+    :type query: Selectable | str
+    :param engine: SQLAlchemy engine whose connection pool is used
+    :type engine: Engine
+    :param label: name to record the query under, e.g. the schema it's for
+    :type label: str | None
+    :return: the result
+    :rtype: pl.DataFrame
+    """
+
+    start = time.perf_counter()
+    with engine.connect() as cnxn:
+        df = pl.read_database(text(query) if isinstance(query, str) else query, cnxn, infer_schema_length=None)
+    df = _normalize_decimals(df)
+    with _query_stats_lock:
+        _query_stats.setdefault(engine, []).append(
+            {
+                "label": label or "query",
+                "seconds": time.perf_counter() - start,
+                "rows": df.height,
+                "bytes": df.estimated_size(),
+            }
+        )
+    return df
+
+
+def query_stats(engine: Engine) -> pl.DataFrame:
+    """Every `read_frame` made through the engine so far, with its label, seconds, rows and bytes."""
+    with _query_stats_lock:
+        records = list(_query_stats.get(engine, []))
+    return pl.DataFrame(
+        records, schema={"label": pl.String, "seconds": pl.Float64, "rows": pl.Int64, "bytes": pl.Int64}
+    )
+
+
+def log_query_stats(engine: Engine) -> None:
+    """Log a one-line summary of the engine's reads."""
+    stats = query_stats(engine)
+    logging.info(
+        f"{stats.height} queries read {stats.get_column('rows').sum()} rows "
+        f"({stats.get_column('bytes').sum() / 2**20:.1f} MiB) in {stats.get_column('seconds').sum():.1f}s"
+    )
+
+
 def slack_client(token: str) -> WebClient:
     """
     Instantiate Slack Web client
@@ -73,51 +190,374 @@ def slack_client(token: str) -> WebClient:
     return WebClient(token=token, ssl=ssl_context)
 
 
-def _check_for_new_results(schema: str, year: int, idx: int, df: pl.DataFrame, awarded: pl.DataFrame) -> pl.DataFrame:
+class ReflectionFailures:
+    """
+    On-disk record of failed table reflections. Discovery builds the tables it knows about without reflecting,
+    but anything outside its set is still autoloaded, and a broken or half set-up region fails that every run.
+    A failure is remembered for `ttl` seconds and raised again without touching the database until then.
+    """
+
+    def __init__(self, path: str | None = None, ttl: int = REFLECTION_FAILURE_TTL) -> None:
+        self.path = path or os.path.join(os.getenv("WEASELBOT_CACHE_DIR", CACHE_DIR), "reflection_failures.json")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self._failures = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._failures = {}
+
+    def _save(self) -> None:
+        """Atomically write the failures."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._failures, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def reflect(self, name: str, metadata: MetaData, engine: Engine, schema: str) -> Table:
+        """
+        Autoload the table unless its reflection failed within the TTL.
+
+        :raises NoSuchTableError: if the table doesn't exist, now or within the TTL
+        :raises SQLAlchemyError: if reflection failed for any other reason, now or within the TTL
+        """
+
+        key = f"{schema}.{name}"
+        with self._lock:
+            failure = self._failures.get(key)
+        if failure is not None and time.time() - failure["at"] < self.ttl:
+            if failure["type"] == NoSuchTableError.__name__:
+                raise NoSuchTableError(key)
+            raise SQLAlchemyError(f"Cached reflection failure for {key}: {failure['error']}")
+
+        try:
+            t = Table(name, metadata, autoload_with=engine, schema=schema)
+        except SQLAlchemyError as e:
+            with self._lock:
+                self._failures[key] = {"type": type(e).__name__, "error": str(e), "at": time.time()}
+                self._save()
+            raise
+        if failure is not None:
+            with self._lock:
+                self._failures.pop(key, None)
+                self._save()
+        return t
+
+
+@dataclass
+class SchemaDiscovery:
+    """
+    Table definitions for many schemas, built from a single information_schema result set by
+    `discover_schemas`. `missing` maps each schema to the requirements (``table`` or ``table.column``)
+    it doesn't satisfy. Tables outside the discovered set are autoloaded, through `failures` when given.
+    """
+
+    tables: dict[str, dict[str, Table]]
+    missing: dict[str, list[str]]
+    discovered: tuple[str, ...]
+    failures: ReflectionFailures | None = None
+
+    def table(self, name: str, metadata: MetaData, engine: Engine, schema: str) -> Table:
+        """
+        Return a discovered table. Tables outside the discovered set are reflected, skipping those that failed
+        within the `failures` TTL.
+
+        :raises NoSuchTableError: if the table was part of discovery but doesn't exist in the schema
+        """
+
+        if name not in self.discovered:
+            if self.failures is not None:
+                return self.failures.reflect(name, metadata, engine, schema)
+            return Table(name, metadata, autoload_with=engine, schema=schema)
+        try:
+            return self.tables[schema][name]
+        except KeyError:
+            raise NoSuchTableError(f"{schema}.{name}") from None
+
+    def has(self, schema: str, *requirements: str) -> bool:
+        """True if the schema exists and none of the requirements are missing from it."""
+        return schema in self.tables and not set(requirements) & set(self.missing.get(schema, []))
+
+    def log_missing(self) -> None:
+        """Log, per requirement, how many and which schemas lack it."""
+        by_requirement = defaultdict(list)
+        for schema, requirements in self.missing.items():
+            for requirement in requirements:
+                by_requirement[requirement].append(schema)
+        for requirement, schemas in sorted(by_requirement.items()):
+            logging.info(f"{len(schemas)} schemas lack {requirement}: {', '.join(sorted(schemas))}")
+
+
+def _column_type(data_type: str) -> TypeEngine:
+    try:
+        return ischema_names[data_type.lower()]()
+    except (KeyError, TypeError):
+        return NullType()
+
+
+def discover_schemas(
+    engine: Engine,
+    metadata: MetaData,
+    schemas: list[str],
+    tables: tuple[str, ...] = DISCOVERED_TABLES,
+    required: tuple[str, ...] = (),
+    failures: ReflectionFailures | None = None,
+) -> SchemaDiscovery:
+    """
+    Build SQLAlchemy `Table` objects for `tables` in every schema from one information_schema.COLUMNS query,
+    instead of autoloading each table in each schema separately.
+
+    :param engine: SQLAlchemy engine connected to the PAXminer database
+    :type engine: Engine
+    :param metadata: the MetaData the tables are added to
+    :type metadata: MetaData
+    :param schemas: schema names to discover
+    :type schemas: list[str]
+    :param tables: table names to build in each schema
+    :type tables: tuple[str, ...]
+    :param required: requirements, as ``table`` or ``table.column``, to report on per schema
+    :type required: tuple[str, ...]
+    :param failures: record of failed reflections, consulted before autoloading a table outside `tables`
+    :type failures: ReflectionFailures | None
+    :return: the discovered tables and the per-schema report of missing tables and columns
+    :rtype: SchemaDiscovery
+    """
+
+    discovered = defaultdict(lambda: defaultdict(list))
+    if schemas:
+        sql = text(
+            """
+            SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_KEY
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA IN :schemas AND TABLE_NAME IN :tables
+            ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+            """
+        ).bindparams(bindparam("schemas", expanding=True), bindparam("tables", expanding=True))
+        with engine.begin() as cnxn:
+            rows = cnxn.execute(sql, {"schemas": list(schemas), "tables": list(tables)}).all()
+        for schema, table_name, column_name, data_type, is_nullable, column_key in rows:
+            discovered[schema][table_name].append(
+                Column(
+                    column_name,
+                    _column_type(data_type),
+                    nullable=is_nullable == "YES",
+                    primary_key=column_key == "PRI",
+                )
+            )
+
+    result, missing = {}, {}
+    for schema in schemas:
+        if schema not in discovered:
+            continue
+        result[schema] = {}
+        for table_name, columns in discovered[schema].items():
+            key = f"{schema}.{table_name}"
+            if key in metadata.tables:
+                result[schema][table_name] = metadata.tables[key]
+            else:
+                result[schema][table_name] = Table(table_name, metadata, *columns, schema=schema)
+        lacking = []
+        for requirement in required:
+            table_name, _, column_name = requirement.partition(".")
+            t = result[schema].get(table_name)
+            if t is None or (column_name and column_name not in t.columns):
+                lacking.append(requirement)
+        if lacking:
+            missing[schema] = lacking
+
+    return SchemaDiscovery(tables=result, missing=missing, discovered=tuple(tables), failures=failures)
+
+
+def reflect_table(
+    name: str,
+    metadata: MetaData,
+    engine: Engine,
+    schema: str,
+    source: SchemaDiscovery | None = None,
+) -> Table:
+    """
+    Reflect a table from the database. When a `SchemaDiscovery` is supplied the table is served from the bulk
+    information_schema result instead.
+    """
+
+    if source is None:
+        return Table(name, metadata, autoload_with=engine, schema=schema)
+    return source.table(name, metadata, engine, schema)
+
+
+def _read_schema(
+    schema: str,
+    query: Selectable,
+    engine: Engine,
+    uri: str | None,
+    casts: dict[str, pl.DataType] | None,
+    partition_on: str | None,
+    partition_num: int | None,
+) -> tuple[pl.DataFrame | None, dict]:
+    """Run one schema's query, returning the frame (None on failure) and its report row."""
+    start = time.perf_counter()
+    try:
+        if partition_on is not None:
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            df = pl.read_database_uri(sql, uri=uri, partition_on=partition_on, partition_num=partition_num)
+        else:
+            df = read_frame(query, engine, label=schema)
+        if casts:
+            df = df.with_columns(pl.col(col).cast(dtype) for col, dtype in casts.items() if col in df.columns)
+        error = None
+    except Exception as e:
+        df, error = None, str(e)
+    report = {
+        "schema": schema,
+        "seconds": time.perf_counter() - start,
+        "rows": 0 if df is None else df.height,
+        "error": error,
+    }
+    return df, report
+
+
+def extract_schemas(
+    queries: dict[str, Selectable],
+    engine: Engine,
+    uri: str | None = None,
+    workers: int | None = None,
+    casts: dict[str, pl.DataType] | None = None,
+    partition_on: str | None = None,
+    partition_num: int | None = None,
+    tag: str | None = None,
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Run each schema's query concurrently on a bounded thread pool, over the engine's pooled connections, and
+    concatenate the results. A schema whose query fails is logged and left out rather than failing the whole
+    extract. With `workers` <= 1 the queries are sent as the single `union_all` statement used previously.
+
+    :param queries: one selectable per schema, keyed by schema name
+    :type queries: dict[str, Selectable]
+    :param engine: SQLAlchemy engine the queries are read through
+    :type engine: Engine
+    :param uri: connection string for `pl.read_database_uri`, only needed with `partition_on`
+    :type uri: str | None
+    :param workers: concurrent queries. Defaults to the WEASELBOT_EXTRACT_WORKERS environment variable, or 8.
+    :type workers: int | None
+    :param casts: column dtypes to enforce on each schema's frame so they concatenate cleanly
+    :type casts: dict[str, pl.DataType] | None
+    :param partition_on: numeric column connectorx splits each schema's query on, for very large schemas
+    :type partition_on: str | None
+    :param partition_num: number of connectorx partitions per schema when `partition_on` is given
+    :type partition_num: int | None
+    :param tag: if given, a column of this name is added to every query holding the schema it came from
+    :type tag: str | None
+    :return: the combined data and a per-schema report of seconds, rows and error
+    :rtype: tuple[pl.DataFrame, pl.DataFrame]
+    """
+
+    if workers is None:
+        workers = int(os.getenv("WEASELBOT_EXTRACT_WORKERS", "8"))
+    if partition_on is not None and uri is None:
+        raise ValueError("extract_schemas needs a connection uri to partition reads")
+    if not queries:
+        return pl.DataFrame(), pl.DataFrame(
+            schema={"schema": pl.String, "seconds": pl.Float64, "rows": pl.Int64, "error": pl.String}
+        )
+    if tag is not None:
+        queries = {
+            schema: query.add_columns(literal_column(f"'{schema}'").label(tag)) for schema, query in queries.items()
+        }
+
+    if workers <= 1:
+        df, report = _read_schema("all", union_all(*queries.values()), engine, uri, casts, partition_on, partition_num)
+        if df is None:
+            raise SQLAlchemyError(f"National extract failed: {report['error']}")
+        return df, pl.DataFrame([report])
+
+    frames, reports = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_read_schema, schema, query, engine, uri, casts, partition_on, partition_num)
+            for schema, query in queries.items()
+        ]
+        for future in futures:
+            df, report = future.result()
+            reports.append(report)
+            if df is None:
+                logging.error(f"Extract failed for {report['schema']}: {report['error']}")
+            elif df.height > 0:
+                frames.append(df)
+
+    report = pl.DataFrame(reports).sort("seconds", descending=True)
+    failed = report.filter(pl.col("error").is_not_null()).height
+    logging.info(
+        f"Extracted {report.get_column('rows').sum()} rows from {report.height - failed} schemas "
+        f"({failed} failed); slowest: {', '.join(f'{s} {t:.1f}s' for s, t in report.head(3).select('schema', 'seconds').iter_rows())}"
+    )
+    if not frames:
+        return pl.DataFrame(), report
+    return pl.concat(frames, how="vertical_relaxed"), report
+
+
+def _find_new_awards(
+    schema: str, year: int, dfs: list[pl.DataFrame] | dict[int, pl.DataFrame], awarded: pl.DataFrame
+) -> pl.DataFrame:
     """
-    Check for new earned achievements in the data. By looking at the current
-    achievement number and comparing it against what we've already seen, determine
-    if there are new achievments to issue. If there are no new achievments,
-    continue to the next one.
+    Find every earned achievement not yet awarded, across all achievements at once. The candidate frames are
+    stacked with their achievement id and the value of their period (week, month or year, taken from their first
+    column), and each kind of period takes one anti-join against this year's awards.
 
-    :param row: a key: value named tuple.
-    :type row: namedtuple produced by pandas' intertuples method
+    :param schema: the region; only men whose home region this is are kept
+    :type schema: str
     :param year: the 4-digit current year
     :type year: int
-    :param idx: The index of the `awards table` award we are focusing on
-    :type idx: int
-    :param df: the region data set. This includes new records, if any.
-    :type df: pl.DataFrame
+    :param dfs: per achievement id, the men who meet it with the period column, region, date_awarded and
+        slack_user_id. A list is taken to be in id order starting at 1.
+    :type dfs: list[pl.DataFrame] | dict[int, pl.DataFrame]
     :param awarded: Table of awards already handed out to the pax in the region
     :type awarded: pl.DataFrame
-    :return: pandas DataFrame
-    :rtype: pl.DataFrame object
+    :return: achievement_id, period_type, period, region, date_awarded and pax_id of each new award, in the order
+        of `dfs`
+    :rtype: pl.DataFrame
     """
 
-    match df.columns[0]:
-        case "month":
-            with_cols = pl.col("date_awarded").dt.month().alias("month")
-            select_col = "month"
-        case "week":
-            with_cols = pl.col("date_awarded").dt.week().alias("week")
-            select_col = "week"
-        case _:
-            with_cols = pl.col("date_awarded").dt.year().alias("year")
-            select_col = "year"
-
-    return (
-        df.with_columns(pl.col("slack_user_id").alias("pax_id"))
-        .drop("slack_user_id")
-        .filter(pl.col("region") == schema)
-        .join(
-            awarded.with_columns(with_cols)
-            .filter((pl.col("achievement_id").cast(pl.Int64()) == idx) & (pl.col("date_awarded").dt.year() == year))
-            .select([select_col, "pax_id"]),
-            on=[select_col, "pax_id"],
-            how="anti",
-            join_nulls=True,
+    candidates = []
+    for idx, df in dfs.items() if isinstance(dfs, dict) else enumerate(dfs, start=1):
+        if df.is_empty():
+            continue
+        period_type = df.columns[0] if df.columns[0] in ("month", "week") else "year"
+        candidates.append(
+            df.filter(pl.col("region") == schema).select(
+                pl.lit(idx, pl.Int64).alias("achievement_id"),
+                pl.lit(period_type).alias("period_type"),
+                pl.col(df.columns[0]).cast(pl.Int64).alias("period"),
+                "region",
+                "date_awarded",
+                pl.col("slack_user_id").alias("pax_id"),
+            )
+        )
+    if not candidates:
+        return pl.DataFrame(
+            schema={
+                "achievement_id": pl.Int64,
+                "period_type": pl.String,
+                "period": pl.Int64,
+                "region": pl.String,
+                "date_awarded": pl.Date,
+                "pax_id": pl.String,
+            }
         )
+
+    stacked = pl.concat(candidates, how="vertical_relaxed").with_row_index("_order")
+    this_year = awarded.filter(pl.col("date_awarded").dt.year() == year).with_columns(
+        pl.col("achievement_id").cast(pl.Int64)
     )
+    new = []
+    for (period_type,), part in stacked.partition_by("period_type", as_dict=True).items():
+        given = this_year.select(
+            "achievement_id",
+            "pax_id",
+            getattr(pl.col("date_awarded").dt, period_type)().cast(pl.Int64).alias("period"),
+        )
+        new.append(part.join(given, on=["achievement_id", "period", "pax_id"], how="anti", nulls_equal=True))
+    return pl.concat(new).sort("_order").drop("_order")
 
 
 def ordinal_suffix(n: int) -> str:
@@ -132,35 +572,41 @@ def ordinal_suffix(n: int) -> str:
     return suffix
 
 
-def _get_achievement_counts(awarded: pl.DataFrame, year: int) -> dict[str, Counter]:
-    """Get achievement counts for each pax in the current year."""
-    counts = defaultdict(Counter)
-    for r in (
-        awarded.filter(pl.col("date_awarded").dt.year() == year)
-        .group_by(["pax_id", "achievement_id"])
-        .agg(pl.col("id").count().alias("count"))
-        .iter_rows(named=True)
-    ):
-        counts[r["pax_id"]].update({r["achievement_id"]: r["count"]})
-    return counts
+def _number_awards(new_awards: pl.DataFrame, awarded: pl.DataFrame, year: int) -> pl.DataFrame:
+    """
+    Number each new award for its message: which of the man's achievements this year it is, and how many times
+    this year he's earned this one. This year's existing awards are counted per man and per man and achievement and
+    joined on, and a running count over each man's new awards, in date_awarded order, is added to them.
 
+    :param new_awards: the new awards from `_find_new_awards`
+    :type new_awards: pl.DataFrame
+    :param awarded: Table of awards already handed out to the pax in the region
+    :type awarded: pl.DataFrame
+    :param year: the 4-digit current year
+    :type year: int
+    :return: `new_awards` in the same order, with total_achievements and total_idx_achievements
+    :rtype: pl.DataFrame
+    """
 
-def _send_slack_message(client: WebClient, channel: str, message: str, add_reaction: bool = True) -> None:
-    """Send a message to Slack with retry logic for rate limiting."""
-    try:
-        response = client.chat_postMessage(channel=channel, text=message, link_names=True)
-        if add_reaction:
-            client.reactions_add(channel=channel, name="fire", timestamp=response.get("ts"))
-    except SlackApiError as e:
-        if e.response.status_code == 429:
-            delay = int(e.response.headers["Retry-After"])
-            logging.info(f"Pausing Slack notifications for {delay} seconds.")
-            time.sleep(delay)
-            response = client.chat_postMessage(channel=channel, text=message, link_names=True)
-            if add_reaction:
-                client.reactions_add(channel=channel, name="fire", timestamp=response.get("ts"))
-        else:
-            raise
+    this_year = awarded.filter(pl.col("date_awarded").dt.year() == year).select(
+        "pax_id", pl.col("achievement_id").cast(pl.Int64)
+    )
+    totals = this_year.group_by("pax_id").agg(pl.len().cast(pl.Int64).alias("_total"))
+    per_award = this_year.group_by("pax_id", "achievement_id").agg(pl.len().cast(pl.Int64).alias("_idx_total"))
+    return (
+        new_awards.with_row_index("_order")
+        .join(totals, on="pax_id", how="left")
+        .join(per_award, on=["pax_id", "achievement_id"], how="left")
+        .sort("date_awarded", "_order")
+        .with_columns(
+            (pl.col("_total").fill_null(0) + pl.int_range(1, pl.len() + 1).over("pax_id")).alias("total_achievements"),
+            (pl.col("_idx_total").fill_null(0) + pl.int_range(1, pl.len() + 1).over("pax_id", "achievement_id")).alias(
+                "total_idx_achievements"
+            ),
+        )
+        .sort("_order")
+        .drop("_order", "_total", "_idx_total")
+    )
 
 
 def _format_achievement_message(
@@ -182,6 +628,45 @@ def _format_achievement_message(
     )
 
 
+def _format_achievement_digest(awards: list[tuple[str, str, list[tuple]]]) -> list[tuple[str, tuple[dict, ...]]]:
+    """
+    Lay a run's new achievements out as Block Kit messages: a header, then one section per award listing everyone
+    who earned it. Sections are split to stay under Slack's text limit and messages under its block limit.
+
+    :param awards: per award, its name, verb and the (slack_id, date_awarded, times this year) of each new award
+    :type awards: list[tuple[str, str, list[tuple]]]
+    :return: the fallback text and blocks of each message
+    :rtype: list[tuple[str, tuple[dict, ...]]]
+    """
+
+    total = sum(len(earned) for _, _, earned in awards)
+    sections = []
+    for name, verb, earned in awards:
+        text = f"*{name}* for {verb}"
+        for slack_id, date_awarded, count in earned:
+            line = f"\n• <@{slack_id}> on {date_awarded}" + (
+                f" ({count}{ordinal_suffix(count)} time)" if count > 1 else ""
+            )
+            if len(text) + len(line) > DIGEST_SECTION_CHARS:
+                sections.append(text)
+                text = f"*{name}* (continued)"
+            text += line
+        sections.append(text)
+
+    per_message = DIGEST_BLOCKS - 1  # leave room for the header
+    chunks = [sections[i : i + per_message] for i in range(0, len(sections), per_message)]
+    messages = []
+    for part, chunk in enumerate(chunks, start=1):
+        title = f"Achievements unlocked! {total} new achievements today" + (
+            f" ({part}/{len(chunks)})" if len(chunks) > 1 else ""
+        )
+        blocks = ({"type": "header", "text": {"type": "plain_text", "text": title}},) + tuple(
+            {"type": "section", "text": {"type": "mrkdwn", "text": text}} for text in chunk
+        )
+        messages.append((title, blocks))
+    return messages
+
+
 def send_to_slack(
     schema: str,
     token: str,
@@ -189,76 +674,120 @@ def send_to_slack(
     year: int,
     awarded: pl.DataFrame,
     awards: pl.DataFrame,
-    dfs: list[pl.DataFrame],
+    dfs: list[pl.DataFrame] | dict[int, pl.DataFrame],
     paxminer_log_channel: str,
+    digest: bool = False,
+    outbox: "AwardOutbox | None" = None,
 ) -> pl.DataFrame:
-    """Process and send achievement notifications to Slack."""
-    client = slack_client(token)
-    data_to_upload = pl.DataFrame()
-    achievement_counts = _get_achievement_counts(awarded, year)
-
-    for idx, df in enumerate(dfs, start=1):
-        if df.is_empty():
-            try:
-                award_name = awards.filter(pl.col("id") == idx).select(pl.col("name")).to_series().to_list()[0]
-                logging.info(f"No data in {award_name} for {schema}")
-            except IndexError:
-                logging.error(f"{schema} doesn't have achievement {idx} in their awards_list table.")
-            continue
-
-        new_data = _check_for_new_results(schema, year, idx, df, awarded)
-        if new_data.is_empty() or idx not in awards.select(pl.col("id")).to_series().to_list():
-            continue
-
-        # Process new achievements
-        for record in new_data.iter_rows():
-            achievement_counts[record[3]].update({idx: 1})
-            try:
-                new_award_name = awards.filter(pl.col("id") == idx).select(pl.first("name")).item()
-                new_award_verb = awards.filter(pl.col("id") == idx).select(pl.first("verb")).item()
-
-                message = _format_achievement_message(
-                    record,
-                    new_award_name,
-                    new_award_verb,
-                    achievement_counts[record[3]].total(),
-                    achievement_counts[record[3]][idx],
-                )
+    """
+    Process and send achievement notifications to Slack. `dfs` is keyed by achievement id; a list is taken to be
+    in id order starting at 1. Messages go through a `SlackDispatcher`, so different channels are sent concurrently
+    and rate limits are waited out without blocking other regions.
 
-                # Send to direct message for 6-pack achievements after first one
-                target_channel = record[3] if idx == 13 and achievement_counts[record[3]][idx] > 1 else channel
-                _send_slack_message(client, target_channel, message)
-                logging.info(f"Successfully sent slack message for {record[3]} and achievement {idx}")
+    With `digest`, the run's new achievements are posted to `channel` as a few Block Kit messages, each with one
+    reaction, instead of a message and a reaction per award (repeat 6-packs included, rather than as DMs). The
+    returned rows are the same either way.
 
-            except SlackApiError as e:
-                logging.error(f"Error sending achievement {new_award_name} for {schema}: {str(e)}")
-                continue
+    With an `outbox`, the messages and the awards they announce are staged in it before anything is sent and
+    marked sent as they go out. Awards an earlier, interrupted run already announced are returned for loading but
+    not announced again.
+    """
+    dispatcher = SlackDispatcher()
+    queued = []  # each message with the awards it announces
+    # a region with no awards this year reads back untyped columns from some drivers
+    awarded = awarded.cast({"achievement_id": pl.Int64, "pax_id": pl.String, "date_awarded": pl.Date})
+    digest_awards, digest_rows = [], []
+    announced = outbox.announced(schema) if outbox is not None else set()
+    repeat_dm = (
+        set(awards.filter(pl.col("code") == "6_pack").get_column("id").to_list()) if "code" in awards.columns else {13}
+    )
 
-        # Update data to upload
-        data_to_upload = pl.concat(
-            [
-                data_to_upload,
-                new_data.with_columns(pl.lit(idx).alias("achievement_id")).select(
-                    "achievement_id", "pax_id", "date_awarded"
-                ),
-            ]
+    names = dict(awards.select("id", "name").iter_rows())
+    verbs = dict(awards.select("id", "verb").iter_rows())
+    for idx, df in dfs.items() if isinstance(dfs, dict) else enumerate(dfs, start=1):
+        if idx not in names:
+            logging.error(f"{schema} doesn't have achievement {idx} in their awards_list table.")
+        elif df.is_empty():
+            logging.info(f"No data in {names[idx]} for {schema}")
+
+    new_awards = _number_awards(
+        _find_new_awards(schema, year, dfs, awarded).filter(pl.col("achievement_id").is_in(list(names))),
+        awarded,
+        year,
+    ).with_columns(
+        # Send to direct message for 6-pack achievements after first one
+        pl.when(pl.col("achievement_id").is_in(list(repeat_dm)) & (pl.col("total_idx_achievements") > 1))
+        .then(pl.col("pax_id"))
+        .otherwise(pl.lit(channel))
+        .alias("channel")
+    )
+    data_to_upload = new_awards.select("achievement_id", "pax_id", "date_awarded")
+    if announced:
+        # they still count towards the numbers above, but aren't announced again
+        new_awards = new_awards.join(
+            pl.DataFrame(
+                list(announced),
+                schema={"achievement_id": pl.Int64, "pax_id": pl.String, "_year": pl.Int64, "period": pl.Int64},
+                orient="row",
+            ),
+            left_on=["achievement_id", "pax_id", pl.col("date_awarded").dt.year().cast(pl.Int64), "period"],
+            right_on=["achievement_id", "pax_id", "_year", "period"],
+            how="anti",
         )
 
-    # Send summary message
-    try:
-        summary = (
-            f"Successfully ran today's Weaselbot achievements patch. Sent {data_to_upload.shape[0]} new achievements."
-        )
-        _send_slack_message(client, paxminer_log_channel, summary, add_reaction=False)
-    except SlackApiError as e:
-        error_message = (
-            e.response.get("response_metadata", {}).get("messages")
-            if e.response.get("error") == "invalid_arguments"
-            else e.response.get("error")
+    # Queue new achievements; they're sent together below
+    for (idx,), new_data in new_awards.partition_by("achievement_id", as_dict=True).items():
+        rows = new_data.select("achievement_id", "pax_id", "period", "date_awarded").to_dicts()
+        if digest:
+            earned = new_data.select("pax_id", "date_awarded", "total_idx_achievements").rows()
+            digest_awards.append((names[idx], verbs[idx], earned))
+            digest_rows.extend(rows)
+            continue
+        for row, r in zip(rows, new_data.iter_rows(named=True), strict=True):
+            message = _format_achievement_message(
+                (r["period"], r["region"], r["date_awarded"], r["pax_id"]),
+                names[idx],
+                verbs[idx],
+                r["total_achievements"],
+                r["total_idx_achievements"],
+            )
+            queued.append((SlackMessage(token, r["channel"], message, reaction="fire", key=(idx, names[idx])), [row]))
+
+    for part, (fallback, blocks) in enumerate(_format_achievement_digest(digest_awards) if digest_awards else [], 1):
+        message = SlackMessage(
+            token, channel, fallback, reaction="fire", key=("digest", f"digest {part}"), blocks=blocks
         )
-        logging.error(
-            f"Error sending Weaselbot runtime message to {paxminer_log_channel} for {schema}: {error_message}"
+        # every award is recorded against the first digest message; the outbox resends any later part that fails
+        queued.append((message, digest_rows if part == 1 else []))
+
+    if outbox is not None:
+        message_ids = outbox.stage(
+            schema,
+            [
+                ({"channel": m.channel, "text": m.text, "blocks": m.blocks, "reaction": m.reaction}, rows)
+                for m, rows in queued
+            ],
         )
+    for message, _ in queued:
+        dispatcher.submit(message)
+    outcomes = dispatcher.run()
+    for outcome in outcomes:
+        idx, award_name = outcome.message.key
+        if outcome.ok:
+            logging.info(f"Successfully sent slack message for {outcome.message.channel} and achievement {idx}")
+        else:
+            logging.error(f"Error sending achievement {award_name} for {schema}: {outcome.error}")
+    if outbox is not None:
+        outbox.mark_sent([i for i, outcome in zip(message_ids, outcomes, strict=True) if outcome.ok])
+
+    # Send summary message once the achievements are out
+    summary = f"Successfully ran today's Weaselbot achievements patch. Sent {data_to_upload.shape[0]} new achievements."
+    dispatcher.submit(SlackMessage(token, paxminer_log_channel, summary))
+    for outcome in dispatcher.run():
+        if not outcome.ok:
+            logging.error(
+                f"Error sending Weaselbot runtime message to {paxminer_log_channel} for {schema}: {outcome.error}"
+            )
 
     logging.info(f"Sent all achievement Slack messages to {schema}")
     return data_to_upload